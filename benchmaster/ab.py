@@ -0,0 +1,226 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Interleaved A/B comparisons.
+
+Comparing two clusters (or one cluster before and after a change to its configuration) by
+running one sweep and then the other hours later mixes drift and time-of-day effects into
+the difference.  Instead, we run both sides within the same sweep and interleave them.
+Side A is the targets on the command line, and side B is either another set of targets
+(--ab-targets) or the same ones.  Either side may have a command that we run over SSH on its
+first target whenever we switch to it (--ab-apply-a and --ab-apply-b), to apply its
+configuration.  Both sides use the same credentials.  In a scale-out sweep, side B uses as
+many of its targets as the point does of side A's.  Side B's targets get the same pre-flight
+checks and network measurement (--net-check) as side A's, so that each side's results are
+set against the ceiling of its own network.
+
+The points of the sweep are taken in blocks (of one point, by default).  Each block is run
+on one side and then on the other:
+
+    alternate   The side that goes first alternates from block to block (A B, B A, A B ...),
+                so that neither side always runs on a cluster that the other has just warmed.
+    random      The side that goes first is chosen at random for each block.
+
+With --ab-repeats, the whole interleaved sweep is repeated, so that each point has several
+pairs of results.  Every run is a normal result row, with [A] or [B] at the start of its
+description.  At the end we print the paired differences in bandwidth (B against A) for
+each point, with a 95% confidence interval when there are several pairs, and then the same
+over all the points together.
+"""
+
+import copy
+import random
+import statistics
+import subprocess
+import threading
+
+_ssh_options = '-o UserKnownHostsFile=/dev/null -o StrictHostKeyChecking=no -o ConnectTimeout=10'
+
+# Two-sided 95% critical values of Student's t distribution, by degrees of freedom.
+_t95 = [None, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def _interval(values):
+    """ The mean of some values, and the half-width of its 95% confidence interval (or None). """
+
+    mean = statistics.mean(values)
+    if len(values) < 2:
+        return mean, None
+
+    df = len(values) - 1
+    t = _t95[df] if df < len(_t95) else 1.96
+    return mean, t * statistics.stdev(values) / len(values) ** 0.5
+
+
+
+def _bandwidth(result, direction):
+    try:
+        return float(getattr(result, direction).bandwidth)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+
+class Side:
+    """ One side of a comparison: its targets, and the command (if any) that configures it. """
+
+    def __init__(self, name, targets, apply, password):
+        self.name = name
+        self.targets = targets
+        self.apply = apply
+        self.password = password
+
+
+    def __repr__(self): return str(vars(self))
+
+
+    def switch_to(self):
+        """ Apply this side's configuration, if it has any. """
+
+        if self.apply is None:
+            return
+
+        host = self.targets[0]
+        cmd = self.apply
+        if host != 'localhost':
+            cmd = "sshpass -p {} ssh {} root@{} '{}'".format(self.password, _ssh_options, host, cmd.replace("'", "'\\''"))
+
+        print("Switching to side {}: {}".format(self.name, self.apply))
+        rc = subprocess.run(cmd, shell=True, capture_output=True)
+        if rc.returncode != 0:
+            print("Unable to apply the configuration of side {} on {}: {}".format(
+                    self.name, host, rc.stderr.decode('utf-8').strip()))
+            exit(-1)
+
+
+
+class Comparison:
+    """ An interleaved A/B comparison, and the results of its runs. """
+
+    def __init__(self, a, b, order, block, repeats, seed):
+        if order not in ['alternate', 'random']:
+            print("Unknown A/B order: {}".format(order))
+            exit(-1)
+
+        self.sides = {'A': a, 'B': b}
+        self.order = order
+        self.block = int(block)
+        self.repeats = int(repeats)
+        self.seed = int(seed)
+        self.current = None
+
+        # The points, and for each run, the point and repeat it is for and the spec it runs.
+        self.points = []
+        self.runs = []
+        self.results = {}
+        self._lock = threading.Lock()
+
+
+    def __repr__(self): return str(vars(self))
+
+
+    def interleave(self, specs, scaled=False):
+        """ Return the specs for every run of the comparison, in the order in which to run them.
+            The specs are for side A, and if they have been scaled out, side B is cut down to match. """
+
+        rng = random.Random(self.seed)
+        self.points = specs
+        self.runs = []
+
+        blocks = [range(i, min(i + self.block, len(specs))) for i in range(0, len(specs), self.block)]
+        for r in range(self.repeats):
+            for n, points in enumerate(blocks):
+                if self.order == 'alternate':
+                    first = 'AB'[(n + r * len(blocks)) % 2]
+                else:
+                    first = rng.choice('AB')
+
+                for side in [first, 'B' if first == 'A' else 'A']:
+                    for i in points:
+                        s = copy.copy(specs[i])
+                        s.side = side
+                        if side == 'B':
+                            targets = self.sides['B'].targets
+                            if scaled:
+                                targets = targets[:len(specs[i].protocol.targets())]
+                            s.protocol = s.protocol.with_targets(targets)
+                        s.description = '[{}] {}'.format(side, s.description)
+                        self.runs.append((i, r, s))
+
+        print("A/B comparison of {} points: {} runs".format(len(specs), len(self.runs)))
+        return [s for i, r, s in self.runs]
+
+
+    def switch(self, spec):
+        """ Get ready to run a spec, switching sides if it's on the other side. """
+
+        if spec.side != self.current:
+            self.sides[spec.side].switch_to()
+            self.current = spec.side
+
+
+    def recording(self, run, post_process):
+        """ Wrap the post processing of a run so that it also keeps the result for the comparison. """
+
+        point, repeat, spec = self.runs[run]
+
+        def wrapped():
+            result = post_process()
+            if result.status == 'ok':
+                with self._lock:
+                    self.results[(point, repeat, spec.side)] = result
+            return result
+
+        return wrapped
+
+
+    def _differences(self, point, direction):
+        """ The percentage differences of B from A for each pair of runs of a point that both completed. """
+
+        differences = []
+        for r in range(self.repeats):
+            a = _bandwidth(self.results.get((point, r, 'A')), direction)
+            b = _bandwidth(self.results.get((point, r, 'B')), direction)
+            if a and b is not None:
+                differences.append(100 * (b - a) / a)
+        return differences
+
+
+    def report(self):
+        print("\nA/B comparison: bandwidth of B relative to A, with 95% confidence intervals")
+        print("{:>6}  {:<40} {:>6} {:>18} {:>18}".format('Point', 'Spec', 'Pairs', 'Write', 'Read'))
+
+        overall = {'write': [], 'read': []}
+
+        for point, s in enumerate(self.points):
+            label = "{} {} size={} count={} mix={} targets={}".format(
+                    s.protocol.name(), s.backend.name(), s.object_size, s.object_count, s.read_write_mix,
+                    len(s.protocol.targets()))
+            columns = []
+            pairs = 0
+
+            for direction in ['write', 'read']:
+                differences = self._differences(point, direction)
+                pairs = max(pairs, len(differences))
+                if not differences:
+                    columns.append('-')
+                    continue
+
+                mean, half = _interval(differences)
+                overall[direction].append(mean)
+                columns.append('{:+.1f}%'.format(mean) + (' ±{:.1f}%'.format(half) if half is not None else ''))
+
+            print("{:>6}  {:<40} {:>6} {:>18} {:>18}".format(point, label, pairs, columns[0], columns[1]))
+
+        for direction in ['write', 'read']:
+            means = overall[direction]
+            if not means:
+                continue
+
+            mean, half = _interval(means)
+            print("Over {} points, B's {} bandwidth differs from A's by {:+.1f}%{}, and is higher for {} of them".format(
+                    len(means), direction, mean, ' (±{:.1f}%)'.format(half) if half is not None else '',
+                    sum(1 for m in means if m > 0)))
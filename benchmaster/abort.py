@@ -0,0 +1,124 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Early abort of failing or stalled points.
+
+A point where the gateway starts failing requests otherwise runs for its full run time and
+ramp down, and one that hangs blocks the sweep forever.  So we check the live progress of
+each point (see progress.py) against a policy, and cancel the point when:
+
+  - more than a percentage of operations have been failing for the whole of a window.
+  - the bandwidth while measuring has been below a threshold for the whole of a window.
+  - nothing has changed (no new phase, and no non-zero rates) for a stall time, and the
+    run has already gone on for longer than we expected it to.
+
+The failure and bandwidth checks need a backend that reports rates as it runs (sibench);
+the stall check works for anything that reports its phase (sibench and cosbench).
+
+An aborted point is recorded with whatever stats we saw while it ran, and a status saying
+why it was aborted.  The policy says whether the sweep then continues or stops.
+"""
+
+import benchmaster.progress as progress
+
+from benchmaster.result import Result, DirectionResult
+
+
+class Aborted(Exception):
+    """ Raised by a backend when its run has been cancelled by our policy. """
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+
+class Policy:
+    """ When to abort a point, and what to do with the sweep after we have. """
+
+    def __init__(self, max_failure_percent, min_bandwidth, window, stall_time, action):
+        if action not in ['continue', 'stop']:
+            print("Unknown abort action: {}".format(action))
+            exit(-1)
+
+        self.max_failure_percent = float(max_failure_percent) if max_failure_percent is not None else None
+        self.min_bandwidth = float(min_bandwidth) if min_bandwidth is not None else None
+        self.window = int(window)
+        self.stall_time = int(stall_time) if stall_time is not None else None
+        self.action = action
+        self._failing_since = None
+        self._slow_since = None
+
+
+    def __repr__(self): return str(vars(self))
+
+
+    def reset(self):
+        """ Forget what we've seen, ready for a new point. """
+        self._failing_since = None
+        self._slow_since = None
+
+
+    def check(self, prog, now):
+        """ Check the progress of the current point, and return why it should be aborted, or None. """
+
+        failing = False
+        if self.max_failure_percent is not None and prog.failures is not None and prog.ops is not None:
+            total = prog.failures + prog.ops
+            failing = total > 0 and prog.failures * 100 / total > self.max_failure_percent
+
+        slow = False
+        if self.min_bandwidth is not None and prog.bandwidth is not None and 'measuring' in (prog.phase or ''):
+            slow = prog.bandwidth < self.min_bandwidth
+
+        self._failing_since = (self._failing_since or now) if failing else None
+        self._slow_since = (self._slow_since or now) if slow else None
+
+        if self._failing_since is not None and now - self._failing_since >= self.window:
+            return "more than {:g}% of operations failing for {}s".format(self.max_failure_percent, self.window)
+
+        if self._slow_since is not None and now - self._slow_since >= self.window:
+            return "bandwidth below {:g} MB/s for {}s".format(self.min_bandwidth, self.window)
+
+        if self.stall_time is not None:
+            overdue = now - prog.run_start > progress.expected_duration(prog.specs[prog.index])
+            if overdue and now - prog.last_change >= self.stall_time:
+                return "no progress for {}s".format(self.stall_time)
+
+        return None
+
+
+
+def make(max_failure_percent, min_bandwidth, window, stall_time, action):
+    """ Build a Policy, or None if there is nothing to check. """
+
+    policy = Policy(max_failure_percent, min_bandwidth, window, stall_time, action)
+    if max_failure_percent is None and min_bandwidth is None and stall_time is None:
+        return None
+    return policy
+
+
+
+def partial_result(spec, reason, samples):
+    """ Build the Result of an aborted point from the bandwidths we saw while it was measuring.
+        Samples is a map from pass (write, read or mixed) to a list of bandwidths.  A mixed pass
+        is split between the directions by the mix, since the mix is the percentage of operations
+        that are reads, and they come from the same sizes as the writes. """
+
+    result = Result(spec)
+    result.id = '-'
+    result.status = 'aborted: {}'.format(reason)
+
+    mixed = samples.get('mixed')
+    read_share = min(int(spec.read_write_mix), 100) / 100
+
+    for direction in ['write', 'read']:
+        seen = samples.get(direction)
+        bandwidth = sum(seen) / len(seen) if seen else '-'
+        if mixed:
+            share = read_share if direction == 'read' else 1 - read_share
+            bandwidth = share * sum(mixed) / len(mixed)
+        setattr(result, direction, DirectionResult(bandwidth, '-', '-', '-', '-', '-', '-'))
+
+    return result
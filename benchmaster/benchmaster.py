@@ -8,73 +8,195 @@
 Usage:
     benchmaster sheet create        [-v] [-g FILE] <sheetname> <account> ...
     benchmaster s3 adduser          [-v] [--ceph-root-password PW] <name> <gateway>
-    benchmaster s3 test-write       [-v] [--s3-port PORT] [--s3-bucket BUCKET] [--s3-credentials FILE] <gateway>
+    benchmaster s3 test-write       [-v] [-s SIZE] [-c COUNT] [-r TIME] [-u TIME] [-d TIME] [-x MIX]
+                                    [--sheet NAME] [-g FILE]
+                                    [--s3-bucket BUCKET] [--s3-credentials FILE] [--s3-port PORT]
+                                    [--s3load-workers COUNT] [--rate RATE]
+                                    [--post-workers COUNT] [--results FILE] [--skip-preflight]
+                                    [--events FILE] [--trace FILE] [--scale-targets STEPS] [--scale-servers] [--memo] [--memo-file FILE] [--memo-ttl TIME]
+                                    [--ab-targets TARGETS] [--ab-apply-a CMD] [--ab-apply-b CMD] [--ab-order ORDER] [--ab-block COUNT] [--ab-repeats COUNT] [--ab-seed SEED]
+                                    <description> <gateway> ...
     benchmaster s3 cosbench ops     [-v] [-s SIZE] [-c COUNT] [-x MIX]
                                     [--sheet NAME] [-g FILE]
                                     [--s3-bucket BUCKET] [--s3-credentials FILE] [--s3-port PORT]
-                                    [--cosbench-op-count COUNT] [--cosbench-workers COUNT] [--cosbench-xmlfile FILE]
+                                    [--cosbench-op-count COUNT] [--cosbench-workers COUNT] [--cosbench-containers COUNT] [--cosbench-xmlfile FILE] [--hardware-cache FILE]
+                                    [--reuse-data] [--sweep-order ORDER] [--pipeline-cleanup] [--cleanup-workers COUNT]
+                                    [--cache-state STATE] [--cache-drop-osd] [--ceph-root-password PW]
+                                    [--post-workers COUNT] [--results FILE] [--skip-preflight]
+                                    [--events FILE] [--trace FILE] [--scale-targets STEPS] [--scale-servers] [--memo] [--memo-file FILE] [--memo-ttl TIME] [--abort-failures PERCENT] [--abort-bandwidth MB] [--abort-window TIME] [--abort-stall TIME]
+                                    [--ab-targets TARGETS] [--ab-apply-a CMD] [--ab-apply-b CMD] [--ab-order ORDER] [--ab-block COUNT] [--ab-repeats COUNT] [--ab-seed SEED]
+                                    [--abort-action ACTION]
                                     <description> <gateway> ...
     benchmaster s3 cosbench time    [-v] [-s SIZE] [-c COUNT] [-r TIME] [-u TIME] [-d TIME] [-x MIX]
                                     [--sheet NAME] [-g FILE]
                                     [--s3-bucket BUCKET] [--s3-credentials FILE] [--s3-port PORT]
-                                    [--cosbench-workers COUNT] [--cosbench-xmlfile FILE]
+                                    [--cosbench-workers COUNT] [--cosbench-containers COUNT] [--cosbench-xmlfile FILE] [--hardware-cache FILE]
+                                    [--reuse-data] [--sweep-order ORDER] [--pipeline-cleanup] [--cleanup-workers COUNT]
+                                    [--cache-state STATE] [--cache-drop-osd] [--ceph-root-password PW]
+                                    [--post-workers COUNT] [--results FILE] [--skip-preflight]
+                                    [--events FILE] [--trace FILE] [--scale-targets STEPS] [--scale-servers] [--memo] [--memo-file FILE] [--memo-ttl TIME] [--abort-failures PERCENT] [--abort-bandwidth MB] [--abort-window TIME] [--abort-stall TIME]
+                                    [--ab-targets TARGETS] [--ab-apply-a CMD] [--ab-apply-b CMD] [--ab-order ORDER] [--ab-block COUNT] [--ab-repeats COUNT] [--ab-seed SEED]
+                                    [--abort-action ACTION]
                                     <description> <gateway> ...
     benchmaster s3 sibench time     [-v] [-s SIZE] [-c COUNT] [-r TIME] [-u TIME] [-d TIME] [-x MIX]
                                     [--sheet NAME] [-g FILE]
                                     [--s3-bucket BUCKET] [--s3-credentials FILE] [--s3-port PORT]
-                                    [--sibench-workers FACTOR] [--sibench-port PORT] [--sibench-bandwidth BW] [--sibench-servers SERVERS]
-                                    [--sibench-generator GEN] [--sibench-slice-dir DIR] [--sibench-slice-size SIZE] [--sibench-slice-count COUNT]
-                                    [--sibench-skip-read-verification] [--clean-up]
+                                    [--sibench-workers FACTOR] [--sibench-port PORT] [--sibench-bandwidth BW] [--rate RATE] [--sibench-servers SERVERS]
+                                    [--sibench-generator GEN] [--sibench-slice-dir DIR] [--sibench-slice-size SIZE] [--sibench-slice-count COUNT] [--sibench-keep-output DIR]
+                                    [--sibench-skip-read-verification] [--clean-up] [--hardware-cache FILE]
+                                    [--net-check] [--net-check-time TIME] [--sibench-root-password PW] [--ceph-root-password PW]
+                                    [--reuse-data] [--sweep-order ORDER] [--pipeline-cleanup] [--cleanup-workers COUNT]
+                                    [--cache-state STATE] [--cache-drop-osd]
+                                    [--post-workers COUNT] [--results FILE] [--skip-preflight]
+                                    [--events FILE] [--trace FILE] [--scale-targets STEPS] [--scale-servers] [--memo] [--memo-file FILE] [--memo-ttl TIME] [--abort-failures PERCENT] [--abort-bandwidth MB] [--abort-window TIME] [--abort-stall TIME]
+                                    [--ab-targets TARGETS] [--ab-apply-a CMD] [--ab-apply-b CMD] [--ab-order ORDER] [--ab-block COUNT] [--ab-repeats COUNT] [--ab-seed SEED]
+                                    [--abort-action ACTION]
                                     <description> <gateway> ...
     benchmaster rados cosbench ops  [-v] [-s SIZE] [-c COUNT] [-x MIX]
                                     [--sheet NAME] [-g FILE]
                                     [--ceph-pool POOL] [--ceph-user USER --ceph-key KEY | --ceph-root-password PW]
-                                    [--cosbench-op-count COUNT] [--cosbench-workers COUNT] [--cosbench-xmlfile FILE]
+                                    [--cosbench-op-count COUNT] [--cosbench-workers COUNT] [--cosbench-containers COUNT] [--cosbench-xmlfile FILE] [--hardware-cache FILE]
+                                    [--reuse-data] [--sweep-order ORDER] [--pipeline-cleanup] [--cleanup-workers COUNT]
+                                    [--cache-state STATE] [--cache-drop-osd]
+                                    [--post-workers COUNT] [--results FILE] [--skip-preflight]
+                                    [--events FILE] [--trace FILE] [--scale-targets STEPS] [--scale-servers] [--memo] [--memo-file FILE] [--memo-ttl TIME] [--abort-failures PERCENT] [--abort-bandwidth MB] [--abort-window TIME] [--abort-stall TIME]
+                                    [--ab-targets TARGETS] [--ab-apply-a CMD] [--ab-apply-b CMD] [--ab-order ORDER] [--ab-block COUNT] [--ab-repeats COUNT] [--ab-seed SEED]
+                                    [--abort-action ACTION]
                                     <description> <monitor> ...
     benchmaster rados cosbench time [-v] [-s SIZE] [-c COUNT] [-r TIME] [-u TIME] [-d TIME] [-x MIX]
                                     [--sheet NAME] [-g FILE]
                                     [--ceph-pool POOL] [--ceph-user USER --ceph-key KEY | --ceph-root-password PW]
-                                    [--cosbench-workers COUNT] [--cosbench-xmlfile FILE]
+                                    [--cosbench-workers COUNT] [--cosbench-containers COUNT] [--cosbench-xmlfile FILE] [--hardware-cache FILE]
+                                    [--reuse-data] [--sweep-order ORDER] [--pipeline-cleanup] [--cleanup-workers COUNT]
+                                    [--cache-state STATE] [--cache-drop-osd]
+                                    [--post-workers COUNT] [--results FILE] [--skip-preflight]
+                                    [--events FILE] [--trace FILE] [--scale-targets STEPS] [--scale-servers] [--memo] [--memo-file FILE] [--memo-ttl TIME] [--abort-failures PERCENT] [--abort-bandwidth MB] [--abort-window TIME] [--abort-stall TIME]
+                                    [--ab-targets TARGETS] [--ab-apply-a CMD] [--ab-apply-b CMD] [--ab-order ORDER] [--ab-block COUNT] [--ab-repeats COUNT] [--ab-seed SEED]
+                                    [--abort-action ACTION]
                                     <description> <monitor> ...
     benchmaster rados sibench time  [-v] [-s SIZE] [-c COUNT] [-r TIME] [-u TIME] [-d TIME] [-x MIX]
                                     [--sheet NAME] [-g FILE]
                                     [--ceph-pool POOL] [--ceph-user user --ceph-key key | --ceph-root-password PW]
-                                    [--sibench-workers FACTOR] [--sibench-port PORT] [--sibench-bandwidth BW] [--sibench-servers SERVERS]
-                                    [--sibench-generator GEN] [--sibench-slice-dir DIR] [--sibench-slice-size SIZE] [--sibench-slice-count COUNT]
-                                    [--sibench-skip-read-verification] [--clean-up]
+                                    [--sibench-workers FACTOR] [--sibench-port PORT] [--sibench-bandwidth BW] [--rate RATE] [--sibench-servers SERVERS]
+                                    [--sibench-generator GEN] [--sibench-slice-dir DIR] [--sibench-slice-size SIZE] [--sibench-slice-count COUNT] [--sibench-keep-output DIR]
+                                    [--sibench-skip-read-verification] [--clean-up] [--hardware-cache FILE]
+                                    [--net-check] [--net-check-time TIME] [--sibench-root-password PW]
+                                    [--reuse-data] [--sweep-order ORDER] [--pipeline-cleanup] [--cleanup-workers COUNT]
+                                    [--cache-state STATE] [--cache-drop-osd]
+                                    [--post-workers COUNT] [--results FILE] [--skip-preflight]
+                                    [--events FILE] [--trace FILE] [--scale-targets STEPS] [--scale-servers] [--memo] [--memo-file FILE] [--memo-ttl TIME] [--abort-failures PERCENT] [--abort-bandwidth MB] [--abort-window TIME] [--abort-stall TIME]
+                                    [--ab-targets TARGETS] [--ab-apply-a CMD] [--ab-apply-b CMD] [--ab-order ORDER] [--ab-block COUNT] [--ab-repeats COUNT] [--ab-seed SEED]
+                                    [--abort-action ACTION]
                                     <description> <monitor> ...
     benchmaster rbd sibench time    [-v] [-s SIZE] [-c COUNT] [-r TIME] [-u TIME] [-d TIME] [-x MIX]
                                     [--sheet NAME] [-g FILE]
                                     [--ceph-pool POOL] [--ceph-datapool POOL] [--ceph-user user --ceph-key key | --ceph-root-password PW]
-                                    [--sibench-workers FACTOR] [--sibench-port PORT] [--sibench-bandwidth BW] [--sibench-servers SERVERS]
-                                    [--sibench-generator GEN] [--sibench-slice-dir DIR] [--sibench-slice-size SIZE] [--sibench-slice-count COUNT]
-                                    [--sibench-skip-read-verification] [--clean-up]
+                                    [--sibench-workers FACTOR] [--sibench-port PORT] [--sibench-bandwidth BW] [--rate RATE] [--sibench-servers SERVERS]
+                                    [--sibench-generator GEN] [--sibench-slice-dir DIR] [--sibench-slice-size SIZE] [--sibench-slice-count COUNT] [--sibench-keep-output DIR]
+                                    [--sibench-skip-read-verification] [--clean-up] [--hardware-cache FILE]
+                                    [--net-check] [--net-check-time TIME] [--sibench-root-password PW]
+                                    [--reuse-data] [--sweep-order ORDER] [--pipeline-cleanup] [--cleanup-workers COUNT]
+                                    [--cache-state STATE] [--cache-drop-osd]
+                                    [--post-workers COUNT] [--results FILE] [--skip-preflight]
+                                    [--events FILE] [--trace FILE] [--scale-targets STEPS] [--scale-servers] [--memo] [--memo-file FILE] [--memo-ttl TIME] [--abort-failures PERCENT] [--abort-bandwidth MB] [--abort-window TIME] [--abort-stall TIME]
+                                    [--ab-targets TARGETS] [--ab-apply-a CMD] [--ab-apply-b CMD] [--ab-order ORDER] [--ab-block COUNT] [--ab-repeats COUNT] [--ab-seed SEED]
+                                    [--abort-action ACTION]
                                     <description> <monitor> ...
     benchmaster cephfs sibench time [-v] [-s SIZE] [-c COUNT] [-r TIME] [-u TIME] [-d TIME] [-x MIX]
                                     [--sheet NAME] [-g FILE]
                                     [--ceph-dir DIR] [--ceph-user USER --ceph-key KEY | --ceph-root-password PW]
-                                    [--sibench-workers FACTOR] [--sibench-port PORT] [--sibench-bandwidth BW] [--sibench-servers SERVERS]
-                                    [--sibench-generator GEN] [--sibench-slice-dir DIR] [--sibench-slice-size SIZE] [--sibench-slice-count COUNT]
-                                    [--sibench-skip-read-verification] [--clean-up]
+                                    [--sibench-workers FACTOR] [--sibench-port PORT] [--sibench-bandwidth BW] [--rate RATE] [--sibench-servers SERVERS]
+                                    [--sibench-generator GEN] [--sibench-slice-dir DIR] [--sibench-slice-size SIZE] [--sibench-slice-count COUNT] [--sibench-keep-output DIR]
+                                    [--sibench-skip-read-verification] [--clean-up] [--hardware-cache FILE]
+                                    [--net-check] [--net-check-time TIME] [--sibench-root-password PW]
+                                    [--reuse-data] [--sweep-order ORDER] [--pipeline-cleanup] [--cleanup-workers COUNT]
+                                    [--cache-state STATE] [--cache-drop-osd]
+                                    [--post-workers COUNT] [--results FILE] [--skip-preflight]
+                                    [--events FILE] [--trace FILE] [--scale-targets STEPS] [--scale-servers] [--memo] [--memo-file FILE] [--memo-ttl TIME] [--abort-failures PERCENT] [--abort-bandwidth MB] [--abort-window TIME] [--abort-stall TIME]
+                                    [--ab-targets TARGETS] [--ab-apply-a CMD] [--ab-apply-b CMD] [--ab-order ORDER] [--ab-block COUNT] [--ab-repeats COUNT] [--ab-seed SEED]
+                                    [--abort-action ACTION]
                                     <description> <monitor> ...
     benchmaster block sibench time  [-v] [-s SIZE] [-c COUNT] [-r TIME] [-u TIME] [-d TIME] [-x MIX]
                                     [--sheet NAME] [-g FILE]
-                                    [--sibench-workers FACTOR] [--sibench-port PORT] [--sibench-bandwidth BW] [--sibench-servers SERVERS]
-                                    [--sibench-generator GEN] [--sibench-slice-dir DIR] [--sibench-slice-size SIZE] [--sibench-slice-count COUNT]
-                                    [--sibench-skip-read-verification] [--clean-up]
+                                    [--sibench-workers FACTOR] [--sibench-port PORT] [--sibench-bandwidth BW] [--rate RATE] [--sibench-servers SERVERS]
+                                    [--sibench-generator GEN] [--sibench-slice-dir DIR] [--sibench-slice-size SIZE] [--sibench-slice-count COUNT] [--sibench-keep-output DIR]
+                                    [--sibench-skip-read-verification] [--clean-up] [--hardware-cache FILE] [--sibench-root-password PW]
+                                    [--reuse-data] [--sweep-order ORDER] [--pipeline-cleanup] [--cleanup-workers COUNT]
+                                    [--cache-state STATE]
+                                    [--post-workers COUNT] [--results FILE] [--skip-preflight]
+                                    [--events FILE] [--trace FILE] [--scale-targets STEPS] [--scale-servers] [--memo] [--memo-file FILE] [--memo-ttl TIME] [--abort-failures PERCENT] [--abort-bandwidth MB] [--abort-window TIME] [--abort-stall TIME]
+                                    [--ab-targets TARGETS] [--ab-apply-a CMD] [--ab-apply-b CMD] [--ab-order ORDER] [--ab-block COUNT] [--ab-repeats COUNT] [--ab-seed SEED]
+                                    [--abort-action ACTION]
+                                    <description> <block-device>
+    benchmaster block fio time      [-v] [-s SIZE] [-c COUNT] [-r TIME] [-u TIME] [-x MIX]
+                                    [--sheet NAME] [-g FILE]
+                                    [--fio-iodepth DEPTH] [--fio-numjobs COUNT] [--fio-ioengine ENGINE] [--fio-pattern PATTERN]
+                                    [--fio-buffered] [--fio-servers SERVERS] [--fio-jobfile PREFIX] [--fio-keep-files]
+                                    [--reuse-data] [--sweep-order ORDER] [--pipeline-cleanup] [--cleanup-workers COUNT]
+                                    [--cache-state STATE] [--sibench-root-password PW]
+                                    [--post-workers COUNT] [--results FILE] [--skip-preflight]
+                                    [--events FILE] [--trace FILE] [--scale-targets STEPS] [--scale-servers] [--memo] [--memo-file FILE] [--memo-ttl TIME]
+                                    [--ab-targets TARGETS] [--ab-apply-a CMD] [--ab-apply-b CMD] [--ab-order ORDER] [--ab-block COUNT] [--ab-repeats COUNT] [--ab-seed SEED]
+                                    <description> <block-device>
+    benchmaster block native time   [-v] [-s SIZE] [-c COUNT] [-r TIME] [-u TIME] [-d TIME] [-x MIX]
+                                    [--sheet NAME] [-g FILE]
+                                    [--native-threads COUNT] [--native-pattern PATTERN] [--native-direct] [--rate RATE] [--clean-up]
+                                    [--reuse-data] [--sweep-order ORDER] [--pipeline-cleanup] [--cleanup-workers COUNT]
+                                    [--cache-state STATE]
+                                    [--post-workers COUNT] [--results FILE] [--skip-preflight]
+                                    [--events FILE] [--trace FILE] [--scale-targets STEPS] [--scale-servers] [--memo] [--memo-file FILE] [--memo-ttl TIME]
+                                    [--ab-targets TARGETS] [--ab-apply-a CMD] [--ab-apply-b CMD] [--ab-order ORDER] [--ab-block COUNT] [--ab-repeats COUNT] [--ab-seed SEED]
                                     <description> <block-device>
     benchmaster file sibench time   [-v] [-s SIZE] [-c COUNT] [-r TIME] [-u TIME] [-d TIME] [-x MIX]
                                     [--sheet NAME] [-g FILE]
-                                    [--sibench-workers FACTOR] [--sibench-port PORT] [--sibench-bandwidth BW] [--sibench-servers SERVERS]
-                                    [--sibench-generator GEN] [--sibench-slice-dir DIR] [--sibench-slice-size SIZE] [--sibench-slice-count COUNT]
-                                    [--sibench-skip-read-verification] [--clean-up]
+                                    [--sibench-workers FACTOR] [--sibench-port PORT] [--sibench-bandwidth BW] [--rate RATE] [--sibench-servers SERVERS]
+                                    [--sibench-generator GEN] [--sibench-slice-dir DIR] [--sibench-slice-size SIZE] [--sibench-slice-count COUNT] [--sibench-keep-output DIR]
+                                    [--sibench-skip-read-verification] [--clean-up] [--hardware-cache FILE] [--sibench-root-password PW]
+                                    [--reuse-data] [--sweep-order ORDER] [--pipeline-cleanup] [--cleanup-workers COUNT]
+                                    [--cache-state STATE]
+                                    [--post-workers COUNT] [--results FILE] [--skip-preflight]
+                                    [--events FILE] [--trace FILE] [--scale-targets STEPS] [--scale-servers] [--memo] [--memo-file FILE] [--memo-ttl TIME] [--abort-failures PERCENT] [--abort-bandwidth MB] [--abort-window TIME] [--abort-stall TIME]
+                                    [--ab-targets TARGETS] [--ab-apply-a CMD] [--ab-apply-b CMD] [--ab-order ORDER] [--ab-block COUNT] [--ab-repeats COUNT] [--ab-seed SEED]
+                                    [--abort-action ACTION]
                                     <description> <file-dir>
-    benchmaster iscsi setup         [-v]
+    benchmaster file fio time       [-v] [-s SIZE] [-c COUNT] [-r TIME] [-u TIME] [-x MIX]
+                                    [--sheet NAME] [-g FILE]
+                                    [--fio-iodepth DEPTH] [--fio-numjobs COUNT] [--fio-ioengine ENGINE] [--fio-pattern PATTERN]
+                                    [--fio-buffered] [--fio-servers SERVERS] [--fio-jobfile PREFIX] [--fio-keep-files]
+                                    [--reuse-data] [--sweep-order ORDER] [--pipeline-cleanup] [--cleanup-workers COUNT]
+                                    [--cache-state STATE] [--sibench-root-password PW]
+                                    [--post-workers COUNT] [--results FILE] [--skip-preflight]
+                                    [--events FILE] [--trace FILE] [--scale-targets STEPS] [--scale-servers] [--memo] [--memo-file FILE] [--memo-ttl TIME]
+                                    [--ab-targets TARGETS] [--ab-apply-a CMD] [--ab-apply-b CMD] [--ab-order ORDER] [--ab-block COUNT] [--ab-repeats COUNT] [--ab-seed SEED]
+                                    <description> <file-dir>
+    benchmaster file native time    [-v] [-s SIZE] [-c COUNT] [-r TIME] [-u TIME] [-d TIME] [-x MIX]
+                                    [--sheet NAME] [-g FILE]
+                                    [--native-threads COUNT] [--native-pattern PATTERN] [--native-direct] [--rate RATE] [--clean-up]
+                                    [--reuse-data] [--sweep-order ORDER] [--pipeline-cleanup] [--cleanup-workers COUNT]
+                                    [--cache-state STATE]
+                                    [--post-workers COUNT] [--results FILE] [--skip-preflight]
+                                    [--events FILE] [--trace FILE] [--scale-targets STEPS] [--scale-servers] [--memo] [--memo-file FILE] [--memo-ttl TIME]
+                                    [--ab-targets TARGETS] [--ab-apply-a CMD] [--ab-apply-b CMD] [--ab-order ORDER] [--ab-block COUNT] [--ab-repeats COUNT] [--ab-seed SEED]
+                                    <description> <file-dir>
+    benchmaster sibench corpus build [-v] [--sibench-slice-size SIZE] [--sibench-slice-count COUNT]
+                                    [--corpus-source PATH] [--corpus-compressibility PCT] [--corpus-dedupe PCT] [--corpus-file-size SIZE]
+                                    <corpus-dir>
+    benchmaster sibench corpus push  [-v] [--sibench-servers SERVERS] [--sibench-root-password PW] [--sibench-slice-dir DIR]
+                                    [--corpus-workers COUNT]
+                                    <corpus-dir>
+    benchmaster ingest              [-v] [--sheet NAME] [-g FILE] [--results FILE] [--ingest-workers COUNT] [--ingest-index FILE]
+                                    <archive> ...
+    benchmaster selfbench           [-v] [--selfbench-scale SCALE] [--selfbench-size SIZE] [--selfbench-history FILE]
+                                    [--selfbench-threshold PCT] [--selfbench-dir DIR] [--selfbench-repeats COUNT]
+    benchmaster memo list           [-v] [--memo-file FILE]
+    benchmaster memo clear          [-v] [--memo-file FILE]
+    benchmaster memo invalidate     [-v] [--memo-file FILE] <memo-key> ...
+    benchmaster iscsi setup         [-v] [--trace FILE]
                                     [--iscsi-image-size SIZE] [--iscsi-device-link LINK]
                                     [--ceph-pool POOL] [--ceph-root-password PW]
                                     [--sibench-servers SERVERS] [--sibench-root-password PW]
                                     <gateway> ...
-    benchmaster iscsi teardown      [-v]
+    benchmaster iscsi teardown      [-v] [--trace FILE]
                                     [--iscsi-device-link LINK]
                                     [--ceph-pool POOL] [--ceph-root-password PW]
                                     [--sibench-servers SERVERS] [--sibench-root-password PW]
@@ -84,7 +206,7 @@ Usage:
 Options:
     -h, --help                        Show usage
     -v, --verbose                     Show verbose output
-    -s, --object-size SIZE            Size of the objects in the test                           sweepable  [default: 1M]
+    -s, --object-size SIZE            Object size, or distribution such as 4K:70/1M-64M:30      sweepable  [default: 1M]
     -c, --object-count COUNT          Number of objects in the test                             sweepable  [default: 5000]
     -r, --run-time TIME               Seconds for the test (does not include ramp up/down)      sweepable  [default: 120]
     -u, --ramp-up TIME                Seconds at start of test where we do not record           sweepable  [default: 20]
@@ -92,35 +214,92 @@ Options:
     -x, --read-write-mix MIX          Percentage of reads, or 0 for separate read/write passes  sweepable  [default: 0]
     -g, --google-credentials FILE     File containing Google Sheet credentials                             [default: gcreds.json]
     --sheet NAME                      Google spreadsheet to which we will upload results  
+    --results FILE                    Local file to which we will append results, one json object per line
+    --skip-preflight                  Don't check that the targets and servers are reachable before a sweep
+    --events FILE                     Local file to which we will append live progress, one json object per line
+    --trace FILE                      Local file to which we will write the timing of each phase, as a Chrome trace
+    --scale-targets STEPS             Run each point with 1, 2, 4 ... of the targets: 'pow2', 'all' or counts
+    --scale-servers                   Use as many sibench or fio servers as targets, when scaling the targets
+    --ab-targets TARGETS              Compare with these (comma separated) targets as side B
+    --ab-apply-a CMD                  Command to run over SSH on side A's first target when switching to it
+    --ab-apply-b CMD                  Command to run over SSH on side B's first target when switching to it
+    --ab-order ORDER                  Which side runs first in each block: 'alternate' or 'random'         [default: alternate]
+    --ab-block COUNT                  Points to run on one side before running them on the other           [default: 1]
+    --ab-repeats COUNT                Times to run the whole interleaved comparison                        [default: 1]
+    --ab-seed SEED                    Seed for the random A/B order                                        [default: 0]
+    --post-workers COUNT              Workers to process results while the next point runs, or 0 for none  [default: 2]
+    --abort-failures PERCENT          Abort a point when more than this percentage of operations are failing
+    --abort-bandwidth MB              Abort a point when its bandwidth while measuring is below this, in MB/s
+    --abort-window TIME               Seconds a failure or bandwidth condition must last before we abort   [default: 30]
+    --abort-stall TIME                Abort a point when nothing changes for this many seconds once it is overdue
+    --abort-action ACTION             What to do after aborting a point: 'continue' or 'stop' the sweep    [default: continue]
+    --memo                            Reuse fresh results of identical points, rather than running them again
+    --memo-file FILE                  File in which we keep the results of points for --memo               [default: memo.json]
+    --memo-ttl TIME                   Seconds for which a memoized result is fresh, or 'forever'           [default: 86400]
+    --ingest-workers COUNT            Processes with which to parse archived results                       [default: 4]
+    --ingest-index FILE               File recording what we have already ingested                         [default: ingested.txt]
+    --selfbench-scale SCALE           Multiplier for the amount of synthetic data in each stage            [default: 1]
+    --selfbench-size SIZE             Size of the synthetic sibench output file                            [default: 256M]
+    --selfbench-history FILE          File of previous self-benchmark runs, one json object per line       [default: selfbench.jsonl]
+    --selfbench-threshold PCT         Percentage by which a stage may get worse before we fail             [default: 20]
+    --selfbench-repeats COUNT         Times to run each stage, taking the best                             [default: 5]
+    --selfbench-dir DIR               Directory for the synthetic data (a temporary directory by default)
     --clean-up                        Clean up the data created by the benchmark
+    --reuse-data                      Let consecutive compatible points share data rather than re-preparing it
+    --sweep-order ORDER               Order of points in a sweep: 'planned' to minimise preparation, or 'flat'  [default: planned]
+    --cache-state STATE               Caches before each run: 'cold', 'warm' or 'asis'                     [default: asis]
+    --cache-drop-osd                  Also have every OSD drop its cache when the cache state is cold
+    --pipeline-cleanup                Clean up each point's data in the background while the next point is set up
+    --cleanup-workers COUNT           Concurrent workers (per target for cosbench) for background clean up [default: 4]
     --cosbench-op-count COUNT         Numboer of ops to perform in the test                     sweepable  [default: 1000]
-    --cosbench-workers COUNT          The number of workers to use for cosbench                 sweepable  [default: 500]
+    --cosbench-workers COUNT          Workers per target for cosbench, or 'auto'                sweepable  [default: 500]
+    --cosbench-containers COUNT       Number of buckets (or existing pools) to spread objects   sweepable  [default: 1]
     --cosbench-xmlfile FILE           The name of the XML file to write out for Cosbench                   [default: cosbench.xml]
+    --hardware-cache FILE             File in which we cache the probed hardware of load generators        [default: hardware.json]
     --sibench-servers SERVERS         A comma-separated list of sibench servers                            [default: localhost]
     --sibench-port PORT               The port on which to connect to the sibench servers                  [default: 5150]
     --sibench-bandwidth BW            The bandwidth limit in units of K, M or G bits/s          sweepable  [default: 0]
-    --sibench-workers FACTOR          Workers per server = factor x no of cores.                sweepable  [default: 1.0]
+    --sibench-workers FACTOR          Workers per server = factor x no of cores, or 'auto'      sweepable  [default: 1.0]
     --sibench-skip-read-verification  Disable read validation for speed.    
     --sibench-root-password PW        Root password for the sibench servers                                [default: linux]
+    --net-check                       Measure the network from the sibench servers to the targets first
+    --net-check-time TIME             Seconds to measure each direction of each network path               [default: 5]
     --sibench-generator GEN           Workload generator for sibench                                       [default: prng]
     --sibench-slice-dir DIR           Directory for the corpus if using the slice generator                [default: /home/sibench/corpus]
     --sibench-slice-size SIZE         Size of slices if using the slice generator                          [default: 4096]
+    --sibench-keep-output DIR         Keep sibench's output files in a directory, rather than deleting them once read
     --sibench-slice-count COUNT       Number of slices if using the slice generator                        [default: 1000]
+    --corpus-source PATH              File, or directory of files, to build a corpus from instead of synthetic data
+    --corpus-compressibility PCT      Percentage of each synthetic slice that is compressible              [default: 0]
+    --corpus-dedupe PCT               Percentage of synthetic slices that duplicate an earlier slice       [default: 0]
+    --corpus-file-size SIZE           Size of each of the files in a corpus                                [default: 64M]
+    --corpus-workers COUNT            Number of servers to push a corpus to at once                        [default: 8]
     --s3-credentials FILE             File containing S3 keys                                              [default: s3creds.json]
     --s3-port PORT                    The port on which to connect to the S3 gateways                      [default: 7480]
     --s3-bucket BUCKET                The bucket to use to on S3                                           [default: benchmark]
+    --s3load-workers COUNT            Connections used by the built-in S3 load generator        sweepable  [default: 16]
     --ceph-pool POOL                  Ceph pool to use. MUST end in '1' if using Cosbench                  [default: benchmark]
     --ceph-datapool POOL              Ceph pool to use for non-metadata when using RBD with EC
     --ceph-user USER                  Ceph user for rados testing                                          [default: admin]
     --ceph-root-password PW           Root password for ceph nodes to fetch keys or create ueers           [default: linux]
     --ceph-key KEY                    Ceph key, normally from /etc/ceph/ceph.client.admnin.keyring
     --ceph-dir DIR                    Directory in a CephFS filesystem to use                              [default: benchmark]
+    --fio-iodepth DEPTH               Queue depth for each fio job                              sweepable  [default: 16]
+    --fio-numjobs COUNT               Number of fio jobs on each server                         sweepable  [default: 1]
+    --fio-ioengine ENGINE             Fio IO engine, such as libaio or io_uring                            [default: libaio]
+    --fio-pattern PATTERN             Access pattern for fio: 'rand' or 'seq'                              [default: rand]
+    --fio-buffered                    Use buffered IO with fio rather than O_DIRECT
+    --fio-servers SERVERS             A comma-separated list of hosts running 'fio --server'               [default: localhost]
+    --fio-jobfile PREFIX              Prefix for the fio job and output files that we write                [default: fio]
+    --fio-keep-files                  Keep fio's job and output files, rather than deleting them once read
+    --native-threads COUNT            Threads for the built-in IO engine                        sweepable  [default: 4]
+    --native-pattern PATTERN          Access pattern for the built-in IO engine: 'rand' or 'seq'           [default: rand]
+    --native-direct                   Use O_DIRECT with the built-in IO engine
+    --rate RATE                       Offer ops at a fixed rate: ops/s, or bytes/s as in 100MB  sweepable  [default: 0]
     --iscsi-image-size SIZE           Size of the RBD images we create for iscsi to mount                  [default: 1G]
     --iscsi-device-link LINK          Link to create on the sibench servers to mount iscsi                 [default: /tmp/sibench-iscsi]
 """
 
-import boto
-import boto.s3.connection
 import copy
 import json
 import re
@@ -128,11 +307,30 @@ import pprint
 import subprocess
 import sys
 from benchmaster import __version__
+import benchmaster.ab as ab
+import benchmaster.abort as abort
+import benchmaster.cachestate as cachestate
+import benchmaster.cleanup as cleanup
+import benchmaster.corpus as corpus
 import benchmaster.cosbench as cosbench
+import benchmaster.dataset as dataset
+import benchmaster.hardware as hardware
+import benchmaster.ingest as ingest
 import benchmaster.iscsi as iscsi
+import benchmaster.memo as memo
+import benchmaster.netcheck as netcheck
+import benchmaster.pipeline as pipeline
+import benchmaster.preflight as preflight
+import benchmaster.progress as progress
 import benchmaster.spreadsheet as spreadsheet
 import benchmaster.s3 as s3
+import benchmaster.scaleout as scaleout
+import benchmaster.schedule as schedule
+import benchmaster.selfbench as selfbench
+import benchmaster.sibench as sibench
 import benchmaster.spec as spec
+import benchmaster.store as store
+import benchmaster.trace as trace
 
 from docopt import docopt
 from datetime import datetime
@@ -154,34 +352,36 @@ def _sheet_create(args):
 
 
 
-def _run_single(args, spec):
-    """  Runs a single benchmark (usually as part of a sweep). """
+def _open_sheet(args):
+    """ Open the spreadsheet for our results (if we want to do that). """
 
     sheet_name = args['--sheet']
     credentials = args['--google-credentials']
-    description = args['<description>']
 
-    gconn = None
-    sheet = None
+    if sheet_name is None:
+        return None
 
-    # Check we can access the spreadsheet for our results (if we want to do that)
-    if sheet_name is not None:
-        print("Checking we can open google sheet '{}'".format(sheet_name))
+    print("Checking we can open google sheet '{}'".format(sheet_name))
 
-        gconn = spreadsheet.connect(credentials)
-        sheet = spreadsheet.open(gconn, sheet_name)
-        if not sheet:
-            print("Unable to open Google spreadsheet {}".format(sheet_name))
-            exit(-1)
+    gconn = spreadsheet.connect(credentials)
+    sheet = spreadsheet.open(gconn, sheet_name)
+    if not sheet:
+        print("Unable to open Google spreadsheet {}".format(sheet_name))
+        exit(-1)
+
+    return sheet
 
-    start_time = datetime.now()
-    result = spec.run() 
-    result.start_time = str(start_time)
-    result.end_time = str(datetime.now())
 
-    # Use a quick json decode/encode to allow easy pretty printing.  
-    # We're not actually using the json here.
-    print("Result:\n" + json.dumps(json.loads(str(result).replace("'", '"')), indent=3))
+
+def _store_result(args, sheet, result):
+    """ Report a result, and store it locally and/or upload it to a spreadsheet. """
+
+    with trace.phase('print result'):
+        print("Result:\n" + result.to_json(indent=3))
+
+    if args['--results'] is not None:
+        with trace.phase('store result'):
+            store.append(args['--results'], result)
 
     if sheet is None:
         print("No spreadsheet in use, skipping upload.")
@@ -191,18 +391,260 @@ def _run_single(args, spec):
 
 
 
+def _run_single(args, spec, background=None, ceiling=None, cache=None):
+    """  Runs a single benchmark (usually as part of a sweep). 
+         If the previous point is being cleaned up in the background, we wait for that to finish 
+         before we start measuring, and then put the caches into the state we want. 
+         We return a function that will turn the benchmark's output into a Result, including how
+         close it came to the network ceiling (if we measured one).  If the run is aborted, the
+         Result is built from what we saw of it while it ran. """
+
+    start_time = datetime.now()
+    aborted = None
+
+    # When pipelining, preparation is a job of its own, which our abort policy may cancel too.
+    progress.report(phase='preparing')
+    try:
+        with trace.phase('prepare'):
+            spec.prepare()
+    except abort.Aborted as e:
+        aborted = e.reason
+        samples = progress.current().samples
+
+    # No background clean up may overlap the measured part of the run.
+    if background is not None:
+        progress.report(phase='waiting for clean up')
+        with trace.phase('wait for clean up'):
+            background.wait()
+
+    cache_state = None
+    if cache is not None and aborted is None:
+        progress.report(phase='setting cache state')
+        with trace.phase('set cache state'):
+            cache_state = cache.apply(spec)
+
+    if aborted is None:
+        progress.report(phase='running')
+        progress.run_started()
+
+        try:
+            output = spec.execute()
+        except abort.Aborted as e:
+            aborted = e.reason
+            samples = progress.current().samples
+
+    end_time = datetime.now()
+
+    def post_process():
+        if aborted is None:
+            result = spec.process(output)
+        else:
+            result = abort.partial_result(spec, aborted, samples)
+
+        result.start_time = str(start_time)
+        result.end_time = str(end_time)
+
+        if background is not None:
+            result.background_cleanup = str(background)
+
+        if ceiling is not None:
+            ceiling.annotate(result)
+
+        if cache_state is not None:
+            result.cache_state = cache_state
+
+        return result
+
+    return post_process
+
+
+
 def _run_sweep(args):
     """ Run a sweep of benchmarks. """
 
+    trace.start(args['--trace'])
+
     # Make a spec from our arguments.
-    spec = _make_spec(args)
-
-    # Flatten the spec (which may define a sweep) into a list of simple specs, and run run them.
-    for s in spec.flatten():
-        # Use json as a convenient way to pretty print a heirarchical class structure.
-        jstr = str(s).replace("'", '"').replace('False', 'false').replace('True', 'true')
-        print("Running Benchmark:\n" + json.dumps(json.loads(jstr), indent=3))
-        _run_single(args, s)
+    with trace.phase('make spec'):
+        spec = _make_spec(args)
+
+    # Side B of an A/B comparison may be another cluster, which needs checking (and measuring) too.
+    b_spec = None
+    if args['--ab-targets'] is not None:
+        b_spec = copy.copy(spec)
+        b_spec.protocol = spec.protocol.with_targets(args['--ab-targets'].split(','))
+
+    # Make sure that everything we need is there before we start, rather than finding out part way through.
+    if not args['--skip-preflight']:
+        ceph_password = args['--ceph-root-password'] if not args['--ceph-key'] else None
+        with trace.phase('preflight'):
+            preflight.run(spec, ceph_password)
+            if b_spec is not None:
+                preflight.run(b_spec, ceph_password)
+
+    # Find out what our load generators are, so that we know how many workers they really run.
+    if spec.backend.name() in ['sibench', 'cosbench']:
+        hosts = spec.backend.servers if spec.backend.name() == 'sibench' else ['localhost']
+        with trace.phase('probe hardware'):
+            probed = hardware.probe(hosts, args['--sibench-root-password'], args['--hardware-cache'])
+        hardware.expand_auto(spec, probed)
+
+        if spec.backend.name() == 'sibench':
+            spec.backend.hardware = probed
+
+    # The slice generator needs the same corpus on every server.
+    if spec.backend.name() == 'sibench' and spec.backend.generator == 'slice':
+        with trace.phase('verify corpus'):
+            corpus.verify(spec.backend.servers, args['--sibench-root-password'], spec.backend.slice_dir,
+                          spec.backend.slice_size, spec.backend.slice_count)
+
+    # Flatten the spec (which may define a sweep) into a list of simple specs.
+    with trace.phase('flatten'):
+        specs = spec.flatten()
+
+    # Run each point with more and more of the targets, to see how well we scale out.
+    scaling = None
+    if args['--scale-targets'] is not None:
+        specs = scaleout.expand(specs, args['--scale-targets'], args['--scale-servers'])
+        scaling = scaleout.Scaling()
+
+    # Reuse what we can from earlier sweeps, before planning the points that we still have to run.
+    memoized = []
+    memos = None
+    if args['--memo']:
+        with trace.phase('memo lookup'):
+            ceph_password = args['--ceph-root-password'] if not args['--ceph-key'] else None
+            memos = memo.Memo(args['--memo-file'], args['--memo-ttl'], memo.fingerprint(spec, ceph_password),
+                              memo.context(args['--cache-state'], args['--cache-drop-osd']))
+            looked_up = [(s, memos.lookup(s)) for s in specs]
+        memoized = [r for s, r in looked_up if r is not None]
+        for s, r in looked_up:
+            if scaling is not None and r is not None:
+                scaling.add(s, r)
+        specs = [s for s, r in looked_up if r is None]
+        print("Reusing {} memoized results; {} points to run".format(len(memoized), len(specs)))
+
+    # Reorder them so that we need to prepare as little data as possible.
+    order = args['--sweep-order']
+    if order == 'planned':
+        with trace.phase('plan'):
+            planned = schedule.plan(specs)
+        schedule.report(specs, planned, args['--reuse-data'])
+        specs = planned
+    elif order != 'flat':
+        print("Unknown sweep order: {}".format(order))
+        exit(-1)
+
+    # Run the points on both sides of an A/B comparison, interleaved.
+    comparison = None
+    if args['--ab-targets'] is not None or args['--ab-apply-a'] is not None or args['--ab-apply-b'] is not None:
+        if args['--memo']:
+            print("Memoized results can't be used in an A/B comparison, since each side must be run when the other is")
+            exit(-1)
+
+        targets = spec.protocol.targets()
+        b_targets = b_spec.protocol.targets() if b_spec is not None else targets
+        comparison = ab.Comparison(
+                ab.Side('A', targets, args['--ab-apply-a'], args['--ceph-root-password']),
+                ab.Side('B', b_targets, args['--ab-apply-b'], args['--ceph-root-password']),
+                args['--ab-order'],
+                args['--ab-block'],
+                args['--ab-repeats'],
+                args['--ab-seed'])
+        specs = comparison.interleave(specs, args['--scale-targets'] is not None)
+
+    # Give each point its own objects, so that they can be deleted while the next point runs.
+    if args['--pipeline-cleanup']:
+        cleanup.plan(specs)
+
+    # Let points that use the same objects share them, rather than each writing and deleting their own.
+    if args['--reuse-data']:
+        dataset.plan_reuse(specs)
+
+    # The network between the servers and the targets doesn't change between points, so measure it once
+    # (or for an A/B comparison, once for each side's targets).  The ceilings are keyed by side.
+    ceilings = {}
+    if args['--net-check']:
+        for side, s in [(None, spec), ('B', b_spec)]:
+            if s is not None:
+                with trace.phase('net check'):
+                    ceilings[side] = netcheck.measure(
+                            args['--sibench-servers'].split(','),
+                            args['--sibench-root-password'],
+                            s.protocol.targets(),
+                            args['--ceph-root-password'],
+                            args['--net-check-time'])
+
+        ceilings['A'] = ceilings[None]
+        ceilings.setdefault('B', ceilings[None])
+
+    cache = cachestate.make(args['--cache-state'], args['--cache-drop-osd'],
+                            args['--sibench-root-password'], args['--ceph-root-password'], spec)
+
+    # Results are processed and stored while we get on with running the next point.
+    with trace.phase('open sheet'):
+        sheet = _open_sheet(args)
+    results = pipeline.PostProcessor(int(args['--post-workers']), lambda r: _store_result(args, sheet, r))
+
+    for r in memoized:
+        results.submit(lambda r=r: r)
+
+    # Points that fail or stall are cancelled rather than left to run out their time.
+    policy = abort.make(args['--abort-failures'], args['--abort-bandwidth'], args['--abort-window'],
+                        args['--abort-stall'], args['--abort-action'])
+
+    # And run them.
+    prog = progress.start(specs, args['--events'], policy)
+    stopped = False
+    background = None
+    for i, s in enumerate(specs):
+        with trace.point(i):
+            # Use json as a convenient way to pretty print a heirarchical class structure.
+            with trace.phase('print spec'):
+                print("Running Benchmark:\n" + json.dumps(s, default=vars, indent=3))
+            prog.point_started(i)
+            if comparison is not None:
+                with trace.phase('switch side'):
+                    comparison.switch(s)
+            # A point of a scale-out sweep uses only some of the targets (and perhaps servers), and so only some paths.
+            ceiling = ceilings.get(s.side)
+            if ceiling is not None:
+                ceiling = ceiling.restrict(s.protocol.targets(), s.backend.servers if args['--scale-servers'] else None)
+            post_process = _run_single(args, s, background, ceiling, cache)
+            if memos is not None:
+                post_process = memos.recording(s, post_process)
+            if scaling is not None:
+                post_process = scaling.recording(s, post_process)
+            if comparison is not None:
+                post_process = comparison.recording(i, post_process)
+            results.submit(post_process)
+            prog.point_finished()
+
+        if s.pipelined:
+            last = i == len(specs) - 1
+            background = cleanup.BackgroundCleanup(s, args['--cleanup-workers'], last).start()
+
+        if prog.abort_reason is not None and policy.action == 'stop':
+            print("Stopping the sweep after an aborted point")
+            stopped = True
+            break
+
+    if background is not None:
+        background.wait()
+
+    ok = results.close()
+    prog.close()
+    trace.close()
+
+    if scaling is not None:
+        scaling.report()
+
+    if comparison is not None:
+        comparison.report()
+
+    if not ok or stopped:
+        exit(-1)
+
     exit(0)
 
 
@@ -221,7 +663,8 @@ def _make_protocol_spec(args):
             key = args['--ceph-key']
             user = args['--ceph-user']
         else:
-            key = _fetch_ceph_key(args['<monitor>'][0], args['--ceph-root-password'])
+            with trace.phase('fetch ceph key'):
+                key = _fetch_ceph_key(args['<monitor>'][0], args['--ceph-root-password'])
             user = 'admin'
 
     if args['rados']:
@@ -252,18 +695,42 @@ def _make_backend_spec(args):
 
     if args['cosbench']: return spec.CosbenchSpec(
             args['--cosbench-workers'],
-            args['--cosbench-xmlfile'])
+            args['--cosbench-xmlfile'],
+            args['--cosbench-containers'])
 
-    if args['sibench']:  return spec.SibenchSpec(
+    if args['sibench']:
+        backend = spec.SibenchSpec(
             args['--sibench-port'], 
             args['--sibench-servers'].split(','), 
-            args['--sibench-bandwidth'],
+            sibench.bandwidth_for_rate(args['--rate'], args['--sibench-bandwidth']),
             args['--sibench-workers'],
             args['--sibench-skip-read-verification'],
             args['--sibench-generator'],
             args['--sibench-slice-dir'],
             args['--sibench-slice-count'],
             args['--sibench-slice-size'])
+        backend.output_dir = args['--sibench-keep-output']
+        return backend
+
+    if args['test-write']: return spec.S3LoadSpec(args['--s3load-workers'], args['--rate'])
+
+    if args['native']: return spec.NativeSpec(
+            args['--native-threads'],
+            args['--native-pattern'],
+            args['--native-direct'],
+            args['--rate'])
+
+    if args['fio']:
+        backend = spec.FioSpec(
+            args['--fio-iodepth'],
+            args['--fio-numjobs'],
+            args['--fio-ioengine'],
+            args['--fio-buffered'],
+            args['--fio-pattern'],
+            args['--fio-servers'].split(','),
+            args['--fio-jobfile'])
+        backend.keep_files = args['--fio-keep-files']
+        return backend
 
     print("Not a known backend")
     exit(-1)
@@ -274,7 +741,7 @@ def _make_runtype_spec(args):
     """ Parse our the runtyoe specific parts of our command line arguments. """
 
     if args['ops']:  return spec.OpsSpec(args['--op-count'])
-    if args['time']: return spec.TimeSpec(args['--run-time'], args['--ramp-up'], args['--ramp-down'])
+    if args['time'] or args['test-write']: return spec.TimeSpec(args['--run-time'], args['--ramp-up'], args['--ramp-down'])
     print("Not a known run type")
     exit(-1)
 
@@ -306,34 +773,6 @@ def _s3_adduser(args):
 
 
 
-def _s3_test_write(args):
-    """ Try writing a single object to S3 """
-    cred_file = args['--s3-credentials']
-    port = int(args['--s3-port'])
-    bucket_name = args['--s3-bucket']
-    gateway = args['<gateway>'][0]
-
-    secret_key, access_key = s3.load_keys(cred_file)
-
-    conn = boto.connect_s3(
-            aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key,
-            host = gateway,
-            port = port,
-            is_secure=False,
-            calling_format = boto.s3.connection.OrdinaryCallingFormat(),
-    )
-
-    print("Connected")
-
-    conn.create_bucket(bucket_name)
-
-    bucket = conn.get_bucket(bucket_name)
-    key = bucket.new_key("FooTheWomble")
-    key.set_contents_from_string("Bar Squiggle Aardvark")
-
-
-
 def _fetch_ceph_key(mon, rootpw):
     """ Fetch a key from a monitor """
 
@@ -359,7 +798,7 @@ def _handle_s3(args):
     if   args['time']:       _run_sweep(args)
     elif args['ops']:        _run_sweep(args)
     elif args['adduser']:    _s3_adduser(args)
-    elif args['test-write']: _s3_test_write(args)
+    elif args['test-write']: _run_sweep(args)
 
 
 def _handle_rados(args):
@@ -387,6 +826,42 @@ def _handle_sheet(args):
     if args['create']:       _sheet_create(args)
 
 
+def _handle_corpus(args):
+    if args['build']:
+        corpus.build(
+                args['<corpus-dir>'],
+                args['--sibench-slice-size'],
+                args['--sibench-slice-count'],
+                args['--corpus-file-size'],
+                args['--corpus-source'],
+                args['--corpus-compressibility'],
+                args['--corpus-dedupe'])
+
+    elif args['push']:
+        corpus.push(
+                args['<corpus-dir>'],
+                args['--sibench-servers'].split(','),
+                args['--sibench-root-password'],
+                args['--sibench-slice-dir'],
+                args['--corpus-workers'])
+
+
+def _ingest(args):
+    """ Load the results of old runs from cosbench archives and sibench output files. """
+
+    sheet = _open_sheet(args)
+    ok = ingest.run(args['<archive>'], args['--ingest-index'], args['--ingest-workers'], lambda r: _store_result(args, sheet, r))
+    exit(0 if ok else -1)
+
+
+def _handle_memo(args):
+    memos = memo.Memo(args['--memo-file'])
+
+    if   args['list']:       memos.list()
+    elif args['clear']:      memos.clear()
+    elif args['invalidate']: memos.invalidate(args['<memo-key>'])
+
+
 def _handle_iscsi(args):
     iargs = iscsi.IscsiArgs(
             args['<gateway>'],
@@ -397,9 +872,13 @@ def _handle_iscsi(args):
             args['--iscsi-image-size'],
             args['--iscsi-device-link'])
 
+    trace.start(args['--trace'])
+
     if   args['setup']:     iscsi.setup(iargs)
     elif args['teardown']:  iscsi.teardown(iargs)
 
+    trace.close()
+
 
 
 def main():
@@ -417,6 +896,17 @@ def main():
     elif args['block']:   _handle_block(args)
     elif args['file']:    _handle_file(args)
     elif args['iscsi']:   _handle_iscsi(args)
+    elif args['memo']:    _handle_memo(args)
+    elif args['ingest']:  _ingest(args)
+    elif args['selfbench']:
+        selfbench.run(
+                args['--selfbench-scale'],
+                args['--selfbench-size'],
+                args['--selfbench-history'],
+                args['--selfbench-threshold'],
+                args['--selfbench-dir'],
+                args['--selfbench-repeats'])
+    elif args['corpus']:  _handle_corpus(args)
 
 
 if __name__ == "__main__":
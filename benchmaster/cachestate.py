@@ -0,0 +1,166 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Control of the state of the caches before each measured run.
+
+What a point measures depends heavily on what was cached by whatever ran before it: the
+page cache on the load generators (for file and block), and the OSD caches in the cluster.
+So immediately before each measured window we can put the caches in a known state:
+
+    cold    Sync and drop the page cache on every load generator, and (with --cache-drop-osd)
+            have every OSD drop its cache.
+    warm    Read through the data set on every load generator, so that it is as cached as it
+            will get.  This only makes sense for the file and block protocols.
+    asis    Leave everything alone (the default).
+
+With a mix of 0, the write pass warms the caches for the read pass that follows it.  The
+native engine and the S3 load generator run in our own process, so they put the caches back
+into the state we want between their passes (through between_passes()).  Sibench, cosbench
+and fio run both passes in a single job that we can't break into, so we refuse to run them
+cold with a mix of 0, rather than report reads as cold when they weren't.
+
+What we did, and how long it took, is recorded in the result.
+"""
+
+import benchmaster.sizes as sizes
+import subprocess
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+_ssh_options = '-o UserKnownHostsFile=/dev/null -o StrictHostKeyChecking=no -o ConnectTimeout=10'
+
+_drop_caches = 'sync && echo 3 > /proc/sys/vm/drop_caches'
+
+# The block size with which we read through a block device to warm it.
+_warm_block = 4 * 1024 * 1024
+
+# The backends that call between_passes(), and those that run both passes in a single job.
+_between_passes_backends = ['native', 's3load']
+_single_job_backends = ['sibench', 'cosbench', 'fio']
+
+# The CacheControl of the sweep in progress, if we aren't leaving the caches alone.
+_control = None
+
+
+class CacheControl:
+    """ Puts the caches into a given state before each run, and records what it did. """
+
+    def __init__(self, state, drop_osd, server_pw, ceph_pw):
+        if state not in ['cold', 'warm', 'asis']:
+            print("Unknown cache state: {}".format(state))
+            exit(-1)
+
+        self.state = state
+        self.drop_osd = drop_osd
+        self.server_pw = server_pw
+        self.ceph_pw = ceph_pw
+
+
+    def __repr__(self): return str(vars(self))
+
+
+    def _run(self, host, password, cmd):
+        """ Run a shell command on a host (locally for localhost), and exit if it fails. """
+
+        if host != 'localhost':
+            cmd = "sshpass -p {} ssh {} root@{} '{}'".format(password, _ssh_options, host, cmd.replace("'", "'\\''"))
+
+        rc = subprocess.run(cmd, shell=True, capture_output=True)
+        if rc.returncode != 0:
+            print("Unable to set cache state on {}: {}".format(host, rc.stderr.decode('utf-8').strip()))
+            exit(-1)
+
+
+    def _on_all(self, hosts, cmd):
+        """ Run a command on all the hosts in parallel, and return how long it took. """
+
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=len(hosts)) as pool:
+            list(pool.map(lambda h: self._run(h, self.server_pw, cmd), hosts))
+        return time.time() - start
+
+
+    def _warm_command(self, spec):
+        """ A command that reads through the data set of a spec. """
+
+        protocol = spec.protocol
+        if protocol.name() == 'block':
+            size = int(sizes.parse(spec.object_size).mean_bytes() * int(spec.object_count))
+            blocks = -(-size // _warm_block)
+            return 'dd if={} of=/dev/null bs={} count={} 2>/dev/null'.format(protocol.device, _warm_block, blocks)
+
+        return 'find {} -type f -exec cat {{}} + > /dev/null'.format(protocol.directory)
+
+
+    def apply(self, spec):
+        """ Put the caches into our state for a spec, and return a summary of what we did. """
+
+        if self.state == 'asis':
+            return 'asis'
+
+        hosts = _load_generators(spec)
+        actions = []
+
+        if self.state == 'cold':
+            elapsed = self._on_all(hosts, _drop_caches)
+            actions.append("dropped page cache on {} hosts in {:.1f}s".format(len(hosts), elapsed))
+
+            if self.drop_osd:
+                start = time.time()
+                self._run(spec.protocol.targets()[0], self.ceph_pw, 'ceph tell osd.\\* cache drop')
+                actions.append("dropped OSD caches in {:.1f}s".format(time.time() - start))
+
+        else:
+            if spec.protocol.name() not in ['block', 'file']:
+                actions.append("nothing to warm for {}".format(spec.protocol.name()))
+            else:
+                elapsed = self._on_all(hosts, self._warm_command(spec))
+                actions.append("read data set on {} hosts in {:.1f}s".format(len(hosts), elapsed))
+
+        summary = "{}: {}".format(self.state, ', '.join(actions))
+        print("Cache state {}".format(summary))
+
+        if spec.read_write_mix == '0' and spec.backend.name() in _between_passes_backends:
+            summary += ", and again before the read pass"
+        return summary
+
+
+
+def _load_generators(spec):
+    """ The hosts whose page cache matters for a spec. """
+
+    backend = spec.backend
+    if backend.name() == 'sibench':
+        return backend.servers
+    if backend.name() == 'fio' and not backend.is_local():
+        return backend.servers
+    return ['localhost']
+
+
+
+def make(state, drop_osd, server_pw, ceph_pw, spec):
+    """ Build a CacheControl, or None if we are leaving the caches alone. """
+
+    if drop_osd and spec.protocol.name() not in ['s3', 'rados', 'rbd', 'cephfs']:
+        print("Can only drop OSD caches when the targets are ceph nodes")
+        exit(-1)
+
+    if state == 'cold' and spec.backend.name() in _single_job_backends and '0' in spec.read_write_mix.split(','):
+        print("Can't make the caches cold for the read pass of {} with a mix of 0, since its write pass runs".format(spec.backend.name()))
+        print("straight before it in the same job: use a mix, or the native engine or S3 load generator")
+        exit(-1)
+
+    global _control
+    control = CacheControl(state, drop_osd, server_pw, ceph_pw)
+    _control = None if state == 'asis' else control
+    return _control
+
+
+
+def between_passes(spec):
+    """ Put the caches back into our state between a write pass and the read pass that follows it. """
+
+    if _control is not None:
+        _control.apply(spec)
@@ -0,0 +1,162 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Background clean up of the data written by sweep points.
+
+Deleting a large object set sits on the critical path of every point in a sweep.  When
+pipelining, each point writes its objects under a prefix (or, for sibench, a bucket) of
+its own, so that its data can be deleted by a throttled background job while the next
+point is being set up.
+
+The next point must not start measuring until that job has finished: BackgroundCleanup.wait()
+is the barrier, and is called immediately before the measured window of every point.
+How much was deleted, how long it took, and how long we then had to wait at the barrier
+are all recorded in the result of the point that the clean up overlapped.
+"""
+
+import benchmaster.cosbench as cosbench
+import benchmaster.s3 as s3
+import benchmaster.sizes as sizes
+import benchmaster.units as units
+import copy
+import itertools
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+# How many keys we delete with each multi-object delete request.
+_batch_size = 100
+
+
+class BackgroundCleanup:
+    """ Deletes the data written by a single spec in a background thread. """
+
+    def __init__(self, spec, workers, dispose):
+        self.spec = spec
+        self.workers = int(workers)
+        self.dispose = dispose
+        self.objects = 0
+        self.bytes = 0
+        self.duration = 0
+        self.blocked = 0
+        self.error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._lock = threading.Lock()
+
+
+    def __str__(self):
+        summary = "{} objects, {} in {:.1f}s, {:.1f}s at barrier".format(
+                self.objects, units.format_bytes(self.bytes), self.duration, self.blocked)
+
+        if self.error is not None:
+            summary += " (failed: {})".format(self.error)
+
+        return summary
+
+
+    def start(self):
+        print("Starting background clean up of {} objects".format(self.spec.object_count))
+        self._thread.start()
+        return self
+
+
+    def wait(self):
+        """ Block until the clean up is complete. """
+
+        start = time.time()
+        self._thread.join()
+        self.blocked = time.time() - start
+
+        print("Background clean up finished: {}".format(self))
+        return self
+
+
+    def _run(self):
+        start = time.time()
+
+        try:
+            if self.spec.protocol.name() == 's3':
+                self._delete_s3()
+            else:
+                self.objects = cosbench.cleanup(self.spec, self.workers, self.dispose)
+                self.bytes = int(self.objects * sizes.parse(self.spec.object_size).mean_bytes())
+        except SystemExit as e:
+            # Cosbench gives up with exit() (having printed why), which would otherwise end only this thread.
+            self.error = 'exited with status {}'.format(e.code)
+        except Exception as e:
+            self.error = e
+
+        self.duration = time.time() - start
+
+
+    def _connections(self):
+        """ Returns a function that hands out a connection per thread, spread over the gateways. """
+
+        p = self.spec.protocol
+        gateways = itertools.cycle(p.targets())
+        local = threading.local()
+
+        def connection():
+            if not hasattr(local, 'conn'):
+                with self._lock:
+                    gateway = next(gateways)
+                local.conn = s3.connect(p.access_key, p.secret_key, gateway, p.port)
+            return local.conn
+
+        return connection
+
+
+    def _delete_s3(self):
+        if self.spec.backend.name() == 'cosbench':
+            buckets = cosbench.containers(self.spec)
+            prefix = cosbench.object_prefix + self.spec.point_prefix
+        else:
+            buckets = [self.spec.protocol.bucket]
+            prefix = ''
+
+        connection = self._connections()
+
+        def delete_batch(bucket_name, keys):
+            bucket = connection().get_bucket(bucket_name, validate=False)
+            bucket.delete_keys([k.name for k in keys], quiet=True)
+
+            with self._lock:
+                self.objects += len(keys)
+                self.bytes += sum(k.size for k in keys)
+
+        # The worker count is our throttle: each worker has at most one delete request in flight.
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for name in buckets:
+                bucket = connection().get_bucket(name, validate=False)
+                keys = list(bucket.list(prefix=prefix))
+                batches = [keys[i:i + _batch_size] for i in range(0, len(keys), _batch_size)]
+                list(pool.map(lambda b: delete_batch(name, b), batches))
+
+        if self.dispose or self.spec.backend.name() == 'sibench':
+            for name in buckets:
+                connection().delete_bucket(name)
+
+
+
+def plan(specs):
+    """ Mark up a list of flattened specs for pipelined clean up, giving each point its own objects. """
+
+    for i, s in enumerate(specs):
+        backend = s.backend.name()
+        protocol = s.protocol.name()
+
+        if backend != 'cosbench' and not (backend == 'sibench' and protocol == 's3'):
+            print("Pipelined clean up is not supported for {} with {}".format(backend, protocol))
+            exit(-1)
+
+        s.pipelined = True
+        s.point_prefix = 'p{}-'.format(i + 1)
+
+        # Sibench doesn't let us choose the names of its objects, so it gets a bucket per point instead.
+        if backend == 'sibench':
+            s.protocol = copy.copy(s.protocol)
+            s.protocol.bucket = '{}-{}'.format(s.protocol.bucket, s.point_prefix[:-1])
+
+    return specs
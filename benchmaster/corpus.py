@@ -0,0 +1,292 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Building and distributing corpora for sibench's slice generator.
+
+The slice generator makes its objects out of slices of the files in --sibench-slice-dir,
+which must exist on every sibench server.  A corpus is a directory of fixed-size files,
+plus a manifest (corpus.json) recording the slice size and count it was built for and the
+sha256 of every file.
+
+We build a corpus from source files (such as a sample of real customer data), or from
+synthetic data whose compressibility and dedupe ratio we control: a compressible
+percentage of each slice is zeros, and a dedupe percentage of the slices repeat an earlier
+one.  Either way it is generated a slice at a time and streamed out to its files, so we
+never hold more than a slice (and a small pool of slices for dedupe) in memory.
+
+Pushing a corpus compares the checksums on each server with the manifest, copies only
+what is missing or different (to all the servers in parallel), removes anything left over
+from an older corpus, and then checks the checksums again.  The manifest goes last, so
+that its presence means the copy completed.  Before a sibench sweep that uses the slice
+generator, we check each server's corpus in the same way.
+"""
+
+import benchmaster.units as units
+import hashlib
+import json
+import os
+import random
+import shutil
+import subprocess
+
+from concurrent.futures import ThreadPoolExecutor
+
+manifest_name = 'corpus.json'
+
+# How many distinct slices we keep around to repeat when deduping.
+_dedupe_pool = 64
+
+_ssh_options = '-o UserKnownHostsFile=/dev/null -o StrictHostKeyChecking=no -o ConnectTimeout=10'
+
+
+class Manifest:
+    """ The description of a corpus. """
+
+    def __init__(self, slice_size, slice_count, files):
+        self.slice_size = slice_size
+        self.slice_count = slice_count
+        self.files = files
+
+    def __repr__(self): return str(vars(self))
+
+
+
+def _source_slices(source, size):
+    """ Yield slices read from a file, or from all the files under a directory, round and round. """
+
+    if os.path.isdir(source):
+        paths = sorted(os.path.join(d, f) for d, _, files in os.walk(source) for f in files)
+    else:
+        paths = [source]
+
+    while True:
+        found = False
+        pending = b''
+        for p in paths:
+            with open(p, 'rb') as f:
+                while True:
+                    data = f.read(size - len(pending))
+                    if not data:
+                        break
+                    pending += data
+                    if len(pending) == size:
+                        found = True
+                        yield pending
+                        pending = b''
+
+        if not found:
+            print("Not enough data in {} for a single slice".format(source))
+            exit(-1)
+
+
+
+def _synthetic_slices(size, compressibility, dedupe):
+    """ Yield an endless stream of synthetic slices. """
+
+    rng = random.Random(0)
+    zeros = bytes(size * compressibility // 100)
+    pool = []
+
+    while True:
+        if pool and rng.random() * 100 < dedupe:
+            yield pool[rng.randrange(len(pool))]
+            continue
+
+        block = zeros + os.urandom(size - len(zeros))
+        if len(pool) < _dedupe_pool:
+            pool.append(block)
+        else:
+            pool[rng.randrange(len(pool))] = block
+        yield block
+
+
+
+def build(directory, slice_size, slice_count, file_size, source=None, compressibility=0, dedupe=0):
+    """ Build a corpus in a local directory. """
+
+    slice_size = int(slice_size)
+    slice_count = int(slice_count)
+    slices_per_file = max(1, units.to_bytes(file_size) // slice_size)
+    compressibility = int(compressibility)
+    dedupe = int(dedupe)
+
+    if not (0 <= compressibility <= 100 and 0 <= dedupe <= 100):
+        print("Compressibility and dedupe must be percentages")
+        exit(-1)
+
+    if source is not None:
+        slices = _source_slices(source, slice_size)
+    else:
+        slices = _synthetic_slices(slice_size, compressibility, dedupe)
+
+    os.makedirs(directory, exist_ok=True)
+
+    # Get rid of any older corpus first, so that it can't be mixed up with ours.
+    for f in os.listdir(directory):
+        if f.startswith('corpus-') or f == manifest_name:
+            os.remove(os.path.join(directory, f))
+
+    print("Building corpus of {} slices of {} bytes in {}".format(slice_count, slice_size, directory))
+    files = {}
+    written = 0
+    index = 0
+
+    while written < slice_count:
+        name = 'corpus-{:05d}'.format(index)
+        digest = hashlib.sha256()
+
+        with open(os.path.join(directory, name), 'wb') as f:
+            for i in range(min(slices_per_file, slice_count - written)):
+                data = next(slices)
+                f.write(data)
+                digest.update(data)
+                written += 1
+
+        files[name] = digest.hexdigest()
+        index += 1
+
+    with open(os.path.join(directory, manifest_name), 'w') as f:
+        json.dump(Manifest(slice_size, slice_count, files), f, default=vars, indent=3)
+
+    print("Built {} files, {}".format(len(files), units.format_bytes(slice_size * slice_count)))
+
+
+
+def load_manifest(directory):
+    with open(os.path.join(directory, manifest_name)) as f:
+        return Manifest(**json.load(f))
+
+
+
+def _remote(server, password, cmd):
+    """ Run a command on a server (or locally for localhost), and return its completed process. """
+
+    if server != 'localhost':
+        cmd = 'sshpass -p {} ssh {} root@{} {}'.format(password, _ssh_options, server, _quote(cmd))
+    return subprocess.run(cmd, shell=True, capture_output=True)
+
+
+
+def _quote(cmd):
+    return "'{}'".format(cmd.replace("'", "'\\''"))
+
+
+
+def _remote_checksums(server, password, directory):
+    """ A map from file name to sha256 of the corpus files on a server. """
+
+    rc = _remote(server, password, 'cd {} 2>/dev/null && sha256sum corpus-* 2>/dev/null'.format(directory))
+
+    checksums = {}
+    for line in rc.stdout.decode('utf-8').splitlines():
+        digest, name = line.split()
+        checksums[name.lstrip('*')] = digest
+    return checksums
+
+
+
+def _copy(server, password, local_dir, names, remote_dir):
+    paths = ' '.join(os.path.join(local_dir, n) for n in names)
+
+    if server == 'localhost':
+        for n in names:
+            shutil.copyfile(os.path.join(local_dir, n), os.path.join(remote_dir, n))
+        return
+
+    cmd = 'sshpass -p {} scp {} {} root@{}:{}/'.format(password, _ssh_options, paths, server, remote_dir)
+    subprocess.run(cmd, shell=True, capture_output=True, check=True)
+
+
+
+def _push_one(server, password, local_dir, remote_dir, manifest):
+    """ Bring the corpus on one server up to date with ours.  Returns an error message, or None. """
+
+    if server == 'localhost' and os.path.realpath(local_dir) == os.path.realpath(remote_dir):
+        return None
+
+    rc = _remote(server, password, 'mkdir -p {}'.format(remote_dir))
+    if rc.returncode != 0:
+        return rc.stderr.decode('utf-8').strip()
+
+    existing = _remote_checksums(server, password, remote_dir)
+    needed = [n for n, digest in manifest.files.items() if existing.get(n) != digest]
+    stale = [n for n in existing if n not in manifest.files]
+
+    print("{}: {} of {} files to copy, {} to remove".format(server, len(needed), len(manifest.files), len(stale)))
+
+    try:
+        # Take the manifest away while we change things, so that a part-copied corpus can't look complete.
+        _remote(server, password, 'rm -f {}'.format(' '.join(os.path.join(remote_dir, n) for n in stale + [manifest_name])))
+        if needed:
+            _copy(server, password, local_dir, needed, remote_dir)
+    except subprocess.CalledProcessError as e:
+        return e.stderr.decode('utf-8').strip()
+
+    if _remote_checksums(server, password, remote_dir) != manifest.files:
+        return "checksums do not match after copying"
+
+    _copy(server, password, local_dir, [manifest_name], remote_dir)
+    return None
+
+
+
+def push(directory, servers, password, remote_dir, workers):
+    """ Push a local corpus to all the servers. """
+
+    manifest = load_manifest(directory)
+
+    with ThreadPoolExecutor(max_workers=int(workers)) as pool:
+        errors = list(pool.map(lambda s: _push_one(s, password, directory, remote_dir, manifest), servers))
+
+    failed = False
+    for s, e in zip(servers, errors):
+        if e is None:
+            print("{}: corpus verified".format(s))
+        else:
+            print("{}: unable to push corpus: {}".format(s, e))
+            failed = True
+
+    if failed:
+        exit(-1)
+
+
+
+def _verify_one(server, password, directory, slice_size, slice_count):
+    """ Check the corpus on a server.  Returns an error message, or None. """
+
+    rc = _remote(server, password, 'cat {}'.format(os.path.join(directory, manifest_name)))
+    if rc.returncode != 0:
+        return "no {} in {}".format(manifest_name, directory)
+
+    try:
+        manifest = Manifest(**json.loads(rc.stdout.decode('utf-8')))
+    except (ValueError, TypeError):
+        return "unreadable {}".format(manifest_name)
+
+    if manifest.slice_size != int(slice_size) or manifest.slice_count < int(slice_count):
+        return "corpus has {} slices of {} bytes, but we want {} of {}".format(
+                manifest.slice_count, manifest.slice_size, slice_count, slice_size)
+
+    if _remote_checksums(server, password, directory) != manifest.files:
+        return "checksums do not match the manifest"
+
+    return None
+
+
+
+def verify(servers, password, directory, slice_size, slice_count):
+    """ Check that every server has a complete corpus that matches our slice options, and exit if not. """
+
+    print("Verifying slice corpus on {}".format(', '.join(servers)))
+
+    with ThreadPoolExecutor(max_workers=len(servers)) as pool:
+        errors = list(pool.map(lambda s: _verify_one(s, password, directory, slice_size, slice_count), servers))
+
+    failed = [(s, e) for s, e in zip(servers, errors) if e is not None]
+    for s, e in failed:
+        print("{}: {}".format(s, e))
+
+    if failed:
+        print("Slice corpus is missing or wrong; use 'benchmaster sibench corpus push' to fix it")
+        exit(-1)
@@ -7,34 +7,56 @@ import json
 import numbers
 import os
 import re
+import benchmaster.abort as abort
+import benchmaster.progress as progress
 import benchmaster.s3 as s3
+import benchmaster.sizes as sizes
 import benchmaster.spec as s3
+import benchmaster.trace as trace
 import subprocess
 import time
 
 from datetime import datetime
+from xml.etree import ElementTree
 from benchmaster.result import Result, DirectionResult
 
-_cosbench_dir = '/usr/share/cosbench'
+# Where cosbench is installed, which may be replaced (with the fake cosbench, say) through the environment.
+_cosbench_dir = os.environ.get('BENCHMASTER_COSBENCH_DIR', '/usr/share/cosbench')
+
+# The range of intervals (in seconds) at which we poll a running job.
+_min_poll_interval = 1
+_max_poll_interval = 16
+
+# The prefix of the names of all the objects we create.
+object_prefix = 'CB-'
 
 
 class CosbenchValues:
     """ Pull out all the stuff we need from the spec and convert to Cosbench's view of the world. """
 
     def __init__(self, spec):
-        if not re.match("\d+[KMG]", spec.object_size):
-            print("Invalid object size for cosbench: {}.  Sizes should be digits followed by K, M or G.".format(spec.object_size))
+        try:
+            self.sizes = sizes.parse(spec.object_size).cosbench_expr()
+        except (ValueError, OSError) as e:
+            print("Invalid object size for cosbench: {}.  {}".format(spec.object_size, e))
             exit(-1) 
         
         # Extract our common info
-        self.object_size_digits = spec.object_size[:-1]
-        self.object_size_units = spec.object_size[-1:]
         self.object_count = spec.object_count
         self.read_write_mix  = int(spec.read_write_mix)
         self.xml_file = spec.backend.xml_file
         self.workers = spec.backend.workers()
         self.targets = spec.protocol.targets()
 
+        # The objects are spread as evenly as they can be over the containers: every container has
+        # objects_per_container of them, and the first extra_objects containers have one more.
+        self.containers = int(spec.backend.containers)
+        if int(self.object_count) < self.containers:
+            print("Cosbench needs at least as many objects ({}) as containers ({})".format(self.object_count, self.containers))
+            exit(-1)
+
+        self.objects_per_container, self.extra_objects = divmod(int(self.object_count), self.containers)
+
         if self.read_write_mix > 100: self.read_write_mix = 100
         if self.read_write_mix < 0: self.read_write_mix = 0
 
@@ -82,6 +104,17 @@ class CosbenchValues:
             print("Unknown protocol for Cosbench: {}".format(p.name()))
             exit(-1)
 
+        # If the previous run left us compatible data then we don't need to create it again, and if the 
+        # next run wants to use our data then we mustn't delete it.
+        self.do_prepare = prepares(spec, spec.reuse_data, spec.keep_data)
+        self.do_work = True
+        self.do_cleanup = not spec.keep_data
+        self.do_create = self.do_create and not spec.reuse_data
+        self.do_dispose = self.do_dispose and self.do_cleanup
+
+        # When pipelining, each point writes objects with a prefix of its own.
+        self.object_prefix = object_prefix + spec.point_prefix
+
 
 
 def _build_url(protocol, host, port):
@@ -98,6 +131,41 @@ def _build_url(protocol, host, port):
 
 
 
+def _split(first, last, parts):
+    """ Split the range first..last (inclusive) into contiguous, disjoint ranges: as many as
+        we were asked for, unless there aren't enough values to go round. """
+
+    total = last - first + 1
+    parts = max(1, min(parts, total))
+
+    ranges = []
+    start = first
+    for i in range(parts):
+        size = total // parts + (1 if i < total % parts else 0)
+        ranges.append((start, start + size - 1))
+        start += size
+
+    return ranges
+
+
+
+def _target_ranges(cv, index):
+    """ Returns the ranges of containers and objects used by the work for a target.  If there are
+        enough containers then each target gets some to itself, otherwise they split the objects.
+        Only the objects that every container has are used, so that none of them can be missing. """
+
+    all_containers = (1, cv.containers)
+    all_objects = (1, cv.objects_per_container)
+
+    if cv.containers >= len(cv.targets):
+        ranges = _split(1, cv.containers, len(cv.targets))
+        return (ranges[index], all_objects)
+
+    ranges = _split(1, cv.objects_per_container, len(cv.targets))
+    return (all_containers, ranges[index % len(ranges)])
+
+
+
 def _header(cv):
     url = _build_url(cv.url_protocol, cv.targets[0], cv.port)
     time = datetime.now()
@@ -112,9 +180,9 @@ def _header(cv):
 
  
 def _bucket_creation(cv):
-    result =  '    <!-- Bucket Creation Workstage: creates 1 Bucket-->\n'
+    result =  '    <!-- Bucket Creation Workstage: creates {} Bucket(s)-->\n'.format(cv.containers)
     result += '    <workstage name="bucket-create">\n'
-    result += '      <work type="init" workers="1" config="cprefix={};containers=r(1,1)" />\n'.format(cv.container_prefix)
+    result += '      <work type="init" workers="1" config="cprefix={};containers=r(1,{})" />\n'.format(cv.container_prefix, cv.containers)
     result += '    </workstage>\n\n'
     return result
 
@@ -128,24 +196,48 @@ def _storage(cv, target):
 
 
 
+def _target_works(cv, work_type, config):
+    """ Builds one work per target, each handling a disjoint range of the objects in every container,
+        so that the load is spread over all of the targets.  The objects that only some containers
+        have are left to one more work, which the first target handles. """
+
+    result = ''
+    ranges = _split(1, cv.objects_per_container, len(cv.targets))
+
+    for t, objects in zip(cv.targets, ranges):
+        result += '      <work name="{}-{}" type="{}" workers="{}" '.format(work_type, t, work_type, cv.workers)
+        result += 'config="cprefix={};containers=r(1,{});'.format(cv.container_prefix, cv.containers)
+        result += 'oprefix={};objects=r({},{});{}">\n'.format(cv.object_prefix, objects[0], objects[1], config)
+        result += '        {}'.format(_storage(cv, t))
+        result += '      </work>\n'
+
+    if cv.extra_objects:
+        t = cv.targets[0]
+        extra = cv.objects_per_container + 1
+        result += '      <work name="{}-{}-extra" type="{}" workers="{}" division="container" '.format(
+                work_type, t, work_type, min(int(cv.workers), cv.extra_objects))
+        result += 'config="cprefix={};containers=r(1,{});'.format(cv.container_prefix, cv.extra_objects)
+        result += 'oprefix={};objects=r({},{});{}">\n'.format(cv.object_prefix, extra, extra, config)
+        result += '        {}'.format(_storage(cv, t))
+        result += '      </work>\n'
+
+    return result
+
+
+
 def _prepare(cv):
     result =  '    <workstage name="prepare">\n'
-    result += '      <work type="prepare" workers="{}" '.format(cv.workers)
-    result += 'config="cprefix={};containers=r(1,1;'.format(cv.container_prefix)
-    result += 'oprefix=CB-;objects=r(1,{});'.format(cv.object_count)
-    result += 'sizes=c({}){}B">\n'.format(cv.object_size_digits, cv.object_size_units)
-    result += '        {}'.format(_storage(cv, cv.targets[0]))
-    result += '      </work>\n\n'
+    result += _target_works(cv, 'prepare', 'sizes={}'.format(cv.sizes))
     result += '    </workstage>\n\n'
     return result
 
 
 
-def _operation(cv, test_type, ratio):
+def _operation(cv, test_type, ratio, containers, objects):
     result  = '        <operation type="{}" ratio="{}" '.format(test_type, ratio)
-    result += 'config="cprefix={};containers=c(1);'.format(cv.container_prefix)
-    result += 'oprefix=CB-;objects=r(1,{});'.format(cv.object_count)
-    result += 'sizes=c({}){}B;content=zero"/>\n'.format(cv.object_size_digits, cv.object_size_units)
+    result += 'config="cprefix={};containers=r({},{});'.format(cv.container_prefix, *containers)
+    result += 'oprefix={};objects=r({},{});'.format(cv.object_prefix, *objects)
+    result += 'sizes={};content=zero"/>\n'.format(cv.sizes)
     return result
 
 
@@ -154,16 +246,21 @@ def _work(cv, test_type):
     result =  '    <!-- {} Workstage -->\n'.format(test_type)
     result += '    <workstage name="{}">\n'.format(test_type)
    
-    for t in cv.targets: 
-        result += '      <work name="{}-{}" workers="{}" division="container" '.format(test_type, t, cv.workers)
+    for i, t in enumerate(cv.targets): 
+        containers, objects = _target_ranges(cv, i)
+
+        # Cosbench divides the containers (or objects) in each work between its workers.
+        division = "container" if containers[1] - containers[0] + 1 >= int(cv.workers) else "object"
+
+        result += '      <work name="{}-{}" workers="{}" division="{}" '.format(test_type, t, cv.workers, division)
         result += cv.runtype + '>\n'
         result += '        ' + _storage(cv, t)
 
         if test_type == 'read/write':
-            result += _operation(cv, "read", cv.read_write_mix)
-            result += _operation(cv, "write", 100 - cv.read_write_mix)
+            result += _operation(cv, "read", cv.read_write_mix, containers, objects)
+            result += _operation(cv, "write", 100 - cv.read_write_mix, containers, objects)
         else:
-            result += _operation(cv, test_type, 100)
+            result += _operation(cv, test_type, 100, containers, objects)
 
         result += '      </work>\n'
     
@@ -173,16 +270,17 @@ def _work(cv, test_type):
 
 
 def _cleanup(cv):
-    return ('    <workstage name="cleanup">\n'
-            '      <work type="cleanup" workers="{}" config="cprefix={};containers=r(1,1);oprefix=CB-;objects=r(1,{});" />\n'
-            '    </workstage>\n\n').format(cv.workers, cv.container_prefix, cv.object_count)
+    result =  '    <workstage name="cleanup">\n'
+    result += _target_works(cv, 'cleanup', '')
+    result += '    </workstage>\n\n'
+    return result
 
 
 
 def _dispose(cv):
     return ('    <workstage name="dispose">\n'
-            '      <work type="dispose" workers="1" config="cprefix={};containers=r(1,1)" />\n'
-            '    </workstage>\n\n').format(cv.container_prefix)
+            '      <work type="dispose" workers="1" config="cprefix={};containers=r(1,{})" />\n'
+            '    </workstage>\n\n').format(cv.container_prefix, cv.containers)
 
 
 
@@ -192,6 +290,50 @@ def _footer():
 
 
 
+def _stages(cv):
+    """ Build the list of workstages that the values ask for. """
+
+    stages = []
+    if cv.do_create: stages.append(_bucket_creation(cv))
+    if cv.do_prepare: stages.append(_prepare(cv))
+
+    if cv.do_work:
+        if cv.read_write_mix == 0:
+            stages.append(_work(cv, "write"))
+            stages.append(_work(cv, "read"))
+        else:
+            stages.append(_work(cv, "read/write"))
+
+    if cv.do_cleanup: stages.append(_cleanup(cv))
+    if cv.do_dispose: stages.append(_dispose(cv))
+    return stages
+
+
+
+def _job_xml_file(spec, job):
+    """ The XML file for a job other than the measured one.  A background clean up is generated and
+        submitted while the next point is, so each job (of each point) needs a file of its own. """
+
+    root, ext = os.path.splitext(spec.backend.xml_file)
+    name = '{}-{}'.format(root, job)
+    if spec.point_prefix:
+        name += '-' + spec.point_prefix.rstrip('-')
+    return name + ext
+
+
+
+def _submit_job(cv):
+    """ Generate and submit the workload of a job other than the measured one, and return its ID.
+        Cosbench keeps its own copy of the workload, so we don't keep the file. """
+
+    _generate_xml(cv)
+    try:
+        return _submit(cv)
+    finally:
+        os.remove(cv.xml_file)
+
+
+
 def _generate_xml(cv):
     """ Generate a single XML test file for Cosbench from a Spec object."""
 
@@ -199,19 +341,8 @@ def _generate_xml(cv):
 
     with open(cv.xml_file, "w") as f:
         f.write(_header(cv))
-        if cv.do_create: f.write(_bucket_creation(cv))
-
-        if cv.read_write_mix == 0:
-            if cv.runtype == 'time':
-                f.write(_prepare(cv))
-            f.write(_work(cv, "write"))
-            f.write(_work(cv, "read"))
-        else:
-            f.write(_prepare(cv))
-            f.write(_work(cv, "read/write"))
-
-        f.write(_cleanup(cv))
-        if cv.do_dispose: f.write(_dispose(cv))
+        for stage in _stages(cv):
+            f.write(stage)
         f.write(_footer())
 
 
@@ -269,81 +400,96 @@ def _match_at_least_one(value, patterns, case_sensitive=True):
 
 
 class FieldSpec:
-    def __init__(self, key, preprocess_fn, format_fn, should_average):
+    def __init__(self, key, preprocess_fn, format_fn, aggregate):
+        """ Aggregate says how we combine values from multiple rows (one per container or work, say):
+            'sum' them, take their 'max', or take their 'mean' weighted by each row's op count. """
         self.key = key
         self.preprocess_fn = preprocess_fn
         self.format_fn = format_fn
-        self.should_average = should_average
+        self.aggregate = aggregate
+
+
+
+def _row_direction(row):
+    """ Work out whether a row holds read or write stats.  We use the op type if there is one, since a 
+        mixed stage has a row for each, and otherwise fall back to the name of the stage. """
+
+    name = row.get('Op-Type') or row['Stage']
+    if name.endswith('write'): return 'Write '
+    if name.endswith('read'):  return 'Read '
+    return None
 
 
 
 def _process_results(filename):
-    """ Gather the results from the file and return them as a list of rows, each of which is a list of maps. """
+    """ Gather the results from the file and return them as a map from field name to value. """
 
     # A set of regexes that we match against stage names.  We only record details for a stage if at least one matches.
     stages_of_interest = ['read', 'write']
 
     # The fields we are interested in
     field_specs = [
-        FieldSpec('Bandwidth', None, _gbits_format, False),
-        FieldSpec('95%-ResTime', None, None, True),
-        FieldSpec('100%-ResTime', None, None, True),
-        FieldSpec('Avg-ResTime', None, None, True),
-        FieldSpec('Op-Count', None, None, False),
-        FieldSpec('Succ-Ratio', _strip_units, None, True)
+        FieldSpec('Bandwidth', None, _gbits_format, 'sum'),
+        FieldSpec('95%-ResTime', None, None, 'mean'),
+        FieldSpec('100%-ResTime', None, None, 'max'),
+        FieldSpec('Avg-ResTime', None, None, 'mean'),
+        FieldSpec('Op-Count', None, None, 'sum'),
+        FieldSpec('Succ-Ratio', _strip_units, None, 'mean')
     ]
 
     totals = {}
-    counts = {}
-    fields_by_column = {}
+    weights = {}
     
     with open(filename) as f:
         csv_reader = csv.DictReader(f)
 
         for row in csv_reader:
-            for fs in field_specs:
-                fields_by_column[fs.key] = fs
-
-                if fs.key in row:
-                    stage = row["Stage"]
-                    if _match_at_least_one(stage, stages_of_interest, case_sensitive=False):
-                        if stage not in totals:
-                            totals[stage] = {}
-                            counts[stage] = {}
+            if not _match_at_least_one(row["Stage"], stages_of_interest, case_sensitive=False):
+                continue
 
-                        if fs.key not in totals[stage]:
-                            totals[stage][fs.key] = 0
-                            counts[stage][fs.key] = 0
+            prefix = _row_direction(row)
+            if prefix is None:
+                continue
 
-                        try:
-                            val = row[fs.key]
-                            if fs.preprocess_fn is not None:
-                                val = fs.preprocess_fn(val)
+            try:
+                weight = float(row.get('Op-Count', 1))
+            except ValueError:
+                weight = 1
 
-                            totals[stage][fs.key] += float(val)
-                            counts[stage][fs.key] += 1
-                        except:
-                            pass
+            for fs in field_specs:
+                if fs.key not in row:
+                    continue
+
+                try:
+                    val = row[fs.key]
+                    if fs.preprocess_fn is not None:
+                        val = fs.preprocess_fn(val)
+                    val = float(val)
+                except:
+                    continue
+
+                key = prefix + fs.key
+                if fs.aggregate == 'sum':
+                    totals[key] = totals.get(key, 0) + val
+                elif fs.aggregate == 'max':
+                    totals[key] = max(totals.get(key, val), val)
+                else:
+                    totals[key] = totals.get(key, 0) + val * weight
+                    weights[key] = weights.get(key, 0) + weight
 
     results = {}
+    fields_by_column = {fs.key: fs for fs in field_specs}
 
-    for stage, values in totals.items():
-        if stage.endswith('write'): prefix = 'Write '
-        if stage.endswith('read'):  prefix = 'Read '
+    for key, value in totals.items():
+        fs = fields_by_column[key.split(' ', 1)[1]]
 
-        for key, value in values.items():
-            fs = fields_by_column[key]
+        if fs.aggregate == 'mean' and weights[key] != 0:
+            value = value / weights[key]
 
-            if fs.should_average:
-                count = counts[stage][key]
-                if count != 0:
-                    value = value / count
+        if fs.format_fn is not None:
+            value = fs.format_fn(value)
 
-            if fs.format_fn is not None:
-                value = fs.format_fn(value)
-            
-            if prefix is not None:
-                results[prefix + key] = str(value)
+        results[key] = str(value)
 
     return results
 
@@ -364,16 +510,69 @@ def _submit(cv):
 
 
 
-def _wait_for_results(cosbench_id):
-    """ Wait for the job to complete (or fail) and then return the results as a list of rows, each 
-        of which is a map from field name to value. """
+def _cancel(cosbench_id):
+    """ Cancel a running job. """
+
+    print("Cancelling job {}".format(cosbench_id))
+    cmd = ['{}/cli.sh'.format(_cosbench_dir), 'cancel', cosbench_id]
+    subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+
+def _current_stage(cosbench_id):
+    """ Ask cosbench which stage a job is in, or return None if it can't tell us. """
+
+    cmd = ['{}/cli.sh'.format(_cosbench_dir), 'info']
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+    # Active workloads are listed as: <id> <submission time> <state> <current stage>
+    for line in result.stdout.decode('utf-8').splitlines():
+        fields = line.split()
+        if fields and fields[0] == cosbench_id:
+            return fields[-1]
+
+    return None
+
+
+
+def _wait_for_csv(cosbench_id, report=True):
+    """ Wait for the job to complete (or fail) and then return the path of its result CSV file.
+        We poll quickly while the job is changing stage, and back off while it's in a long one.
+        If our abort policy cancels the job, we raise abort.Aborted. """
 
     print("Waiting for job to complete\n")
 
+    interval = _min_poll_interval
+    stage = None
+
+    if report:
+        progress.on_abort(lambda: _cancel(cosbench_id))
+
     while not glob.glob("{}/archive/{}-*".format(_cosbench_dir, cosbench_id)):
-        time.sleep(2)
+        time.sleep(interval)
+
+        if report:
+            current = _current_stage(cosbench_id)
+            if current != stage:
+                stage = current
+                interval = _min_poll_interval
+            else:
+                interval = min(interval * 2, _max_poll_interval)
+
+            # Report even when nothing has changed, so that the abort policy can notice a stall.
+            progress.report(phase=stage)
+
+            if progress.aborted() is not None:
+                progress.on_abort(None)
+                raise abort.Aborted(progress.aborted())
+
+    if report:
+        progress.on_abort(None)
     
-    filepaths = glob.glob(os.path.join("{}/archive".format(_cosbench_dir), '*{0}*/*{0}*.csv'.format(cosbench_id, cosbench_id)))
+    filepaths = glob.glob(os.path.join("{}/archive".format(_cosbench_dir), '{0}-*/{0}-*.csv'.format(cosbench_id)))
 
     filtered = []
     for fp in filepaths:
@@ -390,52 +589,260 @@ def _wait_for_results(cosbench_id):
         print("Can't find a result CSV file for: {}".format(cosbench_id))
         exit(-1)
 
-    return _process_results(filtered[0])
+    return filtered[0]
+
+
+
+def prepares(spec, reused, kept):
+    """ Whether a point runs a prepare stage, given whether it reuses the objects of the point before it
+        and keeps its own for the point after it.  Separate write and read passes can go without one, since
+        the write pass writes the objects, unless it is timed (and so may not get round to all of them) or
+        later points will read the objects too. """
+
+    if reused:
+        return False
+
+    return int(spec.read_write_mix) > 0 or spec.runtype.name() == 'time' or kept
+
+
+
+def containers(spec):
+    """ The names of the containers (buckets or pools) that a spec will use. """
+    cv = CosbenchValues(spec)
+    return ['{}{}'.format(cv.container_prefix, i) for i in range(1, cv.containers + 1)]
+
+
+
+def prepare(spec):
+    """ When pipelining, we run the preparation stages of a point as a job of their own, so that
+        nothing else is running on the cluster when the measured stages start. """
+
+    if not spec.pipelined:
+        return
+
+    cv = CosbenchValues(spec)
+    cv.do_work = False
+    cv.do_cleanup = False
+    cv.do_dispose = False
+
+    if not _stages(cv):
+        return
+
+    cv.xml_file = _job_xml_file(spec, 'prepare')
+    with trace.phase('submit job'):
+        id = _submit_job(cv)
+    with trace.phase('wait for preparation'):
+        _wait_for_csv(id)
+
+
+
+def cleanup(spec, workers, dispose):
+    """ Run a job that deletes the objects created by a spec, and optionally its containers.
+        We return the number of objects deleted. """
+
+    cv = CosbenchValues(spec)
+    cv.workers = workers
+    cv.do_create = False
+    cv.do_prepare = False
+    cv.do_work = False
+    cv.do_cleanup = True
+    cv.do_dispose = dispose and cv.storage_type == 's3'
+    cv.xml_file = _job_xml_file(spec, 'cleanup')
+
+    # This runs in the background, so it mustn't confuse the progress reports of the point in the foreground.
+    _wait_for_csv(_submit_job(cv), report=False)
+    return int(cv.object_count)
 
 
 
 def run(spec):
+    return process(spec, execute(spec))
+
+
+
+def execute(spec):
+    """ Run the job, and return a tuple of its cosbench ID and the path to its result CSV. """
+
     # Build up all our data.
     cv = CosbenchValues(spec)
+
+    # When pipelining, preparation has been done in a job of its own, and clean up happens in the background.
+    if spec.pipelined:
+        cv.do_create = False
+        cv.do_prepare = False
+        cv.do_cleanup = False
+        cv.do_dispose = False
     
     # Write out an XML file to submit to cosbench.
-    _generate_xml(cv)
+    with trace.phase('generate xml'):
+        _generate_xml(cv)
 
     # Submit it and store the ID it hands back.
-    id = _submit(cv)
+    with trace.phase('submit job'):
+        id = _submit(cv)
+
+    # Wait for cosbench to complete.  Cosbench doesn't tell us when its measured stages start, so the
+    # whole job counts as measured (and so does any preparation in it, unless we're pipelining).
+    with trace.phase('wait for job', measured=True):
+        return (id, _wait_for_csv(id))
+
+
+
+def process(spec, output):
+    """ Build a Result from the cosbench ID and result CSV of a job. """
 
-    # Wait for cosbench to complete.  It returns a map of all the interesting cosbench fields.
-    vals = _wait_for_results(id)
+    id, csv_file = output
+
+    # Pull out a map of all the interesting cosbench fields.
+    with trace.phase('parse cosbench csv'):
+        vals = _process_results(csv_file)
 
     # Build a results object.
     result = Result(spec)
     result.id = id
+
+    # Each target gets its own set of workers.
+    result.workers = int(spec.backend.workers()) * len(spec.protocol.targets())
    
-    # Fill in the Read stats 
-    r_successes = int(float(vals['Read Op-Count']) * float(vals['Read Succ-Ratio']) / 100)
-    r_fails = int(float(vals['Read Op-Count'])) - r_successes
+    result.read = _direction_result(vals, 'Read')
+    result.write = _direction_result(vals, 'Write')
+    return result
 
-    result.read = DirectionResult(
-            vals['Read Bandwidth'], 
-            '-', 
-            vals['Read 100%-ResTime'], 
-            vals['Read 95%-ResTime'],
-            vals['Read Avg-ResTime'],
-            r_successes, 
-            r_fails)
-
-    # Fill in the Write stats
-    w_successes = int(float(vals['Write Op-Count']) * float(vals['Write Succ-Ratio']) / 100)
-    w_fails = int(float(vals['Write Op-Count'])) - w_successes
-
-    result.write = DirectionResult(
-            vals['Write Bandwidth'], 
+
+
+def _direction_result(vals, direction):
+    """ Build a DirectionResult from the cosbench fields for a direction ('Read' or 'Write'). """
+
+    successes = int(float(vals[direction + ' Op-Count']) * float(vals[direction + ' Succ-Ratio']) / 100)
+    fails = int(float(vals[direction + ' Op-Count'])) - successes
+
+    return DirectionResult(
+            vals[direction + ' Bandwidth'], 
             '-', 
-            vals['Write 100%-ResTime'], 
-            vals['Write 95%-ResTime'],
-            vals['Write Avg-ResTime'],
-            r_successes, 
-            r_fails)
-    
+            vals[direction + ' 100%-ResTime'], 
+            vals[direction + ' 95%-ResTime'],
+            vals[direction + ' Avg-ResTime'],
+            successes, 
+            fails)
+
+
+
+def _archived_csv(directory, cosbench_id):
+    """ The result CSV of a job in the archive, or None if it doesn't have one. """
+
+    found = [f for f in glob.glob(os.path.join(directory, '{}-*.csv'.format(cosbench_id))) if 'histogram' not in f]
+    return found[0] if len(found) == 1 else None
+
+
+
+def _workload_values(xml_file):
+    """ Recover what we can of the parameters of a job from its workload config.
+        Returns a map of Result fields. """
+
+    root = ElementTree.parse(xml_file).getroot()
+    values = {}
+
+    storage = root.find('storage')
+    storage_type = storage.get('type') if storage is not None else None
+    values['protocol'] = {'s3': 's3', 'librados': 'rados'}.get(storage_type, storage_type or '-')
+
+    # The measured stages are the ones whose works have a run time or op count.
+    works = [w for w in root.iter('work') if w.get('runtime') or w.get('totalOps')]
+    if not works:
+        raise ValueError("no measured work stages")
+
+    first = works[0]
+    if first.get('runtime'):
+        values['schedule'] = s3.TimeSpec(first.get('runtime'), first.get('rampup', '0'), first.get('rampdown', '0')).schedule()
+    else:
+        values['schedule'] = s3.OpsSpec(first.get('totalOps')).schedule()
+
+    # Each target gets a work of its own in each stage, so the first stage tells us about the targets.
+    stage = list(next(s for s in root.iter('workstage') if first in list(s)))
+    targets = set()
+    for w in stage:
+        config = w.find('storage').get('config', '') if w.find('storage') is not None else ''
+        endpoint = re.search(r'endpoint=(?:\w+://)?([^:;]+)', config)
+        if endpoint:
+            targets.add(endpoint.group(1))
+
+    values['targets'] = len(targets) or len(stage)
+    values['workers'] = sum(int(w.get('workers', 0)) for w in stage)
+
+    operations = [w.findall('operation') for w in stage]
+    ops = dict((o.get('type'), o) for o in operations[0])
+    if 'read' in ops and 'write' in ops:
+        read = int(ops['read'].get('ratio'))
+        values['read_write_mix'] = "{}:{}".format(read, 100 - read)
+    else:
+        values['read_write_mix'] = "Separate passes"
+
+    config = dict(kv.split('=', 1) for kv in operations[0][0].get('config', '').split(';') if '=' in kv)
+    values['object_size'] = str(sizes.from_cosbench_expr(config['sizes']))
+
+    # The works' containers and objects are disjoint, so between them they cover the whole pool.  The
+    # preparation (or cleanup) works, when there are any, also cover the objects that only some containers have.
+    for kind in ['prepare', 'cleanup']:
+        configs = [w.get('config', '') for w in root.iter('work') if w.get('type') == kind]
+        if configs:
+            break
+    else:
+        configs = [w[0].get('config', '') for w in operations]
+
+    count = 0
+    for config in configs:
+        c = dict(kv.split('=', 1) for kv in config.split(';') if '=' in kv)
+        containers = [int(n) for n in re.findall(r'\d+', c['containers'])]
+        objects = [int(n) for n in re.findall(r'\d+', c['objects'])]
+        count += (containers[-1] - containers[0] + 1) * (objects[-1] - objects[0] + 1)
+    values['object_count'] = str(count)
+
+    return values
+
+
+
+def archived_result(directory, history):
+    """ Rebuild the Result of a job from its directory in the cosbench archive.  History is a map from
+        job ID to its row in the archive's run-history.csv (which may be empty). """
+
+    cosbench_id = os.path.basename(os.path.normpath(directory)).split('-')[0]
+
+    csv_file = _archived_csv(directory, cosbench_id)
+    if csv_file is None:
+        raise ValueError("no result CSV")
+
+    vals = _process_results(csv_file)
+    run = history.get(cosbench_id, {})
+
+    values = _workload_values(os.path.join(directory, 'workload-config.xml'))
+    values.update({
+        'id': cosbench_id,
+        'backend': 'cosbench',
+        'description': 'Ingested from {}'.format(directory),
+        'start_time': run.get('Started-At', '-'),
+        'end_time': run.get('Stopped-At', '-')
+    })
+
+    state = run.get('State', 'finished')
+    if state != 'finished':
+        values['status'] = state
+
+    missing = DirectionResult('-', '-', '-', '-', '-', '-', '-')
+
+    result = Result.from_dict(values)
+    result.read = _direction_result(vals, 'Read') if 'Read Op-Count' in vals else missing
+    result.write = _direction_result(vals, 'Write') if 'Write Op-Count' in vals else missing
     return result
 
+
+
+def archive_history(archive_dir):
+    """ Read the run history of a cosbench archive, as a map from job ID to its row. """
+
+    filename = os.path.join(archive_dir, 'run-history.csv')
+    if not os.path.exists(filename):
+        return {}
+
+    with open(filename) as f:
+        return {row['Id']: row for row in csv.DictReader(f) if row.get('Id')}
+
@@ -0,0 +1,78 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Tracking of the data set that a benchmark leaves behind on the cluster.
+
+Every benchmark writes a set of objects before it can measure anything, and (normally)
+deletes them again when it is done.  When consecutive points in a sweep use exactly the
+same objects, that write/delete cycle is wasted effort: the next point could simply use
+what the previous one left behind.
+
+A Dataset captures everything that determines the layout of those objects.  Two points
+whose Datasets compare equal are compatible, and a sweep can be planned so that only
+the first point of a compatible run prepares the data, and only the last cleans it up.
+"""
+
+
+class Dataset:
+    """ The objects written by a single benchmark. """
+    def __init__(self, backend, protocol, container, containers, object_size, object_count, prefix, side=None):
+        self.backend = backend
+        self.protocol = protocol
+        self.container = container
+        self.containers = containers
+        self.object_size = object_size
+        self.object_count = object_count
+        self.prefix = prefix
+
+        # The two sides of an A/B comparison may be different clusters, so never share data.
+        self.side = side
+
+    def __repr__(self): return str(vars(self))
+    def __eq__(self, other): return isinstance(other, Dataset) and vars(self) == vars(other)
+    def __hash__(self): return hash(tuple(vars(self).values()))
+
+
+
+def _containers(spec):
+    """ The number of containers that the objects are spread over.  Only cosbench uses more than one. """
+    return int(getattr(spec.backend, 'containers', 1))
+
+
+
+def from_spec(spec):
+    """ Build the Dataset that will be left behind by running a (flattened) spec. """
+    return Dataset(
+            spec.backend.name(),
+            spec.protocol.name(),
+            spec.protocol.container(),
+            _containers(spec),
+            spec.object_size,
+            spec.object_count,
+            spec.backend.object_prefix() + spec.point_prefix,
+            spec.side)
+
+
+
+def sharing(specs):
+    """ Returns a list of (reuse, keep) tuples for a list of flattened specs: whether each point can
+        reuse the dataset left by the point before it, and whether the point after it can reuse its own. """
+
+    datasets = [from_spec(s) for s in specs]
+    return [(i > 0 and datasets[i - 1] == d, i < len(datasets) - 1 and datasets[i + 1] == d)
+            for i, d in enumerate(datasets)]
+
+
+
+def plan_reuse(specs):
+    """ Mark up a list of flattened specs so that consecutive, compatible points share their data.
+        A point reuses data if the point before it left behind a compatible dataset, and keeps its
+        data if the point after it is able to use it.  Only the last point in a compatible run
+        of points will clean up. """
+
+    for s, (reuse, keep) in zip(specs, sharing(specs)):
+        s.reuse_data = reuse
+        s.keep_data = keep
+
+    return specs
@@ -0,0 +1,19 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Local stand-ins for sibench, cosbench and an S3 gateway.
+
+These let us run whole sweeps (and measure benchmaster's own overhead between points)
+without any servers or cluster.  Point benchmaster at them with environment variables:
+
+    BENCHMASTER_SIBENCH="python3 -m benchmaster.fake.sibench"
+    BENCHMASTER_COSBENCH_DIR=DIR      after 'python3 -m benchmaster.fake.cosbench install DIR'
+
+or, for the built-in S3 load generator, by using localhost as the gateway while
+'python3 -m benchmaster.fake.s3' is running.
+
+The output of the fake sibench and cosbench is synthetic (see synthetic.py), and by default
+they return immediately rather than running for the requested time.  Each takes its settings from FAKE_* environment
+variables, described in its own module.
+"""
@@ -0,0 +1,178 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+A fake cosbench controller.
+
+    python3 -m benchmaster.fake.cosbench install DIR
+
+creates DIR/cli.sh, which takes the commands that cosbench.py uses: submit, info and cancel.
+Submitting a workload runs it at once.  We write an archive directory for it (holding the
+workload config, and a result CSV with a row for each operation of each stage) and add it
+to the archive's run history, and then print its ID, as cosbench does.
+
+The number of operations is what the workers could do at the median latency in the run
+time (or the op count, for ops-based runs).  Settings, from the environment:
+
+    FAKE_COSBENCH_LATENCY     Median latency, in milliseconds                [default: 5]
+    FAKE_COSBENCH_SUCCESS     Percentage of operations that succeed          [default: 100]
+"""
+
+import benchmaster.sizes as sizes
+import fcntl
+import os
+import shutil
+import stat
+import sys
+
+from xml.etree import ElementTree
+
+_history_header = 'Id,Workload,Submitted-At,Started-At,Stopped-At,Op-Info,State,Detailed State\n'
+_csv_header = 'Stage,Op-Name,Op-Type,Op-Count,Byte-Count,Avg-ResTime,Avg-ProcTime,Throughput,Bandwidth,Succ-Ratio,95%-ResTime,100%-ResTime\n'
+
+_script = '''#!/bin/sh
+PYTHONPATH={path} exec {python} -m benchmaster.fake.cosbench --dir {dir} "$@"
+'''
+
+
+def _setting(name, default):
+    return os.environ.get('FAKE_COSBENCH_' + name, default)
+
+
+
+def install(directory):
+    """ Create a cli.sh (and an empty archive) in a directory, to stand in for a cosbench installation. """
+
+    directory = os.path.abspath(directory)
+    os.makedirs(os.path.join(directory, 'archive'), exist_ok=True)
+
+    path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    cli = os.path.join(directory, 'cli.sh')
+    with open(cli, 'w') as f:
+        f.write(_script.format(path=path, python=sys.executable, dir=directory))
+    os.chmod(cli, os.stat(cli).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+    print("Installed fake cosbench in {}".format(directory))
+
+
+
+def _config(element):
+    text = element.get('config', '')
+    return dict(kv.split('=', 1) for kv in text.split(';') if '=' in kv)
+
+
+
+def _rows(root):
+    """ Build the result rows for each stage of a workload. """
+
+    latency = float(_setting('LATENCY', '5'))
+    success = float(_setting('SUCCESS', '100'))
+    rows = []
+
+    for n, stage in enumerate(root.iter('workstage')):
+        name = 's{}-{}'.format(n + 1, stage.get('name'))
+        totals = {}
+
+        for work in stage.iter('work'):
+            workers = int(work.get('workers', 1))
+            operations = work.findall('operation')
+
+            # Works without operations (such as init, prepare and cleanup) have a type instead.
+            if not operations:
+                size = sizes.from_cosbench_expr(_config(work)['sizes']).mean_bytes() if 'sizes' in _config(work) else 0
+                ops = workers * 100
+                t = totals.setdefault(work.get('type', 'normal'), [0, 0, 1])
+                t[0] += ops
+                t[1] += ops * size
+                continue
+
+            for o in operations:
+                ratio = int(o.get('ratio', 100)) / 100
+                if work.get('totalOps'):
+                    ops = int(work.get('totalOps')) * ratio
+                    seconds = ops * latency / 1000 / workers
+                else:
+                    seconds = int(work.get('runtime', 60))
+                    ops = workers * seconds * 1000 / latency * ratio
+
+                size = sizes.from_cosbench_expr(_config(o)['sizes']).mean_bytes()
+                t = totals.setdefault(o.get('type'), [0, 0, 0])
+                t[0] += ops
+                t[1] += ops * size
+                t[2] = max(t[2], seconds)
+
+        for op, (count, transferred, seconds) in totals.items():
+            seconds = max(seconds, 1)
+            rows.append('{},{},{},{:.0f},{:.0f},{:.2f},{:.2f},{:.2f},{:.2f},{:.2f}%,{:.0f},{:.0f}\n'.format(
+                    name, op, op, count, transferred, latency, latency * 0.9, count / seconds, transferred / seconds,
+                    success, latency * 2, latency * 10))
+
+    return rows
+
+
+
+def submit(directory, xml_file):
+    """ Run a workload, and print its ID. """
+
+    root = ElementTree.parse(xml_file).getroot()
+    archive = os.path.join(directory, 'archive')
+    history = os.path.join(archive, 'run-history.csv')
+
+    # Several of us may be submitting at once, so take it in turns to allocate IDs.
+    with open(os.path.join(directory, '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        count = 0
+        if os.path.exists(history):
+            with open(history) as f:
+                count = sum(1 for line in f) - 1
+
+        job_id = 'w{}'.format(count + 1)
+        name = '{}-{}'.format(job_id, root.get('name', 'workload'))
+
+        job_dir = os.path.join(archive, name)
+        os.makedirs(job_dir)
+        shutil.copyfile(xml_file, os.path.join(job_dir, 'workload-config.xml'))
+
+        with open(os.path.join(job_dir, name + '.csv'), 'w') as f:
+            f.write(_csv_header)
+            f.writelines(_rows(root))
+
+        with open(history, 'a') as f:
+            if count == 0:
+                f.write(_history_header)
+            f.write('{},{},-,-,-,-,finished,completed\n'.format(job_id, root.get('name', 'workload')))
+
+    print("Accepted with ID: {}".format(job_id))
+
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    if argv[:1] == ['install'] and len(argv) == 2:
+        install(argv[1])
+        return 0
+
+    if len(argv) < 3 or argv[0] != '--dir':
+        print("Usage: cosbench install DIR | cosbench --dir DIR submit FILE | info | cancel ID")
+        return 1
+
+    directory, command = argv[1], argv[2]
+
+    if command == 'submit':
+        submit(directory, argv[3])
+    elif command == 'info':
+        print("Total: 0 active workloads")
+    elif command == 'cancel':
+        print("Nothing to cancel: {} has already completed".format(argv[3]))
+    else:
+        print("Unknown command: {}".format(command))
+        return 1
+
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
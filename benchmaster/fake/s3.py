@@ -0,0 +1,253 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+A fake S3 gateway.
+
+    python3 -m benchmaster.fake.s3 [--port PORT] [--credentials FILE]
+
+serves just enough of S3 for the built-in load generator (s3load.py), so that it can be run
+without a cluster: 'benchmaster s3 test-write ... localhost' against it exercises request
+signing, keep-alive connections and the PUT, GET and DELETE paths.  The credentials file is
+the same as benchmaster's own (--s3-credentials), and every request must be signed with
+those keys (AWS signature version 4, with an unsigned payload, as s3load signs them).
+
+Requests are path style: PUT and DELETE of /bucket create and remove buckets, and PUT, GET,
+HEAD and DELETE of /bucket/key work on objects, which are held in memory.  Anything else is
+answered with 501.  Settings, from the environment:
+
+    FAKE_S3_LATENCY     Added latency of each request, in milliseconds    [default: 0]
+
+    python3 -m benchmaster.fake.s3 check
+
+instead starts the fake in this process, runs some requests through s3load's client against
+it (including one with the wrong key, which must be refused), and reports whether they all
+did what they should.
+"""
+
+import argparse
+import benchmaster.s3load as s3load
+import hashlib
+import hmac
+import http.server
+import json
+import os
+import re
+import sys
+import threading
+import time
+import urllib.parse
+
+_authorization_pattern = re.compile(r'AWS4-HMAC-SHA256 Credential=([^/]+)/(\d{8})/([^/]+)/s3/aws4_request, '
+                                    r'SignedHeaders=([^,]+), Signature=([0-9a-f]+)')
+
+
+def _setting(name, default):
+    return os.environ.get('FAKE_S3_' + name, default)
+
+
+
+def _signature(secret_key, method, path, query, headers, signed_headers, date, region):
+    """ The signature that a request should carry, given its headers. """
+
+    canonical_headers = ''.join('{}:{}\n'.format(h, headers.get(h, '').strip()) for h in signed_headers.split(';'))
+    canonical_request = '\n'.join([method, path, query, canonical_headers, signed_headers,
+                                   headers.get('x-amz-content-sha256', 'UNSIGNED-PAYLOAD')])
+
+    scope = '{}/{}/s3/aws4_request'.format(date, region)
+    string_to_sign = '\n'.join(['AWS4-HMAC-SHA256', headers.get('x-amz-date', ''), scope,
+                                hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()])
+
+    key = ('AWS4' + secret_key).encode('utf-8')
+    for part in [date, region, 's3', 'aws4_request']:
+        key = hmac.new(key, part.encode('utf-8'), hashlib.sha256).digest()
+    return hmac.new(key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+
+class Store:
+    """ The buckets and objects of the fake, and the keys with which requests must be signed. """
+
+    def __init__(self, access_key, secret_key):
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.buckets = {}
+        self.latency = float(_setting('LATENCY', '0')) / 1000
+        self.lock = threading.Lock()
+
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """ Handles the requests on a single connection. """
+
+    # Keep-alive, as s3load expects.
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+
+    def _reply(self, status, body=b'', code=None):
+        if code is not None:
+            body = '<?xml version="1.0" encoding="UTF-8"?>\n<Error><Code>{}</Code></Error>\n'.format(code).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+
+    def _authorized(self):
+        match = _authorization_pattern.match(self.headers.get('Authorization', ''))
+        if not match:
+            return False
+
+        access_key, date, region, signed_headers, signature = match.groups()
+        if access_key != self.server.store.access_key:
+            return False
+
+        url = urllib.parse.urlsplit(self.path)
+        headers = {k.lower(): v for k, v in self.headers.items()}
+        expected = _signature(self.server.store.secret_key, self.command, url.path, url.query, headers,
+                              signed_headers, date, region)
+        return hmac.compare_digest(expected, signature)
+
+
+    def _respond(self, bucket, key, body):
+        """ Carry out a request, and return its status, the body of the reply and any error code. """
+
+        store = self.server.store
+
+        with store.lock:
+            if not bucket:
+                return (501, b'', 'NotImplemented')
+
+            if key is None:
+                if self.command == 'PUT':
+                    store.buckets.setdefault(bucket, {})
+                    return (200, b'', None)
+                if self.command == 'DELETE':
+                    if bucket not in store.buckets:
+                        return (404, b'', 'NoSuchBucket')
+                    if store.buckets[bucket]:
+                        return (409, b'', 'BucketNotEmpty')
+                    del store.buckets[bucket]
+                    return (204, b'', None)
+                return (501, b'', 'NotImplemented')
+
+            objects = store.buckets.get(bucket)
+            if objects is None:
+                return (404, b'', 'NoSuchBucket')
+
+            if self.command == 'PUT':
+                objects[key] = body
+                return (200, b'', None)
+            if self.command in ['GET', 'HEAD']:
+                if key not in objects:
+                    return (404, b'', 'NoSuchKey')
+                return (200, objects[key], None)
+            if self.command == 'DELETE':
+                objects.pop(key, None)
+                return (204, b'', None)
+
+        return (501, b'', 'NotImplemented')
+
+
+    def _handle(self):
+        # Read the body first, so that the connection can be used again whatever we say.
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else b''
+
+        if self.server.store.latency:
+            time.sleep(self.server.store.latency)
+
+        if not self._authorized():
+            return self._reply(403, code='SignatureDoesNotMatch')
+
+        parts = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path).lstrip('/').split('/', 1)
+        bucket = parts[0]
+        key = parts[1] if len(parts) > 1 and parts[1] else None
+
+        self._reply(*self._respond(bucket, key, body))
+
+
+    do_PUT = do_GET = do_HEAD = do_DELETE = do_POST = _handle
+
+
+
+def start(access_key, secret_key, port=0):
+    """ Start a fake gateway in a background thread, and return its server (whose port is
+        server.server_address[1], if we let it pick one). """
+
+    server = http.server.ThreadingHTTPServer(('localhost', port), Handler)
+    server.daemon_threads = True
+    server.store = Store(access_key, secret_key)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+
+def check():
+    """ Run requests through s3load's client against a fake of our own, and return whether
+        they all did what they should. """
+
+    server = start('access', 'secret')
+    port = server.server_address[1]
+    client = s3load.Client(s3load.Signer('access', 'secret'), 'localhost', port)
+    impostor = s3load.Client(s3load.Signer('access', 'wrong'), 'localhost', port)
+
+    expected = [
+        ('create bucket', client, 'PUT', '/bucket', None, 200, 0),
+        ('put object', client, 'PUT', '/bucket/CB-1', b'x' * 4096, 200, 0),
+        ('get object', client, 'GET', '/bucket/CB-1', None, 200, 4096),
+        ('get missing object', client, 'GET', '/bucket/CB-2', None, 404, None),
+        ('put with the wrong key', impostor, 'PUT', '/bucket/CB-2', b'x', 403, None),
+        ('delete object', client, 'DELETE', '/bucket/CB-1', None, 204, 0),
+        ('get deleted object', client, 'GET', '/bucket/CB-1', None, 404, None),
+        ('delete bucket', client, 'DELETE', '/bucket', None, 204, 0),
+    ]
+
+    ok = True
+    for name, c, method, path, body, status, received in expected:
+        got = c.request(method, path, body)
+        passed = got[0] == status and (received is None or got[1] == received)
+        print("{:<24} {:>4} {}".format(name, str(got[0]), 'ok' if passed else 'FAILED (expected {})'.format(status)))
+        ok = ok and passed
+
+    client.close()
+    impostor.close()
+    server.shutdown()
+    return ok
+
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    if argv == ['check']:
+        return 0 if check() else 1
+
+    parser = argparse.ArgumentParser(prog='s3')
+    parser.add_argument('--port', type=int, default=7480)
+    parser.add_argument('--credentials', default='s3creds.json')
+    args = parser.parse_args(argv)
+
+    with open(args.credentials) as f:
+        keys = json.load(f)
+
+    server = start(keys['access_key'], keys['secret_key'], args.port)
+    print("Fake S3 gateway listening on port {}".format(server.server_address[1]))
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
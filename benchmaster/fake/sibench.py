@@ -0,0 +1,109 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+A fake sibench.
+
+Takes the same command line that sibench.py builds for the real thing, and writes an
+output file with arguments, stats and analyses in sibench's format.  The number of
+operations is what the workers could do at the median latency in the run time.
+
+Settings, from the environment:
+
+    FAKE_SIBENCH_STATS_SIZE   Size of the stats section of the output file   [default: 64K]
+    FAKE_SIBENCH_LATENCY      Median latency, in microseconds                [default: 5000]
+    FAKE_SIBENCH_SIGMA        Log-normal sigma of the latency                [default: 0.5]
+    FAKE_SIBENCH_FAILURES     Percentage of operations that fail             [default: 0]
+    FAKE_SIBENCH_CORES        Cores we pretend each server has               [default: 16]
+    FAKE_SIBENCH_SPEED        Fraction of real time to take over the run     [default: 0]
+
+With a non-zero speed, we print a line of stats for each (scaled) second, as sibench does.
+"""
+
+import argparse
+import benchmaster.synthetic as synthetic
+import benchmaster.units as units
+import os
+import sys
+import time
+
+
+def _setting(name, default):
+    return os.environ.get('FAKE_SIBENCH_' + name, default)
+
+
+
+def _parse(argv):
+    parser = argparse.ArgumentParser(prog='sibench')
+    parser.add_argument('protocol')
+    parser.add_argument('command')
+    parser.add_argument('-s', dest='size', default='1M')
+    parser.add_argument('-c', dest='count', default='1000')
+    parser.add_argument('-x', dest='mix', default='0')
+    parser.add_argument('-r', dest='runtime', default='30')
+    parser.add_argument('-u', dest='ramp_up', default='5')
+    parser.add_argument('-d', dest='ramp_down', default='2')
+    parser.add_argument('-w', dest='worker_factor', default='1.0')
+    parser.add_argument('-o', dest='output', required=True)
+    parser.add_argument('--servers', default='localhost')
+    parser.add_argument('targets', nargs='*')
+
+    # Anything protocol specific (such as keys and pools) doesn't change what we do.
+    args, unknown = parser.parse_known_args(argv)
+    args.targets += [u for u in unknown if not u.startswith('-')]
+    return args
+
+
+
+def _pretend_to_run(args, ops, speed):
+    """ Print stats once a (scaled) second, for as long as the run would have taken. """
+
+    phases = ['Write', 'Read'] if args.mix == '0' else ['Mixed']
+    seconds = int(args.ramp_up) + int(args.runtime) + int(args.ramp_down)
+    rate = ops / int(args.runtime) / len(phases)
+    bandwidth = rate * units.to_bytes(args.size) / (1024 * 1024)
+    failures = int(rate * float(_setting('FAILURES', '0')) / 100)
+
+    for phase in phases:
+        for i in range(seconds):
+            print("{}: {:.1f} MB/s, {:.0f} ops/s, {} failures".format(phase, bandwidth, rate, failures))
+            sys.stdout.flush()
+            time.sleep(speed)
+
+
+
+def main(argv=None):
+    args = _parse(sys.argv[1:] if argv is None else argv)
+    servers = args.servers.split(',')
+
+    median_us = int(_setting('LATENCY', '5000'))
+    workers = max(1, int(float(args.worker_factor) * int(_setting('CORES', '16')))) * len(servers)
+    ops = int(workers * int(args.runtime) * 1000000 / median_us)
+
+    speed = float(_setting('SPEED', '0'))
+    if speed > 0:
+        _pretend_to_run(args, ops, speed)
+
+    synthetic.sibench_output(
+            args.output,
+            units.to_bytes(_setting('STATS_SIZE', '64K')),
+            object_size=args.size,
+            object_count=args.count,
+            read_write_mix=args.mix,
+            runtime=args.runtime,
+            ramp_up=args.ramp_up,
+            ramp_down=args.ramp_down,
+            worker_factor=args.worker_factor,
+            median_us=median_us,
+            sigma=float(_setting('SIGMA', '0.5')),
+            failure_percent=float(_setting('FAILURES', '0')),
+            targets=args.targets,
+            servers=servers,
+            ops=ops)
+
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Fio backend, for the block and file protocols.
+
+We generate a fio job file from the spec, run fio (locally, or with --client against fio
+servers already running on each of the fio servers), and pick the results out of fio's
+json output.
+
+The mapping from a spec to fio is:
+  - object size:  the block size (bs), or a bssplit/bsrange for a size distribution.
+  - object count: the number of blocks in each job's file, so size = object size x count.
+  - run time:     runtime, with the ramp up as fio's ramp_time.  Fio has no equivalent of
+                  a ramp down, so that is ignored.
+  - mix:          0 runs a write job and then (after a stonewall) a read job over the
+                  same files.  Anything else runs a single mixed job with rwmixread.
+"""
+
+import json
+import os
+import benchmaster.sizes as sizes
+import benchmaster.trace as trace
+import subprocess
+
+from datetime import datetime
+from benchmaster.result import Result, DirectionResult
+
+fio_binary = 'fio'
+
+# The completion latency percentiles we record, as fio names them.
+_percentiles = ['50.000000', '90.000000', '95.000000', '99.000000', '99.900000', '99.990000']
+
+
+def _block_sizes(spec):
+    """ Returns the fio option for our object size, and the mean size in bytes. """
+
+    distribution = sizes.parse(spec.object_size)
+    classes = distribution.classes
+
+    if distribution.is_fixed():
+        option = 'bs={}'.format(classes[0].low)
+    elif len(classes) == 1:
+        option = 'bsrange={}-{}'.format(classes[0].low, classes[0].high)
+    else:
+        # Fio's bssplit only takes single sizes, so ranges are represented by their mean.
+        entries = ['{}/{}'.format(int(c.mean()), p) for c, p in zip(classes, distribution.percentages())]
+        option = 'bssplit={}'.format(':'.join(entries))
+
+    return (option, distribution.mean_bytes())
+
+
+
+def _job_file(spec):
+    """ Build the contents of a fio job file for a spec. """
+
+    protocol = spec.protocol.name()
+    backend = spec.backend
+    runtype = spec.runtype
+    mix = int(spec.read_write_mix)
+    bs_option, mean_size = _block_sizes(spec)
+    rand = 'rand' if backend.pattern == 'rand' else ''
+
+    result  = '[global]\n'
+    result += 'ioengine={}\n'.format(backend.ioengine)
+    result += 'direct={}\n'.format(0 if backend.buffered else 1)
+    result += '{}\n'.format(bs_option)
+    result += 'size={}\n'.format(int(mean_size * int(spec.object_count)))
+    result += 'iodepth={}\n'.format(backend.iodepth)
+    result += 'numjobs={}\n'.format(backend.numjobs)
+    result += 'time_based=1\n'
+    result += 'runtime={}\n'.format(runtype.runtime)
+    result += 'ramp_time={}\n'.format(runtype.ramp_up)
+    result += 'group_reporting=1\n'
+
+    if protocol == 'block':
+        result += 'filename={}\n'.format(spec.protocol.targets()[0])
+    else:
+        # Name the files explicitly, so that the read job reads what the write job wrote.
+        result += 'directory={}\n'.format(spec.protocol.targets()[0])
+        result += 'filename_format=benchmaster-fio.$jobnum.$filenum\n'
+
+    if mix == 0:
+        result += '\n[write]\nrw={}write\n'.format(rand)
+        result += '\n[read]\nstonewall\nrw={}read\n'.format(rand)
+    else:
+        result += '\n[mixed]\nrw={}\nrwmixread={}\n'.format('randrw' if rand else 'rw', min(mix, 100))
+
+    return result
+
+
+
+def run(spec):
+    """ Run the test described by the spec using fio as the backend. """
+    return process(spec, execute(spec))
+
+
+
+def execute(spec):
+    """ Run fio, and return the name of the file it wrote its json output to. """
+
+    protocol = spec.protocol.name()
+    if protocol not in ['block', 'file']:
+        print('Bad storage type for fio: {}'.format(protocol))
+        exit(-1)
+
+    if spec.runtype.name() != 'time':
+        print('Bad runtype for fio: {}'.format(spec.runtype.name()))
+        exit(-1)
+
+    timestamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    job_file = '{}-{}.fio'.format(spec.backend.jobfile_prefix, timestamp)
+    output = '{}-{}.json'.format(spec.backend.jobfile_prefix, timestamp)
+
+    print("Generating fio job file: " + job_file)
+    with open(job_file, 'w') as f:
+        f.write(_job_file(spec))
+
+    cmd = '{} --output-format=json --output={}'.format(fio_binary, output)
+
+    # With remote servers, each one needs to be sent its own copy of the job.
+    if spec.backend.is_local():
+        cmd += ' {}'.format(job_file)
+    else:
+        for s in spec.backend.servers:
+            cmd += ' --client={} {}'.format(s, job_file)
+
+    print("Running command: {}".format(cmd))
+    try:
+        with trace.phase('run fio', measured=True):
+            subprocess.check_call(cmd, shell=True)
+    except BaseException:
+        # Nothing will process the output of a run that failed.
+        _discard(spec, output)
+        raise
+
+    return output
+
+
+
+def _discard(spec, output):
+    """ Delete the job file and output of a run once we're done with them, unless we were asked to keep them. """
+
+    if spec.backend.keep_files:
+        return
+
+    for f in [os.path.splitext(output)[0] + '.fio', output]:
+        if os.path.exists(f):
+            os.remove(f)
+
+
+
+def _direction_stats(entries, direction):
+    """ Combine the stats for one direction over a set of job (or client) entries from fio's output.
+        Entries that did no IO in this direction are ignored, and if none did, the stats are all '-'. """
+
+    stats = [e[direction] for e in entries if e[direction]['total_ios'] > 0]
+    if not stats:
+        return DirectionResult('-', '-', '-', '-', '-', '-', '-')
+
+    ios = sum(s['total_ios'] for s in stats)
+
+    def weighted(fn):
+        return sum(fn(s) * s['total_ios'] for s in stats) / ios
+
+    # Latencies are in nanoseconds, but we want milliseconds.
+    ms = 1000 * 1000
+
+    percentiles = {}
+    for p in _percentiles:
+        if all(p in s['clat_ns'].get('percentile', {}) for s in stats):
+            percentiles[p.rstrip('0').rstrip('.')] = weighted(lambda s: s['clat_ns']['percentile'][p]) / ms
+
+    return DirectionResult(
+            sum(s['bw_bytes'] for s in stats) / (1024 * 1024),
+            min(s['lat_ns']['min'] for s in stats) / ms,
+            max(s['lat_ns']['max'] for s in stats) / ms,
+            percentiles.get('95', '-'),
+            weighted(lambda s: s['lat_ns']['mean']) / ms,
+            ios,
+            sum(s.get('short_ios', 0) + s.get('drop_ios', 0) for s in stats),
+            percentiles)
+
+
+
+def process(spec, output):
+    """ Build a Result from fio's json output. """
+
+    try:
+        with open(output) as f:
+            data = json.load(f)
+    finally:
+        _discard(spec, output)
+
+    # In client/server mode, the stats come per client, and there is an aggregate when there are several.
+    if 'client_stats' in data:
+        entries = data['client_stats']
+        aggregate = [e for e in entries if e.get('jobname') == 'All clients']
+        if aggregate:
+            entries = aggregate
+    else:
+        entries = data['jobs']
+
+    for e in entries:
+        if e.get('error', 0) != 0:
+            print("Fio reported error {} for job {}".format(e['error'], e.get('jobname')))
+
+    result = Result(spec)
+    result.id = '-'
+    result.read = _direction_stats(entries, 'read')
+    result.write = _direction_stats(entries, 'write')
+    return result
@@ -0,0 +1,168 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Probing of the hardware of our load generators.
+
+Sibench's worker factor is relative to each server's core count, and cosbench's worker count
+is absolute, so neither tells us how many workers a run really had unless we know what
+they were running on.  Once per sweep, we probe each load generator (over ssh, or directly
+for localhost) for its cores, NUMA nodes and NIC speeds.  Probes are cached in a json file
+for a day, since hardware rarely changes between sweeps.
+
+Knowing the hardware also lets us pick worker counts: a worker value of 'auto' becomes a
+sweep that brackets where we expect the load generators to saturate, from a quarter to
+four times that point.  For sibench that point is one worker per core.  For cosbench, whose
+workers are threads on the local driver that spend most of their time waiting on the
+network, it is a few workers per core, shared between the targets.
+"""
+
+import json
+import os
+import subprocess
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+# How long (in seconds) a cached probe remains good.
+_cache_lifetime = 24 * 60 * 60
+
+# Cosbench worker threads per local core at which we expect to saturate.
+_cosbench_workers_per_core = 8
+
+# The multiples of the saturation point that an 'auto' worker sweep covers.
+_auto_multipliers = [0.25, 0.5, 1, 2, 4]
+
+_script = '''
+nproc
+ls -d /sys/devices/system/node/node[0-9]* 2>/dev/null | wc -l
+for n in /sys/class/net/*; do
+    if [ -e $n/device ]; then echo $(basename $n) $(cat $n/speed 2>/dev/null || echo -1); fi
+done
+'''
+
+
+class Hardware:
+    """ What we know about the hardware of a single load generator. """
+
+    def __init__(self, host, cores, numa_nodes, nics, probed):
+        self.host = host
+        self.cores = cores
+        self.numa_nodes = numa_nodes
+        self.nics = nics
+        self.probed = probed
+
+    def __repr__(self): return str(vars(self))
+
+    def __str__(self):
+        nics = ', '.join('{} {}'.format(n, 'unknown speed' if s < 0 else '{}Mb/s'.format(s)) for n, s in self.nics.items())
+        return "{}: {} cores, {} NUMA nodes, NICs: {}".format(self.host, self.cores, self.numa_nodes, nics or 'none found')
+
+
+
+def _probe(host, password):
+    """ Probe a single host. """
+
+    if host == 'localhost':
+        cmd = 'sh -s'
+    else:
+        cmd = 'sshpass -p {} ssh -o UserKnownHostsFile=/dev/null -o StrictHostKeyChecking=no -o ConnectTimeout=10 root@{} sh -s'.format(
+                password, host)
+
+    rc = subprocess.run(cmd, shell=True, input=_script.encode('utf-8'), capture_output=True, timeout=60)
+    if rc.returncode != 0:
+        raise Exception(rc.stderr.decode('utf-8').strip())
+
+    lines = rc.stdout.decode('utf-8').splitlines()
+    nics = {}
+    for line in lines[2:]:
+        name, speed = line.split()
+        nics[name] = int(speed)
+
+    return Hardware(host, int(lines[0]), max(1, int(lines[1])), nics, time.time())
+
+
+
+def _load_cache(filename):
+    if filename is None or not os.path.exists(filename):
+        return {}
+
+    try:
+        with open(filename) as f:
+            return {h: Hardware(**v) for h, v in json.load(f).items()}
+    except (ValueError, TypeError):
+        print("Ignoring unreadable hardware cache {}".format(filename))
+        return {}
+
+
+
+def _save_cache(filename, cache):
+    if filename is not None:
+        with open(filename, 'w') as f:
+            json.dump(cache, f, default=vars, indent=3)
+
+
+
+def probe(hosts, password, cache_file):
+    """ Return a map from host to Hardware for each of the hosts, probing those that aren't cached,
+        in parallel.  Any host that we can't probe is left out of the map. """
+
+    cache = _load_cache(cache_file)
+    now = time.time()
+    stale = [h for h in hosts if h not in cache or now - cache[h].probed > _cache_lifetime]
+
+    def probe_one(host):
+        try:
+            return _probe(host, password)
+        except Exception as e:
+            print("Unable to probe the hardware of {}: {}".format(host, e))
+            return None
+
+    if stale:
+        print("Probing hardware of {}".format(', '.join(stale)))
+        with ThreadPoolExecutor(max_workers=len(stale)) as pool:
+            for h in pool.map(probe_one, stale):
+                if h is not None:
+                    cache[h.host] = h
+        _save_cache(cache_file, cache)
+
+    results = {h: cache[h] for h in hosts if h in cache}
+    for h in results.values():
+        print("  {}".format(h))
+
+    return results
+
+
+
+def sibench_workers(hardware, factor):
+    """ How many workers sibench will run on a server with a given worker factor. """
+    return max(1, int(hardware.cores * float(factor)))
+
+
+
+def _bracket(centre, integer):
+    values = [centre * m for m in _auto_multipliers]
+    if integer:
+        values = sorted(set(max(1, int(round(v))) for v in values))
+    return ','.join('{:g}'.format(v) for v in values)
+
+
+
+def expand_auto(spec, hardware):
+    """ Replace an 'auto' worker count in a backend spec with a sweep around the expected saturation point. """
+
+    backend = spec.backend
+
+    if backend.name() == 'sibench' and backend.worker_factor == 'auto':
+        backend.worker_factor = _bracket(1.0, False)
+        print("Sweeping sibench worker factors: {}".format(backend.worker_factor))
+
+    if backend.name() == 'cosbench' and backend.worker_threads == 'auto':
+        if 'localhost' not in hardware:
+            print("Unable to choose cosbench workers automatically without knowing the local hardware")
+            exit(-1)
+
+        targets = len(spec.protocol.targets())
+        centre = max(1, hardware['localhost'].cores * _cosbench_workers_per_core // targets)
+        backend.worker_threads = _bracket(centre, True)
+        print("Sweeping cosbench workers per target: {}".format(backend.worker_threads))
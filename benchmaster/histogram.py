@@ -0,0 +1,118 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Latency histograms for our built-in load generators.
+
+Latencies are recorded in microseconds into log-linear buckets: 8 buckets per power of two,
+so any value is within 12.5% of its bucket's bounds.  The buckets are allocated up front, so
+recording a latency never allocates.
+
+When operations are scheduled at a fixed rate (open loop), their latencies are measured from
+when they were meant to start, so that time spent queued behind slow operations is counted
+rather than hidden (coordinated omission).  We then keep a second histogram of the service
+times, from when each operation actually started, and report it alongside.
+"""
+
+from benchmaster.result import DirectionResult
+
+_histogram_buckets = 400
+_percentiles = [50, 90, 95, 99, 99.9]
+
+
+class Histogram:
+    """ Log-linear latency histogram, along with the exact count, sum, min and max. """
+
+    def __init__(self):
+        self.buckets = [0] * _histogram_buckets
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+
+    def _index(us):
+        if us < 8:
+            return us
+        shift = us.bit_length() - 4
+        return min(shift * 8 + (us >> shift), _histogram_buckets - 1)
+
+
+    def _upper(index):
+        """ The largest value that falls into a bucket. """
+        if index < 8:
+            return index
+        shift = index // 8 - 1
+        return (((index % 8) + 9) << shift) - 1
+
+
+    def add(self, us):
+        self.buckets[Histogram._index(us)] += 1
+        self.count += 1
+        self.total += us
+        if self.min is None or us < self.min: self.min = us
+        if us > self.max: self.max = us
+
+
+    def merge(self, other):
+        for i, n in enumerate(other.buckets):
+            self.buckets[i] += n
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min): self.min = other.min
+        self.max = max(self.max, other.max)
+
+
+    def percentile(self, p):
+        """ The upper bound (in microseconds) of the bucket containing the given percentile. """
+        target = self.count * p / 100
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= target:
+                return min(Histogram._upper(i), self.max)
+        return self.max
+
+
+    def to_map(self):
+        """ A map from each non-empty bucket's upper bound (in ms) to its count. """
+        return {'{:g}'.format(Histogram._upper(i) / 1000): n for i, n in enumerate(self.buckets) if n}
+
+
+
+def _service_times(histogram):
+    """ A map of the summary stats of a histogram of service times, in ms. """
+
+    ms = 1000.0
+    return {
+        'res_min': histogram.min / ms,
+        'res_max': histogram.max / ms,
+        'res_95': histogram.percentile(95) / ms,
+        'res_avg': histogram.total / histogram.count / ms,
+        'percentiles': {'{:g}'.format(p): histogram.percentile(p) / ms for p in _percentiles}
+    }
+
+
+
+def direction_result(histogram, transferred, failures, runtime, service=None):
+    """ Build a DirectionResult from a histogram of the successful operations, the number of bytes
+        they transferred, the number of failures and the run time (or None if bandwidth is meaningless).
+        For an open loop run, service is the histogram of service times. """
+
+    if histogram.count == 0:
+        return DirectionResult(0, '-', '-', '-', '-', 0, failures)
+
+    ms = 1000.0
+    bandwidth = transferred / runtime / (1024 * 1024) if runtime else '-'
+
+    return DirectionResult(
+            bandwidth,
+            histogram.min / ms,
+            histogram.max / ms,
+            histogram.percentile(95) / ms,
+            histogram.total / histogram.count / ms,
+            histogram.count,
+            failures,
+            {'{:g}'.format(p): histogram.percentile(p) / ms for p in _percentiles},
+            histogram.to_map(),
+            _service_times(service) if service is not None and service.count else None)
@@ -0,0 +1,131 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Bulk ingestion of historical results.
+
+The cosbench archive and our saved sibench output files hold the results of every run we've
+ever done, but normally we only parse the job we have just run.  Ingestion walks a set of
+directories for:
+
+  - cosbench jobs: any directory with a workload-config.xml, from which we recover the job's
+    parameters, alongside its result CSV.  The times and state of each job come from the
+    run-history.csv in the archive above it, if there is one.
+  - sibench output files: any file named sibench*.json (which sweeps keep with
+    --sibench-keep-output).
+
+Parsing is done by a pool of processes, since there may be years of files, and the results
+are stored (in a results file and/or a sheet) as they come in.  We record what we've
+ingested in an index file, one entry per line, so that running it again only picks up what
+is new.  Entries are keyed by their absolute path (and for sibench files, their size and
+modification time too, since a new run may save over an old file of the same name), so that
+files of the same name in different directories, and jobs of the same ID from different
+cosbench controllers, are all picked up.  Anything that fails to parse is reported, and left out of the index so that it is
+tried again next time.
+"""
+
+import benchmaster.cosbench as cosbench
+import benchmaster.sibench as sibench
+import fnmatch
+import os
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+class Entry:
+    """ Something in an archive to ingest. """
+
+    def __init__(self, key, kind, path, history):
+        self.key = key
+        self.kind = kind
+        self.path = path
+        self.history = history
+
+    def __repr__(self): return str(vars(self))
+
+
+
+def _sibench_entry(path):
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    return Entry('sibench:{}:{}:{}'.format(path, st.st_size, int(st.st_mtime)), 'sibench', path, None)
+
+
+
+def _find(paths):
+    """ Yield an Entry for every cosbench job and sibench output file under a list of paths. """
+
+    histories = {}
+
+    def history(archive_dir):
+        if archive_dir not in histories:
+            histories[archive_dir] = cosbench.archive_history(archive_dir)
+        return histories[archive_dir]
+
+    for root in paths:
+        if os.path.isfile(root):
+            yield _sibench_entry(root)
+            continue
+
+        for d, dirs, files in os.walk(os.path.abspath(root)):
+            if 'workload-config.xml' in files:
+                # The history only matters to the job, so only hand it what's relevant.
+                name = os.path.basename(d)
+                job_id = name.split('-')[0]
+                job_history = history(os.path.dirname(d))
+                yield Entry('cosbench:' + d, 'cosbench', d, {job_id: job_history[job_id]} if job_id in job_history else {})
+                dirs[:] = []
+                continue
+
+            for f in sorted(fnmatch.filter(files, 'sibench*.json')):
+                yield _sibench_entry(os.path.join(d, f))
+
+
+
+def _parse(kind, path, history):
+    """ Build the Result for an entry.  This runs in a worker process. """
+
+    if kind == 'cosbench':
+        return cosbench.archived_result(path, history)
+    return sibench.archived_result(path)
+
+
+
+def _load_index(filename):
+    if not os.path.exists(filename):
+        return set()
+
+    with open(filename) as f:
+        return set(line.strip() for line in f if line.strip())
+
+
+
+def run(paths, index_file, workers, store):
+    """ Ingest everything new under a list of paths, passing each Result to store. """
+
+    done = _load_index(index_file)
+    entries = [e for e in _find(paths) if e.key not in done]
+    print("Found {} new results to ingest".format(len(entries)))
+
+    ingested = 0
+    failed = 0
+
+    with ProcessPoolExecutor(max_workers=int(workers)) as pool, open(index_file, 'a') as index:
+        futures = {pool.submit(_parse, e.kind, e.path, e.history): e for e in entries}
+
+        for f in as_completed(futures):
+            e = futures[f]
+            try:
+                result = f.result()
+            except Exception as ex:
+                print("Unable to ingest {}: {}".format(e.path, ex))
+                failed += 1
+                continue
+
+            store(result)
+            index.write(e.key + '\n')
+            index.flush()
+            ingested += 1
+
+    print("Ingested {} results, {} failed".format(ingested, failed))
+    return failed == 0
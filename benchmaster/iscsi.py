@@ -1,6 +1,7 @@
 # SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
 # SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
 
+import benchmaster.trace as trace
 import subprocess
 import time
 
@@ -142,21 +143,30 @@ def _unmount_images(args):
 
 
 def setup(args):
-    host_ids = _fetch_gateway_hostids(args)
-
-    _setup_initiator(args)
-    _create_images(args)
-    _configure_images_on_gateways(args, 'export', host_ids)
-    _mount_images(args)
+    with trace.phase('fetch gateway host ids'):
+        host_ids = _fetch_gateway_hostids(args)
+
+    with trace.phase('set up initiators'):
+        _setup_initiator(args)
+    with trace.phase('create images'):
+        _create_images(args)
+    with trace.phase('export images'):
+        _configure_images_on_gateways(args, 'export', host_ids)
+    with trace.phase('mount images'):
+        _mount_images(args)
     print("Ready.")
 
 
 
 def teardown(args):
-    host_ids = _fetch_gateway_hostids(args)
-
-    _unmount_images(args)
-    _configure_images_on_gateways(args, 'unexport', host_ids)
-    _delete_images(args)
+    with trace.phase('fetch gateway host ids'):
+        host_ids = _fetch_gateway_hostids(args)
+
+    with trace.phase('unmount images'):
+        _unmount_images(args)
+    with trace.phase('unexport images'):
+        _configure_images_on_gateways(args, 'unexport', host_ids)
+    with trace.phase('delete images'):
+        _delete_images(args)
     print("Ready.")
 
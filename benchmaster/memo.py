@@ -0,0 +1,218 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Memoization of the results of sweep points.
+
+When we rerun a sweep after adding (say) one more object size, every point that we already
+have a result for would otherwise be run again.  With --memo, we keep the result of every
+point in a json file, keyed by a hash of its spec, and reuse any that are still fresh rather
+than running the point again.
+
+The key covers everything in a flattened spec that affects the result, and the options
+outside the spec that do (the state the caches are put into before each run), but not secrets
+(keys and passwords), the description, or the choices made when planning the sweep (such as
+whether a point reuses the previous point's data).  Each entry also records a fingerprint of
+the targets: their addresses and, for the ceph protocols whose targets are monitors (and
+whose keys we fetch from them), the cluster's fsid, OSD count and versions.  An
+entry is fresh if its fingerprint matches the current one, and it is younger than the TTL
+(which may be 'forever', to reuse results for as long as the cluster is unchanged).
+
+Reused results are marked as cached in their status, so that they can be told apart in the
+sheet.  Entries can be listed, and removed individually or all at once, with the memo
+commands.
+"""
+
+import hashlib
+import json
+import os
+import socket
+import subprocess
+import threading
+import time
+
+from benchmaster.result import Result
+
+# Fields of a spec that don't affect its result.
+_ignored_fields = ['access_key', 'secret_key', 'key', 'description', 'reuse_data', 'keep_data',
+                   'pipelined', 'point_prefix', 'hardware', 'xml_file', 'side', 'output_dir', 'keep_files']
+
+_ssh_options = '-o UserKnownHostsFile=/dev/null -o StrictHostKeyChecking=no -o ConnectTimeout=10'
+
+# What we ask a ceph cluster, to tell whether it has changed.
+_ceph_fingerprint = 'ceph fsid && ceph osd ls | wc -l && ceph versions'
+
+
+def _canonical(value):
+    """ Turn a spec (or any part of it) into plain json types, without the fields we ignore. """
+
+    if isinstance(value, dict):
+        return {k: _canonical(v) for k, v in value.items() if k not in _ignored_fields}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if hasattr(value, '__dict__'):
+        return _canonical(vars(value))
+    return value
+
+
+
+def context(cache_state, cache_drop_osd):
+    """ The options outside a spec that affect its result.  Those left at their defaults are left
+        out, so that the keys of existing entries don't change. """
+
+    result = {}
+    if cache_state != 'asis':
+        result['cache_state'] = cache_state
+    if cache_state == 'cold' and cache_drop_osd:
+        result['cache_drop_osd'] = True
+    return result
+
+
+
+def key(spec, context=None):
+    """ The hash of the parts of a spec (and of the options outside it) that affect its result. """
+
+    canonical = _canonical(spec)
+    canonical['backend_name'] = spec.backend.name()
+    canonical['protocol_name'] = spec.protocol.name()
+    if context:
+        canonical['context'] = context
+    text = json.dumps(canonical, sort_keys=True)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+
+def _summary(spec):
+    """ A short description of a spec, for listing. """
+    return "{} {} {} size={} count={} workers={} mix={}".format(
+            spec.protocol.name(), spec.backend.name(), spec.runtype.schedule(),
+            spec.object_size, spec.object_count, spec.backend.workers(), spec.read_write_mix)
+
+
+
+def fingerprint(spec, ceph_password):
+    """ A fingerprint of the targets of a spec, to tell whether they have changed.  The password is
+        None unless we may SSH to the monitors. """
+
+    protocol = spec.protocol
+    parts = []
+
+    for t in protocol.targets():
+        try:
+            parts.append('{}={}'.format(t, socket.gethostbyname(t)))
+        except OSError:
+            parts.append(t)
+
+    if protocol.name() in ['block', 'file']:
+        parts.append(socket.gethostname())
+
+    # S3 targets are gateways, which we can't assume are ceph nodes that we can log in to.
+    if protocol.name() in ['rados', 'rbd', 'cephfs'] and ceph_password is not None:
+        host = protocol.targets()[0]
+        cmd = "sshpass -p {} ssh {} root@{} '{}'".format(ceph_password, _ssh_options, host, _ceph_fingerprint)
+        rc = subprocess.run(cmd, shell=True, capture_output=True)
+        if rc.returncode == 0:
+            parts.append(rc.stdout.decode('utf-8'))
+        else:
+            print("Unable to fingerprint the cluster through {}, so only its addresses are checked".format(host))
+
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+
+class Memo:
+    """ The memoized results in a file. """
+
+    def __init__(self, filename, ttl=None, fingerprint=None, context=None):
+        self.filename = filename
+        self.ttl = None if ttl is None or ttl == 'forever' else int(ttl)
+        self.fingerprint = fingerprint
+        self.context = context
+        self.entries = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(filename):
+            try:
+                with open(filename) as f:
+                    self.entries = json.load(f)
+            except ValueError:
+                print("Ignoring unreadable memo file {}".format(filename))
+
+
+    def __repr__(self): return str(vars(self))
+
+
+    def _save(self):
+        # Write a new file and move it into place, so that we never leave half a file behind.
+        temp = self.filename + '.tmp'
+        with open(temp, 'w') as f:
+            json.dump(self.entries, f, indent=3)
+        os.replace(temp, self.filename)
+
+
+    def lookup(self, spec):
+        """ Return a copy of the memoized result for a spec, marked as cached and with the spec's
+            description, or None if there isn't a fresh one. """
+
+        entry = self.entries.get(key(spec, self.context))
+        if entry is None or entry['fingerprint'] != self.fingerprint:
+            return None
+
+        if self.ttl is not None and time.time() - entry['time'] > self.ttl:
+            return None
+
+        result = Result.from_dict(entry['result'])
+        result.status = 'cached: run at {}'.format(result.start_time)
+        result.description = spec.description
+        return result
+
+
+    def record(self, spec, result):
+        """ Memoize the result of a spec, unless it was aborted. """
+
+        if result.status != 'ok':
+            return
+
+        with self._lock:
+            self.entries[key(spec, self.context)] = {
+                'time': time.time(),
+                'fingerprint': self.fingerprint,
+                'summary': _summary(spec),
+                'result': json.loads(result.to_json())
+            }
+            self._save()
+
+
+    def recording(self, spec, post_process):
+        """ Wrap the post processing of a point so that it also memoizes the result. """
+
+        def wrapped():
+            result = post_process()
+            self.record(spec, result)
+            return result
+
+        return wrapped
+
+
+    def list(self):
+        for k, entry in sorted(self.entries.items(), key=lambda e: e[1]['time']):
+            age = (time.time() - entry['time']) / 3600
+            print("{}  {:7.1f}h old  {}".format(k[:12], age, entry['summary']))
+        print("{} memoized results in {}".format(len(self.entries), self.filename))
+
+
+    def clear(self):
+        count = len(self.entries)
+        self.entries = {}
+        self._save()
+        print("Removed {} memoized results".format(count))
+
+
+    def invalidate(self, prefixes):
+        """ Remove the entries whose keys start with any of a list of prefixes. """
+
+        doomed = [k for k in self.entries if any(k.startswith(p) for p in prefixes)]
+        for k in doomed:
+            del self.entries[k]
+        self._save()
+        print("Removed {} memoized results".format(len(doomed)))
@@ -0,0 +1,370 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+A built-in IO engine for the block and file protocols.
+
+This lets us run a quick check of a single node's block device or file system without a
+sibench server fleet, or even fio.  It drives IO from a pool of threads (the IO itself
+releases the GIL), each doing one operation at a time.
+
+The mapping from a spec is:
+  - object size:  the size of each IO.  Only fixed sizes are supported, and with O_DIRECT
+                  they must be a multiple of 4K.
+  - object count: the number of IO-sized blocks in the region we work over, which starts
+                  at the beginning of the device, or of a file that we create.
+  - mix:          0 runs a write pass and then a read pass, anything else a single mixed
+                  pass.  Either way, the region is filled with data first (unless the
+                  previous point left it for us).
+
+Every thread works from buffers and tables set up before the run: an mmap-backed (and so
+page aligned) data buffer, an array of precomputed offsets, an array of read/write choices,
+and a latency histogram.  So the loop itself does no allocation beyond python's own ints.
+
+With a rate, IOs are due at fixed intervals rather than issued back to back (an open loop,
+as in s3load.py), and each thread takes the next one that is due from a shared counter.
+Latencies are then measured from when an IO was due, with service times kept alongside.
+"""
+
+import array
+import benchmaster.cachestate as cachestate
+import benchmaster.histogram as histogram
+import benchmaster.sizes as sizes
+import benchmaster.trace as trace
+import benchmaster.units as units
+import itertools
+import mmap
+import os
+import random
+import threading
+import time
+
+from benchmaster.histogram import Histogram
+from benchmaster.result import Result
+
+# The name of the file we work on, within the directory for the file protocol.
+data_file = 'benchmaster-native.dat'
+
+# How many offsets (and read/write choices) each thread precomputes, before it cycles round them again.
+_table_size = 65536
+
+# The size of the writes with which we fill the region.
+_fill_size = 4 * 1024 * 1024
+
+_alignment = 4096
+
+
+class Worker:
+    """ The tables and results for a single thread of a single pass. """
+
+    def __init__(self, index, engine, read_percent):
+        rng = random.Random(index)
+        blocks = engine.blocks
+        threads = engine.threads
+
+        self.buffer = mmap.mmap(-1, engine.io_size)
+        self.buffer.write(os.urandom(engine.io_size))
+        self.buffers = [self.buffer]
+
+        # Sequential threads each stream through their own share of the region.
+        if engine.pattern == 'seq':
+            share = max(1, blocks // threads)
+            first = (index * share) % blocks
+            self.offsets = array.array('q', ((first + i % share) * engine.io_size for i in range(_table_size)))
+        else:
+            self.offsets = array.array('q', (rng.randrange(blocks) * engine.io_size for i in range(_table_size)))
+
+        self.reads = bytearray(1 if (i * 37) % 100 < read_percent else 0 for i in range(_table_size))
+
+        self.histograms = [Histogram(), Histogram()]
+        self.service = [Histogram(), Histogram()]
+        self.failures = [0, 0]
+
+
+    def close(self):
+        self.buffer.close()
+
+
+
+class Engine:
+    """ Runs the IO for a single spec. """
+
+    def __init__(self, spec):
+        distribution = sizes.parse(spec.object_size)
+        if not distribution.is_fixed():
+            print("The native engine only supports fixed object sizes, not {}".format(spec.object_size))
+            exit(-1)
+
+        self.spec = spec
+        self.io_size = distribution.classes[0].low
+        self.blocks = int(spec.object_count)
+        self.threads = int(spec.backend.threads)
+        self.pattern = spec.backend.pattern
+        self.direct = spec.backend.direct
+        self.rate = _rate(spec)
+
+        if self.pattern not in ['rand', 'seq']:
+            print("Unknown access pattern for the native engine: {}".format(self.pattern))
+            exit(-1)
+
+        if self.direct and self.io_size % _alignment != 0:
+            print("O_DIRECT needs an object size that is a multiple of {}".format(_alignment))
+            exit(-1)
+
+
+    def path(self):
+        if self.spec.protocol.name() == 'block':
+            return self.spec.protocol.device
+        return os.path.join(self.spec.protocol.directory, data_file)
+
+
+    def _open(self):
+        flags = os.O_RDWR
+        if self.spec.protocol.name() == 'file':
+            flags |= os.O_CREAT
+        if self.direct:
+            flags |= os.O_DIRECT
+        return os.open(self.path(), flags, 0o644)
+
+
+    def fill(self):
+        """ Write the whole region sequentially, so that reads find real data. """
+
+        size = self.blocks * self.io_size
+        print("Filling {} bytes of {}".format(size, self.path()))
+
+        chunk = min(_fill_size, size)
+        chunk -= chunk % self.io_size
+        buffer = mmap.mmap(-1, chunk)
+        buffer.write(os.urandom(chunk))
+
+        fd = self._open()
+        try:
+            offset = 0
+            while offset < size:
+                length = min(chunk, size - offset)
+                os.pwritev(fd, [memoryview(buffer)[:length]], offset)
+                offset += length
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+            buffer.close()
+
+
+    def _timed_pass(self, read_percent):
+        """ Run a pass in which a percentage of operations are reads, and the rest writes. """
+
+        runtype = self.spec.runtype
+        workers = [Worker(i, self, read_percent) for i in range(self.threads)]
+
+        start = time.perf_counter() + 0.1
+        measure_from = start + int(runtype.ramp_up)
+        measure_to = measure_from + int(runtype.runtime)
+        end = measure_to + int(runtype.ramp_down)
+
+        def run(w):
+            fd = self._open()
+            offsets = w.offsets
+            reads = w.reads
+            buffers = w.buffers
+            histograms = w.histograms
+            failures = w.failures
+            clock = time.perf_counter
+            n = 0
+
+            try:
+                while True:
+                    i = n % _table_size
+                    n += 1
+                    is_read = reads[i]
+
+                    before = clock()
+                    if before >= end:
+                        break
+
+                    try:
+                        if is_read:
+                            ok = os.preadv(fd, buffers, offsets[i]) == self.io_size
+                        else:
+                            ok = os.pwritev(fd, buffers, offsets[i]) == self.io_size
+                    except OSError:
+                        ok = False
+
+                    after = clock()
+                    if measure_from <= before < measure_to:
+                        if ok:
+                            histograms[is_read].add(int((after - before) * 1000000))
+                        else:
+                            failures[is_read] += 1
+            finally:
+                os.close(fd)
+
+        # The IOs that are due, which the threads share.  Taking the next from a count is atomic.
+        arrivals = itertools.count()
+
+        def run_open_loop(w):
+            fd = self._open()
+            offsets = w.offsets
+            reads = w.reads
+            buffers = w.buffers
+            histograms = w.histograms
+            service = w.service
+            failures = w.failures
+            clock = time.perf_counter
+            rate = self.rate
+
+            try:
+                while True:
+                    k = next(arrivals)
+                    due = start + k / rate
+                    if due >= end:
+                        break
+
+                    # Wait until the IO is due, unless we're already behind.  Only when we're behind has
+                    # the device held it up, so only then is its latency measured from when it was due.
+                    before = clock()
+                    if before >= end:
+                        break
+                    started = due
+                    if due > before:
+                        time.sleep(due - before)
+                        before = clock()
+                        started = before
+
+                    i = k % _table_size
+                    is_read = reads[i]
+
+                    try:
+                        if is_read:
+                            ok = os.preadv(fd, buffers, offsets[i]) == self.io_size
+                        else:
+                            ok = os.pwritev(fd, buffers, offsets[i]) == self.io_size
+                    except OSError:
+                        ok = False
+
+                    after = clock()
+                    if measure_from <= due < measure_to:
+                        if ok:
+                            histograms[is_read].add(int((after - started) * 1000000))
+                            service[is_read].add(int((after - before) * 1000000))
+                        else:
+                            failures[is_read] += 1
+            finally:
+                os.close(fd)
+
+        threads = [threading.Thread(target=run_open_loop if self.rate else run, args=(w,)) for w in workers]
+        for t in threads: t.start()
+        for t in threads: t.join()
+
+        for w in workers:
+            w.close()
+
+        # Anything still waiting to start at the end was never sent: the load was more than we could offer.
+        if self.rate:
+            sent = next(arrivals) - self.threads
+            due = int(self.rate * (end - start))
+            if sent < due:
+                print("Only {} of the {} IOs due were sent: more threads are needed for this rate".format(sent, due))
+
+        return workers
+
+
+    def run(self):
+        """ Run all the passes, and return a map from direction to a tuple of histogram, failure count and
+            service time histogram (which is empty unless we're running an open loop). """
+
+        mix = int(self.spec.read_write_mix)
+        if mix == 0:
+            print("Running write pass")
+            writes = self._timed_pass(0)
+            cachestate.between_passes(self.spec)
+            print("Running read pass")
+            reads = self._timed_pass(100)
+            passes = [(0, writes), (1, reads)]
+        else:
+            print("Running mixed pass")
+            workers = self._timed_pass(min(mix, 100))
+            passes = [(0, workers), (1, workers)]
+
+        results = {}
+        for direction, workers in passes:
+            merged = Histogram()
+            service = Histogram()
+            for w in workers:
+                merged.merge(w.histograms[direction])
+                service.merge(w.service[direction])
+            results['read' if direction else 'write'] = (merged, sum(w.failures[direction] for w in workers), service)
+
+        return results
+
+
+
+def prepare(spec):
+    """ Fill the region with data, unless the previous point left it for us. """
+
+    if spec.reuse_data:
+        print("Reusing the data left by the previous point")
+        return
+
+    with trace.phase('fill'):
+        Engine(spec).fill()
+
+
+
+def run(spec):
+    """ Run the test described by the spec using the native engine. """
+    return process(spec, execute(spec))
+
+
+
+def execute(spec):
+    """ Run the IO, and return a map from direction to a tuple of its histogram, failure count and service times. """
+
+    protocol = spec.protocol.name()
+    if protocol not in ['block', 'file']:
+        print('Bad storage type for the native engine: {}'.format(protocol))
+        exit(-1)
+
+    if spec.runtype.name() != 'time':
+        print('Bad runtype for the native engine: {}'.format(spec.runtype.name()))
+        exit(-1)
+
+    engine = Engine(spec)
+    with trace.phase('run native engine', measured=True):
+        results = engine.run()
+
+    if protocol == 'file' and spec.clean_up and not spec.keep_data:
+        print("Removing {}".format(engine.path()))
+        os.remove(engine.path())
+
+    return results
+
+
+
+def process(spec, stats):
+    """ Build a Result from the histograms of a run. """
+
+    runtime = int(spec.runtype.runtime)
+    size = sizes.parse(spec.object_size).classes[0].low
+
+    result = Result(spec)
+    result.id = '-'
+
+    for direction in ['read', 'write']:
+        merged, failures, service = stats[direction]
+        setattr(result, direction, histogram.direction_result(merged, merged.count * size, failures, runtime, service))
+
+    if _rate(spec):
+        result.offered_rate = _rate(spec)
+    return result
+
+
+
+def _rate(spec):
+    """ The rate (in IOs/s) at which to offer IO, or 0 for a closed loop. """
+
+    try:
+        return units.to_ops_per_second(spec.backend.rate, sizes.parse(spec.object_size).mean_bytes())
+    except ValueError as e:
+        print("Bad rate for the native engine: {}".format(e))
+        exit(-1)
@@ -0,0 +1,277 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Measurement of the network between the sibench servers and the targets.
+
+A benchmark can't go faster than the network that carries it, and a slow link (or bad LACP
+hashing) looks just like a slow cluster.  So before a sweep we can measure raw TCP
+throughput and round trip time for every path from a sibench server to a target, in both
+directions.  We use iperf3 if it is installed at both ends, and otherwise a small sender
+and receiver of our own, which we run with 'python3 -' over ssh.
+
+Paths are measured one at a time, so each measurement is of the path on its own.  From them
+we estimate the ceiling for a run: each server can send (or receive) no faster than its best
+path, each target likewise, and the whole run can go no faster than the smaller of the sum
+over the servers and the sum over the targets.  Results then report their bandwidth as a
+percentage of that ceiling, and anything close to 100% was limited by the network rather
+than the storage.  A point that runs on only some of the targets or servers (in a scale-out
+sweep) is held up against the ceiling of just the paths it uses.
+"""
+
+import json
+import subprocess
+import time
+
+# The port used by the receiver on each target.
+_port = 5201
+
+# Round trips we time before sending the bulk data.
+_pings = 10
+
+_script = '''
+import json, socket, sys, time
+mode, port, pings = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+buf = bytearray(1024 * 1024)
+
+def receive(c):
+    total = 0
+    while True:
+        n = c.recv_into(buf)
+        if not n: return total
+        total += n
+
+def send(c, seconds):
+    total = 0
+    end = time.time() + seconds
+    while time.time() < end:
+        c.sendall(buf)
+        total += len(buf)
+    return total
+
+if mode in ['recv', 'recv-reverse']:
+    s = socket.socket()
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    s.bind(('', port))
+    s.listen(1)
+    s.settimeout(60)
+    print('ready', flush=True)
+    c, _ = s.accept()
+    for i in range(pings):
+        c.recv(1)
+        c.sendall(b'p')
+    if mode == 'recv':
+        receive(c)
+        c.sendall(b'done')
+    else:
+        seconds = float(c.recv(64).decode())
+        send(c, seconds)
+        c.shutdown(socket.SHUT_WR)
+        c.recv(4)
+else:
+    host, seconds = sys.argv[4], float(sys.argv[5])
+    c = socket.create_connection((host, port), timeout=60)
+    c.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    rtts = []
+    for i in range(pings):
+        start = time.perf_counter()
+        c.sendall(b'p')
+        c.recv(1)
+        rtts.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    if mode == 'send':
+        total = send(c, seconds)
+        c.shutdown(socket.SHUT_WR)
+        c.recv(4)
+    else:
+        c.sendall(str(seconds).encode())
+        total = receive(c)
+        c.sendall(b'done')
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'bytes': total, 'seconds': elapsed, 'rtt': sum(rtts) / len(rtts)}))
+'''
+
+
+class Path:
+    """ The measured performance of the path from one server to one target. """
+
+    def __init__(self, server, target, write_bandwidth, read_bandwidth, rtt, tool):
+        self.server = server
+        self.target = target
+        self.write_bandwidth = write_bandwidth
+        self.read_bandwidth = read_bandwidth
+        self.rtt = rtt
+        self.tool = tool
+
+    def __repr__(self): return str(vars(self))
+
+    def __str__(self):
+        return "{} -> {}: {:.1f} MB/s out, {:.1f} MB/s back, RTT {:.3f} ms ({})".format(
+                self.server, self.target, self.write_bandwidth, self.read_bandwidth, self.rtt, self.tool)
+
+
+
+class Ceiling:
+    """ The network ceiling for a run, worked out from the measurements of each path. """
+
+    def __init__(self, paths):
+        self.paths = paths
+        self.write = self._limit(lambda p: p.write_bandwidth)
+        self.read = self._limit(lambda p: p.read_bandwidth)
+
+
+    def __repr__(self): return str(vars(self))
+
+
+    def _limit(self, bandwidth):
+        servers = {}
+        targets = {}
+        for p in self.paths:
+            servers[p.server] = max(servers.get(p.server, 0), bandwidth(p))
+            targets[p.target] = max(targets.get(p.target, 0), bandwidth(p))
+        return min(sum(servers.values()), sum(targets.values()))
+
+
+    def restrict(self, targets, servers=None):
+        """ The ceiling for a run that uses only some of the targets (and perhaps of the servers), as the
+            points of a scale-out sweep do.  Returns None if we measured none of its paths. """
+
+        paths = [p for p in self.paths if p.target in targets and (servers is None or p.server in servers)]
+        return Ceiling(paths) if paths else None
+
+
+    def annotate(self, result):
+        """ Record the ceiling in a result, and how close it came. """
+
+        result.net_ceiling = "{:.1f} MB/s write, {:.1f} MB/s read".format(self.write, self.read)
+
+        if result.write is not None and isinstance(result.write.bandwidth, (int, float)) and self.write > 0:
+            result.write_net_percent = 100 * result.write.bandwidth / self.write
+
+        if result.read is not None and isinstance(result.read.bandwidth, (int, float)) and self.read > 0:
+            result.read_net_percent = 100 * result.read.bandwidth / self.read
+
+
+
+def _command(host, password, args):
+    """ Build the command to run something on a host, over ssh unless it is us. """
+
+    if host == 'localhost':
+        return args
+    return 'sshpass -p {} ssh -o UserKnownHostsFile=/dev/null -o StrictHostKeyChecking=no root@{} {}'.format(
+            password, host, args)
+
+
+
+def _has_iperf3(host, password):
+    rc = subprocess.run(_command(host, password, 'command -v iperf3'), shell=True, capture_output=True)
+    return rc.returncode == 0
+
+
+
+def _stop(receiver, target, target_pw, listener, wait):
+    """ Make sure that a receiver has gone.  If the sender failed, the receiver never got a connection and
+        would go on waiting for one, so we don't wait (and have a timeout hide the sender's error) but kill
+        it: on the target too, since killing ssh can leave the listener running there. """
+
+    if wait:
+        try:
+            receiver.wait(timeout=60)
+            return
+        except subprocess.TimeoutExpired:
+            pass
+
+    receiver.kill()
+    receiver.wait()
+
+    # The brackets stop the pattern from matching the shell that runs pkill.
+    pattern = '[{}]{}'.format(listener[0], listener[1:])
+    subprocess.run(_command(target, target_pw, "pkill -f '{}'".format(pattern)), shell=True, capture_output=True)
+
+
+
+def _iperf3(server, server_pw, target, target_pw, seconds, reverse):
+    """ Returns the bandwidth (in MB/s) and mean RTT (in ms) of one direction of a path, using iperf3. """
+
+    listener = 'iperf3 -s -1 -p {}'.format(_port)
+    receiver = subprocess.Popen(_command(target, target_pw, listener),
+                                shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        cmd = 'iperf3 -c {} -p {} -t {} -J{}'.format(target, _port, seconds, ' -R' if reverse else '')
+
+        # The server may take a moment to start listening.
+        for attempt in range(5):
+            rc = subprocess.run(_command(server, server_pw, cmd), shell=True, capture_output=True)
+            if rc.returncode == 0:
+                break
+            time.sleep(1)
+        else:
+            raise Exception(rc.stdout.decode('utf-8') + rc.stderr.decode('utf-8'))
+
+        data = json.loads(rc.stdout.decode('utf-8'))
+        bandwidth = data['end']['sum_received']['bits_per_second'] / 8 / (1024 * 1024)
+        rtt = data['end']['streams'][0]['sender'].get('mean_rtt', 0) / 1000
+    except BaseException:
+        _stop(receiver, target, target_pw, listener, False)
+        raise
+
+    _stop(receiver, target, target_pw, listener, True)
+    return (bandwidth, rtt)
+
+
+
+def _python(server, server_pw, target, target_pw, seconds, reverse):
+    """ Returns the bandwidth (in MB/s) and mean RTT (in ms) of one direction of a path, using our own script. """
+
+    mode = 'recv-reverse' if reverse else 'recv'
+    listener = 'python3 - {} {} {}'.format(mode, _port, _pings)
+    receiver = subprocess.Popen(_command(target, target_pw, listener),
+                                shell=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        receiver.stdin.write(_script.encode('utf-8'))
+        receiver.stdin.close()
+
+        if receiver.stdout.readline().decode('utf-8').strip() != 'ready':
+            raise Exception("Unable to start the receiver on {}".format(target))
+
+        mode = 'send-reverse' if reverse else 'send'
+        cmd = _command(server, server_pw, 'python3 - {} {} {} {} {}'.format(mode, _port, _pings, target, seconds))
+        rc = subprocess.run(cmd, shell=True, input=_script.encode('utf-8'), capture_output=True)
+        if rc.returncode != 0:
+            raise Exception(rc.stderr.decode('utf-8'))
+
+        data = json.loads(rc.stdout.decode('utf-8'))
+    except BaseException:
+        _stop(receiver, target, target_pw, listener, False)
+        raise
+
+    _stop(receiver, target, target_pw, listener, True)
+    return (data['bytes'] / data['seconds'] / (1024 * 1024), data['rtt'] * 1000)
+
+
+
+def measure(servers, server_pw, targets, target_pw, seconds):
+    """ Measure every path from a server to a target, and return the Ceiling they give us. """
+
+    paths = []
+    for s in servers:
+        for t in targets:
+            use_iperf3 = _has_iperf3(s, server_pw) and _has_iperf3(t, target_pw)
+            tool = 'iperf3' if use_iperf3 else 'python'
+            fn = _iperf3 if use_iperf3 else _python
+
+            print("Measuring network from {} to {} with {}".format(s, t, tool))
+            try:
+                write_bandwidth, rtt = fn(s, server_pw, t, target_pw, seconds, False)
+                read_bandwidth, _ = fn(s, server_pw, t, target_pw, seconds, True)
+            except Exception as e:
+                print("Unable to measure the network from {} to {}: {}".format(s, t, e))
+                exit(-1)
+
+            path = Path(s, t, write_bandwidth, read_bandwidth, rtt, tool)
+            print("  {}".format(path))
+            paths.append(path)
+
+    ceiling = Ceiling(paths)
+    print("Network ceiling: {:.1f} MB/s write, {:.1f} MB/s read".format(ceiling.write, ceiling.read))
+    return ceiling
@@ -0,0 +1,83 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Post-processing of benchmark output in parallel with the rest of a sweep.
+
+Turning the raw output of a backend into a Result (parsing sibench's json, or cosbench's
+CSVs) and then storing it and uploading it to a spreadsheet all takes time during which
+the cluster would otherwise sit idle.  Instead, the sweep hands each point's output to a
+PostProcessor and moves straight on to the next point.
+
+Parsing happens in a pool of worker threads.  Storing happens in a single thread of its
+own, in the order in which points were submitted, so the order of stored results is the
+same as it would have been without the pipeline.  A point whose post-processing fails is
+reported (both when it happens, and again at the end of the sweep) but the sweep goes on.
+That includes a point whose processing gives up with exit() (having printed why), which
+would otherwise be lost in a worker thread.
+Jobs run in a copy of the context in which they were submitted, so that they still know
+which point they belong to (for tracing).
+"""
+
+import contextvars
+import traceback
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PostProcessor:
+    """ Runs post-processing jobs, either inline or in a pool of workers. """
+
+    def __init__(self, workers, store):
+        """ Store is called with each Result, in the order in which they were submitted. 
+            If there are no workers, then everything is done inline when it is submitted. """
+
+        self.store = store
+        self.failures = []
+        self._count = 0
+        self._parse_pool = None
+        self._store_pool = None
+
+        if workers > 0:
+            self._parse_pool = ThreadPoolExecutor(max_workers=workers)
+            self._store_pool = ThreadPoolExecutor(max_workers=1)
+
+
+    def submit(self, process):
+        """ Submit a function which returns a Result. """
+
+        self._count += 1
+        index = self._count
+
+        if self._parse_pool is None:
+            self._finish(index, process)
+        else:
+            parsed = self._parse_pool.submit(contextvars.copy_context().run, process)
+            self._store_pool.submit(contextvars.copy_context().run, self._finish, index, parsed.result)
+
+
+    def close(self):
+        """ Wait for everything to complete, and report on any failures. """
+
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown(wait=True)
+            self._store_pool.shutdown(wait=True)
+
+        if self.failures:
+            print("Post-processing failed for {} of {} points:".format(len(self.failures), self._count))
+            for index, error in self.failures:
+                print("  Point {}: {}".format(index, error))
+
+        return not self.failures
+
+
+    def _finish(self, index, process):
+        try:
+            self.store(process())
+        except SystemExit as e:
+            print("Post-processing gave up on point {}".format(index))
+            self.failures.append((index, 'exited with status {}'.format(e.code)))
+        except Exception as e:
+            print("Post-processing failed for point {}: {}".format(index, e))
+            traceback.print_exc()
+            self.failures.append((index, e))
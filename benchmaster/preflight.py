@@ -0,0 +1,217 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Pre-flight checks of everything a sweep depends on.
+
+A gateway that is down, a sibench server that isn't listening or a bad set of S3 keys
+otherwise shows up an hour into a sweep, as an exit or a row of zero bandwidth.  So before
+we run anything, we check all of them at once (with asyncio, and tight timeouts), print a
+single report, and give up straight away if anything is wrong.
+
+We check:
+  - that every gateway or monitor accepts TCP connections.
+  - that every sibench server (or remote fio server) is listening.
+  - for S3, that a signed request with our keys is accepted, and whether the bucket exists.
+  - for rados and rbd, that the pool exists (over ssh, when we have the root password).
+  - for the built-in engines and local fio, that the device or directory exists.
+"""
+
+import asyncio
+import benchmaster.s3load as s3load
+import os
+import time
+
+# How long we give each check, in seconds.
+_timeout = 5
+
+# The ports on which a ceph monitor may be listening (msgr2 and legacy).
+_monitor_ports = [3300, 6789]
+
+# The default port for 'fio --server'.
+_fio_port = 8765
+
+
+class Check:
+    """ The outcome of a single check. """
+
+    def __init__(self, name, ok, detail):
+        self.name = name
+        self.ok = ok
+        self.detail = detail
+
+    def __repr__(self): return str(vars(self))
+
+    def __str__(self):
+        return "  {:<5} {}: {}".format('OK' if self.ok else 'FAIL', self.name, self.detail)
+
+
+
+async def _connect(host, port):
+    """ Open a connection, and return the time it took in ms.  Raises on failure. """
+
+    start = time.perf_counter()
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, int(port)), _timeout)
+    elapsed = (time.perf_counter() - start) * 1000
+    writer.close()
+    return elapsed
+
+
+
+async def _tcp(name, host, ports):
+    """ Check that a host is accepting connections on (any one of) a list of ports. """
+
+    errors = []
+    for port in ports:
+        try:
+            elapsed = await _connect(host, port)
+            return Check(name, True, "{}:{} reachable in {:.1f} ms".format(host, port, elapsed))
+        except (OSError, asyncio.TimeoutError) as e:
+            errors.append("{}:{} {}".format(host, port, str(e) or 'timed out'))
+
+    return Check(name, False, ', '.join(errors))
+
+
+
+async def _s3_status(protocol, gateway, method, path):
+    """ Make a signed S3 request, and return its HTTP status. """
+
+    host = '{}:{}'.format(gateway, protocol.port)
+    signer = s3load.Signer(protocol.access_key, protocol.secret_key)
+    headers = signer.headers(method, host, path)
+    headers['Connection'] = 'close'
+
+    request = '{} {} HTTP/1.1\r\n'.format(method, path)
+    request += ''.join('{}: {}\r\n'.format(k, v) for k, v in headers.items())
+    request += '\r\n'
+
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(gateway, int(protocol.port)), _timeout)
+    try:
+        writer.write(request.encode('utf-8'))
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), _timeout)
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+
+async def _s3_credentials(protocol):
+    name = "S3 credentials"
+    try:
+        status = await _s3_status(protocol, protocol.targets()[0], 'GET', '/')
+    except (OSError, asyncio.TimeoutError, IndexError, ValueError) as e:
+        return Check(name, False, "request failed: {}".format(str(e) or 'timed out'))
+
+    if status == 200:
+        return Check(name, True, "accepted by {}".format(protocol.targets()[0]))
+    return Check(name, False, "rejected by {} with status {}".format(protocol.targets()[0], status))
+
+
+
+async def _s3_bucket(protocol):
+    name = "S3 bucket {}".format(protocol.bucket)
+    try:
+        status = await _s3_status(protocol, protocol.targets()[0], 'HEAD', '/{}'.format(protocol.bucket))
+    except (OSError, asyncio.TimeoutError, IndexError, ValueError) as e:
+        return Check(name, False, "request failed: {}".format(str(e) or 'timed out'))
+
+    # A missing bucket is fine: the benchmark will create it.
+    if status == 200:
+        return Check(name, True, "exists")
+    if status == 404:
+        return Check(name, True, "does not exist yet, and will be created")
+    return Check(name, False, "status {}".format(status))
+
+
+
+async def _ceph_pool(monitor, password, pool):
+    name = "Ceph pool {}".format(pool)
+    cmd = 'sshpass -p {} ssh -o UserKnownHostsFile=/dev/null -o StrictHostKeyChecking=no -o ConnectTimeout={} root@{} ceph osd pool ls'.format(
+            password, _timeout, monitor)
+
+    try:
+        proc = await asyncio.create_subprocess_shell(cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), _timeout * 2)
+    except asyncio.TimeoutError:
+        proc.kill()
+        return Check(name, False, "timed out listing pools on {}".format(monitor))
+
+    if proc.returncode != 0:
+        return Check(name, False, "unable to list pools on {}: {}".format(monitor, stderr.decode('utf-8').strip()))
+
+    if pool in stdout.decode('utf-8').split():
+        return Check(name, True, "exists")
+    return Check(name, False, "does not exist")
+
+
+
+async def _path(path):
+    name = "Path {}".format(path)
+    if os.path.exists(path):
+        return Check(name, True, "exists")
+    return Check(name, False, "does not exist")
+
+
+
+def _checks(spec, ceph_password):
+    """ Build the list of checks that apply to a spec. """
+
+    protocol = spec.protocol
+    backend = spec.backend
+    checks = []
+
+    if protocol.name() == 's3':
+        for g in protocol.targets():
+            checks.append(_tcp("Gateway", g, [protocol.port]))
+        checks.append(_s3_credentials(protocol))
+        checks.append(_s3_bucket(protocol))
+
+    if protocol.name() in ['rados', 'rbd', 'cephfs']:
+        for m in protocol.targets():
+            checks.append(_tcp("Monitor", m, _monitor_ports))
+
+    if protocol.name() in ['rados', 'rbd'] and ceph_password is not None:
+        checks.append(_ceph_pool(protocol.targets()[0], ceph_password, protocol.pool))
+        if protocol.name() == 'rbd' and protocol.datapool:
+            checks.append(_ceph_pool(protocol.targets()[0], ceph_password, protocol.datapool))
+
+    if backend.name() == 'sibench':
+        for s in backend.servers:
+            checks.append(_tcp("Sibench server", s, [backend.port]))
+
+    if backend.name() == 'fio' and not backend.is_local():
+        for s in backend.servers:
+            checks.append(_tcp("Fio server", s, [_fio_port]))
+
+    if backend.name() == 'native' or (backend.name() == 'fio' and backend.is_local()):
+        checks.append(_path(protocol.targets()[0]))
+
+    return checks
+
+
+
+async def _run_all(checks):
+    return await asyncio.gather(*checks)
+
+
+
+def run(spec, ceph_password):
+    """ Run all the checks for a spec at once, print a report, and exit if any of them failed.
+        The ceph root password may be None, in which case we skip the checks that need it. """
+
+    checks = _checks(spec, ceph_password)
+    if not checks:
+        return
+
+    start = time.time()
+    results = asyncio.run(_run_all(checks))
+
+    print("Pre-flight checks ({:.1f}s):".format(time.time() - start))
+    for r in results:
+        print(r)
+
+    failures = [r for r in results if not r.ok]
+    if failures:
+        print("{} pre-flight check(s) failed; use --skip-preflight to run anyway".format(len(failures)))
+        exit(-1)
@@ -0,0 +1,282 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Live progress of a sweep.
+
+While a sweep runs, the backends report what they are doing: the phase of the current point
+(preparing, ramp-up, measuring, ramp-down, cleanup and so on) and, where they can tell us,
+the current bandwidth and operation rate.  We print a status line with all that and an ETA
+for the whole sweep, at most every few seconds, and can also write every update to a file
+as json lines for other tools to follow.
+
+The ETA comes from what each point should take (its ramp up, run time and ramp down, for
+each pass), scaled by how long the points so far have really taken compared to that, so
+that it learns about preparation, clean up and other overheads as the sweep goes on.
+
+Backends report through the module-level report() function, which does nothing when there
+is no sweep in progress.  While a backend's run can be cancelled, it registers a way to do
+so with on_abort(), and we check each update against the sweep's abort policy (if it has
+one).  See abort.py.
+"""
+
+import benchmaster.sizes as sizes
+import json
+import sys
+import threading
+import time
+
+# The minimum time between status lines, in seconds.
+_status_interval = 10
+
+# What we assume a point will take when we can't work it out (for instance for ops-based runs).
+_default_duration = 60
+
+_current = None
+
+
+def _format_duration(seconds):
+    seconds = int(seconds)
+    return '{}:{:02d}:{:02d}'.format(seconds // 3600, (seconds // 60) % 60, seconds % 60)
+
+
+
+def passes(spec):
+    """ The names of the measured passes in a run of a spec. """
+    return ['write', 'read'] if spec.read_write_mix == '0' else ['mixed']
+
+
+
+def expected_duration(spec):
+    """ How long we expect the measured part of a spec to take, in seconds. """
+
+    if spec.runtype.name() != 'time':
+        return _default_duration
+
+    # Sibench runs a distribution of sizes as one run per size class.
+    runs = len(sizes.parse(spec.object_size).classes) if spec.backend.name() == 'sibench' else 1
+
+    r = spec.runtype
+    return runs * len(passes(spec)) * (int(r.ramp_up) + int(r.runtime) + int(r.ramp_down))
+
+
+
+def timed_phase(spec, elapsed):
+    """ The phase that a time-based run of a spec should be in, a given number of seconds after it started. """
+
+    r = spec.runtype
+    for p in passes(spec):
+        for name, length in [('ramp-up', int(r.ramp_up)), ('measuring', int(r.runtime)), ('ramp-down', int(r.ramp_down))]:
+            if elapsed < length:
+                return '{} {}'.format(p, name)
+            elapsed -= length
+
+    return 'finishing'
+
+
+
+class Progress:
+    """ Tracks the progress of a sweep, and reports it. """
+
+    def __init__(self, specs, events_file, policy=None):
+        self.specs = specs
+        self.policy = policy
+        self.sweep_start = time.time()
+        self.index = None
+        self.point_start = None
+        self.phase = None
+        self.bandwidth = None
+        self.ops = None
+        self.failures = None
+        self.last_change = None
+        self.run_start = None
+        self.abort_reason = None
+        self.samples = {}
+        self.expected_done = 0
+        self.actual_done = 0
+        self._last_status = 0
+        self._cancel = None
+        self._lock = threading.Lock()
+        self._events = open(events_file, 'a') if events_file is not None else None
+
+
+    def _ratio(self):
+        """ How long points have really taken, compared to what we expected of them. """
+        return self.actual_done / self.expected_done if self.expected_done > 0 else 1.0
+
+
+    def eta(self):
+        """ Our estimate of the number of seconds left in the sweep. """
+
+        if self.index is None:
+            remaining = self.specs
+            current = 0
+        else:
+            remaining = self.specs[self.index + 1:]
+            expected = expected_duration(self.specs[self.index]) * self._ratio()
+            current = max(0, expected - (time.time() - self.point_start))
+
+        return current + sum(expected_duration(s) for s in remaining) * self._ratio()
+
+
+    def _status(self):
+        status = '[{}/{} ETA {}] {}'.format(self.index + 1, len(self.specs), _format_duration(self.eta()), self.phase or '')
+
+        if self.bandwidth is not None:
+            status += ' {:.1f} MB/s'.format(self.bandwidth)
+        if self.ops is not None:
+            status += ' {:.0f} ops/s'.format(self.ops)
+
+        return status
+
+
+    def _emit(self, event, force=False):
+        """ Write an event to the events file, and print a status line if it's been a while. """
+
+        event['time'] = time.time()
+        event['point'] = self.index + 1
+        event['points'] = len(self.specs)
+        event['eta'] = self.eta()
+
+        if self._events is not None:
+            self._events.write(json.dumps(event) + '\n')
+            self._events.flush()
+
+        if force or event['time'] - self._last_status >= _status_interval:
+            self._last_status = event['time']
+            print(self._status())
+            sys.stdout.flush()
+
+
+    def point_started(self, index):
+        with self._lock:
+            self.index = index
+            self.point_start = time.time()
+            self.phase = 'starting'
+            self.bandwidth = None
+            self.ops = None
+            self.failures = None
+            self.last_change = self.point_start
+            self.run_start = None
+            self.abort_reason = None
+            self.samples = {}
+            self._cancel = None
+            if self.policy is not None:
+                self.policy.reset()
+            self._emit({'event': 'point-started'}, True)
+
+
+    def point_finished(self):
+        with self._lock:
+            self.expected_done += expected_duration(self.specs[self.index])
+            self.actual_done += time.time() - self.point_start
+            self._emit({'event': 'point-finished', 'elapsed': time.time() - self.point_start}, True)
+
+
+    def run_started(self):
+        """ The measured run is starting, so it is timed from when it registers its cancel, and not
+            from when any preparation job before it did. """
+        with self._lock:
+            self.run_start = None
+
+
+    def set_cancel(self, cancel):
+        with self._lock:
+            self._cancel = cancel
+            if cancel is not None and self.run_start is None:
+                self.run_start = time.time()
+
+
+    def update(self, phase=None, bandwidth=None, ops=None, failures=None):
+        with self._lock:
+            if self.index is None:
+                return
+
+            now = time.time()
+
+            # A new phase means that old rates no longer apply.
+            if phase is not None and phase != self.phase:
+                self.phase = phase
+                self.bandwidth = None
+                self.ops = None
+                self.failures = None
+                self.last_change = now
+
+            if bandwidth is not None:
+                self.bandwidth = bandwidth
+            if ops is not None:
+                self.ops = ops
+            if failures is not None:
+                self.failures = failures
+
+            if bandwidth or ops:
+                self.last_change = now
+
+            # Keep the bandwidths we see while measuring, in case we have to abort.
+            if bandwidth is not None and 'measuring' in (self.phase or ''):
+                self.samples.setdefault(self.phase.split()[0], []).append(bandwidth)
+
+            self._emit({'event': 'progress', 'phase': self.phase, 'bandwidth': self.bandwidth, 'ops': self.ops, 'failures': self.failures})
+            self._check(now)
+
+
+    def _check(self, now):
+        """ Check the current run against our abort policy, and cancel it if it fails. """
+
+        if self.policy is None or self._cancel is None or self.abort_reason is not None:
+            return
+
+        reason = self.policy.check(self, now)
+        if reason is not None:
+            self.abort_reason = reason
+            print("Aborting point {}: {}".format(self.index + 1, reason))
+            self._emit({'event': 'aborted', 'reason': reason}, True)
+            self._cancel()
+
+
+    def close(self):
+        print("Sweep of {} points took {}".format(len(self.specs), _format_duration(time.time() - self.sweep_start)))
+        if self._events is not None:
+            self._events.close()
+
+
+
+def start(specs, events_file, policy=None):
+    """ Start tracking the progress of a sweep. """
+    global _current
+    _current = Progress(specs, events_file, policy)
+    return _current
+
+
+
+def report(phase=None, bandwidth=None, ops=None, failures=None):
+    """ Report progress of the current point, if there is a sweep in progress.
+        Bandwidth is in MB/s, and ops and failures are per second. """
+    if _current is not None:
+        _current.update(phase, bandwidth, ops, failures)
+
+
+
+def on_abort(cancel):
+    """ Register a function that cancels the run in progress (or None once it has finished). """
+    if _current is not None:
+        _current.set_cancel(cancel)
+
+
+
+def run_started():
+    """ Note that the measured run of the current point is starting. """
+    if _current is not None:
+        _current.run_started()
+
+
+
+def current():
+    """ The progress of the sweep in progress, or None. """
+    return _current
+
+
+
+def aborted():
+    """ Why the current point was aborted, or None if it wasn't. """
+    return _current.abort_reason if _current is not None else None
@@ -1,6 +1,10 @@
 # SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
 # SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
 
+import benchmaster.sizes as sizes
+import json
+
+
 class Result:
     """ Simple data class to hold the results of a single run. 
         This is everything we need to write to a spreadsheet. """
@@ -9,14 +13,41 @@ class Result:
     start_time = None
     end_time = None
 
+    # A summary of the clean up of the previous point that overlapped with this one (if any).
+    background_cleanup = '-'
+
+    # The network ceiling measured before the sweep (if any), and the bandwidth as a percentage of it.
+    net_ceiling = '-'
+    write_net_percent = '-'
+    read_net_percent = '-'
+
+    # What we did to the caches before the run (if anything).
+    cache_state = '-'
+
+    # The rate (in ops/s) at which an open loop run offered operations, if it was one.
+    offered_rate = '-'
+
+    # Whether the run completed, or was aborted (and why).
+    status = 'ok'
+
+    # When the object size is a distribution, and the backend can tell us, the results for each size class.
+    size_classes = None
+
     # These two should be set to contain DirectionResult objects
     write = None
     read = None
 
+    # For backends that delete objects as a separate, timed phase.
+    delete = None
+
     def __init__(self, spec):
         self.protocol = spec.protocol.name()
         self.backend = spec.backend.name()
         self.object_size = spec.object_size
+
+        # A distribution from a file is recorded as the distribution itself, since the file may not last.
+        if self.object_size.startswith('@'):
+            self.object_size = str(sizes.parse(self.object_size))
         self.object_count = spec.object_count
         self.workers = spec.backend.workers()
         self.schedule = spec.runtype.schedule()
@@ -32,12 +63,30 @@ class Result:
     def __repr__(self): return str(vars(self))
 
 
+    def to_json(self, indent=None):
+        """ Encode the result (including its direction results) as json. """
+        return json.dumps(self, default=vars, indent=indent)
+
+
+    def from_dict(values):
+        """ Rebuild a result from a map of its fields, as produced by decoding to_json. """
+        result = Result.__new__(Result)
+        result.__dict__.update(values)
+
+        for direction in ['read', 'write', 'delete']:
+            if values.get(direction) is not None:
+                setattr(result, direction, DirectionResult(**values[direction]))
+
+        return result
+
+
     def columns():
         """ Returns an array of the column names we want for google sheets. """
         return ['ID', 'Protocol', 'Backend', 'Size', 'Object Pool', 'Workers', 'Schedule', 'Targets', 'Read/Write Mix',
                 'Wr Bandwidth', 'Wr ResTime Min', 'Wr ResTime Max', 'Wr ResTime95', 'Wr ResTimeAvg', 'Wr Successes', 'Wr Failures',
                 'Rd Bandwidth', 'Rd ResTime Min', 'Rd ResTime Max', 'Rd ResTime95', 'Rd ResTimeAvg', 'Rd Successes', 'Rd Failures',
-                'Description', 'Start', 'End']
+                'Description', 'Start', 'End', 'Bg Cleanup', 'Net Ceiling', 'Wr % Net Ceiling', 'Rd % Net Ceiling',
+                'Cache State', 'Offered Rate', 'Status']
 
 
     def backgrounds():
@@ -50,6 +99,7 @@ class Result:
         return [None, None, None, None, None, None, None, None, None,
                 write_dark, write_light, write_light, write_light, write_light, write_light, write_light,
                 read_dark, read_light, read_light, read_light, read_light, read_light, read_light,
+                None, None, None, None, None, write_light, read_light,
                 None, None, None]
 
 
@@ -62,21 +112,26 @@ class Result:
         return [self.id, self.protocol, self.backend, self.object_size, self.object_count, self.workers, self.schedule, self.targets, rw_fixed,
                 self.write.bandwidth, self.write.res_min, self.write.res_max, self.write.res_95, self.write.res_avg, self.write.successes, self.write.failures,
                 self.read.bandwidth, self.read.res_min, self.read.res_max, self.read.res_95, self.read.res_avg, self.read.successes, self.read.failures,
-                self.description, str(self.start_time), str(self.end_time)]
+                self.description, str(self.start_time), str(self.end_time), self.background_cleanup,
+                self.net_ceiling, self.write_net_percent, self.read_net_percent,
+                self.cache_state, self.offered_rate, self.status]
 
     def formats():
         mb_s = "0.00 \MB\/\s"
         ms = "0 \m\s"
+        percent = "0.0"
         return [None, None, None, None, None, None, None, None, None,
                 mb_s, ms, ms, ms, ms, None, None,
                 mb_s, ms, ms, ms, ms, None, None,
+                None, None, None, None, None, percent, percent,
                 None, None, None]
 
 
 class DirectionResult:
     """ All the stats relating to a direction (read or write). """
 
-    def __init__(self, bandwidth, res_min, res_max, res_95, res_avg, successes, failures):
+    def __init__(self, bandwidth, res_min, res_max, res_95, res_avg, successes, failures, percentiles=None, histogram=None,
+                 service=None):
         self.bandwidth = bandwidth
         self.res_min = res_min
         self.res_max = res_max
@@ -85,5 +140,16 @@ class DirectionResult:
         self.successes = successes
         self.failures = failures
 
+        # A map from percentile to response time, for backends that report more than the 95th.
+        self.percentiles = percentiles
+
+        # A map from the upper bound of each response time bucket to the number of operations in it,
+        # for backends that keep a latency histogram.
+        self.histogram = histogram
+
+        # For open loop runs, the response times above are from when each operation was meant to
+        # start, and this is a map of the same stats for the service times, from when it did start.
+        self.service = service
+
     def __repr__(self): return str(vars(self))
 
@@ -1,6 +1,8 @@
 # SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
 # SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
 
+import boto
+import boto.s3.connection
 import json
 import subprocess
 import sys
@@ -20,6 +22,20 @@ def load_keys(filename):
         exit(-1)
 
 
+def connect(access_key, secret_key, gateway, port):
+    """ Open a boto connection to a gateway. """
+
+    return boto.connect_s3(
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            host = gateway,
+            port = int(port),
+            is_secure=False,
+            calling_format = boto.s3.connection.OrdinaryCallingFormat(),
+    )
+
+
+
 def add_user(username, keyfile, gateway, password):
     """ Adds a user to the rados gatweays, and writes the resulting key to s3.keys.
         We exit on failure. """
@@ -0,0 +1,434 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+A small built-in S3 load generator.
+
+Before committing a cluster to a long cosbench or sibench sweep, it is useful to have a
+quick probe of throughput and latency that needs nothing more than python on the machine
+running benchmaster.  This backend drives PUTs, GETs and DELETEs from a pool of threads,
+each holding its own keep-alive HTTP connection to one of the gateways, and signs its
+requests itself (AWS signature version 4) so that it needs no S3 library.
+
+A run follows the same shape as sibench: with a mix of 0 there is a write pass and then a
+read pass, otherwise a single mixed pass over objects written beforehand.  Each pass lasts
+for ramp up + run time + ramp down, and only operations that start inside the run time are
+recorded.  All the objects are deleted at the end.  When the object size is a distribution,
+each write picks its own size from it.
+
+Latencies go into histograms, from which we report percentiles, and which are included in
+the results.
+
+Normally each worker issues its next operation as soon as its last one returns (a closed
+loop), which hides queueing exactly when the cluster saturates, since the load backs off as
+the latency grows.  With a rate, operations are instead due at fixed intervals (an open
+loop), and each worker takes the next one that is due, waiting for its time if it is early.
+Latencies are measured from when an operation was due, and service times from when it was
+sent (see histogram.py).  The workers only limit how many operations can be outstanding, so
+there should be enough of them to cover the rate times the latency.
+"""
+
+import hashlib
+import hmac
+import http.client
+import benchmaster.cachestate as cachestate
+import benchmaster.histogram as histogram
+import benchmaster.sizes as sizes
+import benchmaster.trace as trace
+import benchmaster.units as units
+import os
+import random
+import socket
+import threading
+import time
+import urllib.parse
+
+from datetime import datetime
+from benchmaster.histogram import Histogram
+from benchmaster.result import Result
+
+_region = 'us-east-1'
+
+
+class Signer:
+    """ Signs S3 requests with AWS signature version 4. """
+
+    def __init__(self, access_key, secret_key, region=_region):
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self._keys = {}
+
+
+    def _signing_key(self, date):
+        if date not in self._keys:
+            key = ('AWS4' + self.secret_key).encode('utf-8')
+            for part in [date, self.region, 's3', 'aws4_request']:
+                key = hmac.new(key, part.encode('utf-8'), hashlib.sha256).digest()
+            self._keys[date] = key
+        return self._keys[date]
+
+
+    def headers(self, method, host, path, query=''):
+        """ Build the headers needed to authenticate a request.  The payload is left unsigned,
+            so that we don't have to hash every object we send. """
+
+        now = datetime.utcnow()
+        amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+        date = now.strftime('%Y%m%d')
+        payload = 'UNSIGNED-PAYLOAD'
+
+        canonical_headers = 'host:{}\nx-amz-content-sha256:{}\nx-amz-date:{}\n'.format(host, payload, amz_date)
+        signed_headers = 'host;x-amz-content-sha256;x-amz-date'
+        canonical_request = '\n'.join([method, urllib.parse.quote(path, safe='/~'), query,
+                                       canonical_headers, signed_headers, payload])
+
+        scope = '{}/{}/s3/aws4_request'.format(date, self.region)
+        string_to_sign = '\n'.join(['AWS4-HMAC-SHA256', amz_date, scope,
+                                    hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()])
+        signature = hmac.new(self._signing_key(date), string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+
+        return {
+            'Host': host,
+            'x-amz-date': amz_date,
+            'x-amz-content-sha256': payload,
+            'Authorization': 'AWS4-HMAC-SHA256 Credential={}/{}, SignedHeaders={}, Signature={}'.format(
+                self.access_key, scope, signed_headers, signature),
+        }
+
+
+
+class Client:
+    """ A keep-alive connection to a single gateway, which reconnects after any error. """
+
+    def __init__(self, signer, gateway, port, timeout=30):
+        self.signer = signer
+        self.host = '{}:{}'.format(gateway, port)
+        self.gateway = gateway
+        self.port = int(port)
+        self.timeout = timeout
+        self._conn = None
+
+
+    def request(self, method, path, body=None, query=''):
+        """ Perform a request, and return its status code (or None if it failed outright) and
+            the number of bytes in the response body, which is read and discarded. """
+
+        headers = self.signer.headers(method, self.host, path, query)
+        if body is not None:
+            headers['Content-Length'] = str(len(body))
+
+        url = path if not query else '{}?{}'.format(path, query)
+
+        try:
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.gateway, self.port, timeout=self.timeout)
+                self._conn.connect()
+
+                # Headers and body go out in separate writes, which Nagle would otherwise hold up.
+                self._conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            self._conn.request(method, url, body=body, headers=headers)
+            response = self._conn.getresponse()
+            received = 0
+            while True:
+                chunk = response.read(1024 * 1024)
+                if not chunk:
+                    break
+                received += len(chunk)
+            return (response.status, received)
+        except (OSError, http.client.HTTPException):
+            self.close()
+            return (None, 0)
+
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+
+class PassStats:
+    """ The stats for one direction of one pass, for a single worker. """
+
+    def __init__(self):
+        self.histogram = Histogram()
+        self.service = Histogram()
+        self.bytes = 0
+        self.failures = 0
+
+
+
+class Load:
+    """ Runs the load for a single spec. """
+
+    def __init__(self, spec):
+        p = spec.protocol
+        self.spec = spec
+        self.bucket = p.bucket
+        self.sizes = sizes.parse(spec.object_size)
+        self.count = int(spec.object_count)
+        self.workers = int(spec.backend.worker_count)
+        self.signer = Signer(p.access_key, p.secret_key)
+        self.clients = [Client(self.signer, p.targets()[i % len(p.targets())], p.port) for i in range(self.workers)]
+        self.payload = os.urandom(max(c.high for c in self.sizes.classes))
+        self.rate = _rate(spec)
+        self.written = 0
+        self._next = 0
+        self._arrivals = 0
+        self._lock = threading.Lock()
+
+
+    def _key(self, n):
+        return '/{}/benchmaster-{}'.format(self.bucket, n % self.count)
+
+
+    def _next_index(self):
+        with self._lock:
+            n = self._next
+            self._next += 1
+            return n
+
+
+    def _next_arrival(self):
+        with self._lock:
+            k = self._arrivals
+            self._arrivals += 1
+            return k
+
+
+    def _parallel(self, fn):
+        """ Run fn(worker index) in every worker, and wait for them all. """
+        threads = [threading.Thread(target=fn, args=(i,)) for i in range(self.workers)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+
+
+    def _op(self, client, method, n, rng):
+        """ Perform a single operation, and return its latency in microseconds, the number of
+            bytes transferred and whether it succeeded. """
+
+        body = None
+        if method == 'PUT':
+            body = memoryview(self.payload)[:self.sizes.sample(rng)]
+
+        start = time.perf_counter()
+        status, received = client.request(method, self._key(n), body)
+        us = int((time.perf_counter() - start) * 1000000)
+
+        transferred = len(body) if body is not None else received
+        return (us, transferred, status is not None and status < 300)
+
+
+    def _timed_pass(self, read_percent):
+        """ Run a pass in which a percentage of operations are reads, and the rest writes.
+            Returns a map from direction to a list of PassStats (one per worker). """
+
+        runtype = self.spec.runtype
+        start = time.time() + 0.1
+        measure_from = start + int(runtype.ramp_up)
+        measure_to = measure_from + int(runtype.runtime)
+        end = measure_to + int(runtype.ramp_down)
+
+        stats = {'read': [PassStats() for i in range(self.workers)], 'write': [PassStats() for i in range(self.workers)]}
+        readable = max(1, min(self.written, self.count))
+
+        def worker(i):
+            client = self.clients[i]
+            rng = random.Random(i)
+            ops = 0
+            while True:
+                now = time.time()
+                if now >= end:
+                    break
+
+                # Interleave reads and writes, rather than running them in blocks.
+                is_read = (ops * 37) % 100 < read_percent
+                ops += 1
+
+                if is_read:
+                    us, transferred, ok = self._op(client, 'GET', rng.randrange(readable), rng)
+                else:
+                    us, transferred, ok = self._op(client, 'PUT', self._next_index(), rng)
+
+                if measure_from <= now < measure_to:
+                    s = stats['read' if is_read else 'write'][i]
+                    if ok:
+                        s.histogram.add(us)
+                        s.bytes += transferred
+                    else:
+                        s.failures += 1
+
+        def open_loop_worker(i):
+            client = self.clients[i]
+            rng = random.Random(i)
+            while True:
+                k = self._next_arrival()
+                due = start + k / self.rate
+                if due >= end or time.time() >= end:
+                    break
+
+                # Wait until the operation is due, unless we're already behind.  Only when we're behind
+                # has the cluster held it up, so only then is its latency measured from when it was due
+                # (otherwise we'd be counting how late sleep wakes us).
+                delay = due - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+
+                is_read = (k * 37) % 100 < read_percent
+                if is_read:
+                    us, transferred, ok = self._op(client, 'GET', rng.randrange(readable), rng)
+                else:
+                    us, transferred, ok = self._op(client, 'PUT', self._next_index(), rng)
+                latency = us if delay > 0 else max(us, int((time.time() - due) * 1000000))
+
+                if measure_from <= due < measure_to:
+                    s = stats['read' if is_read else 'write'][i]
+                    if ok:
+                        s.histogram.add(latency)
+                        s.service.add(us)
+                        s.bytes += transferred
+                    else:
+                        s.failures += 1
+
+        if self.rate:
+            self._arrivals = 0
+            self._parallel(open_loop_worker)
+
+            # Anything still waiting to start at the end was never sent: the load was more than we could offer.
+            due = int(self.rate * (end - start))
+            if self._arrivals - self.workers < due:
+                print("Only {} of the {} operations due were sent: more workers are needed for this rate".format(
+                        self._arrivals - self.workers, due))
+        else:
+            self._parallel(worker)
+
+        self.written = max(self.written, min(self._next, self.count))
+        return stats
+
+
+    def _fill(self):
+        """ Write every object once, so that there is something to read. """
+
+        def worker(i):
+            rng = random.Random(i)
+            for n in range(i, self.count, self.workers):
+                self._op(self.clients[i], 'PUT', n, rng)
+
+        self._parallel(worker)
+        self.written = self.count
+
+
+    def _delete(self):
+        stats = [PassStats() for i in range(self.workers)]
+
+        def worker(i):
+            for n in range(i, self.written, self.workers):
+                us, transferred, ok = self._op(self.clients[i], 'DELETE', n, None)
+                if ok:
+                    stats[i].histogram.add(us)
+                else:
+                    stats[i].failures += 1
+
+        self._parallel(worker)
+        return stats
+
+
+    def run(self):
+        """ Run all the passes, and return a map from direction to its list of PassStats. """
+
+        mix = int(self.spec.read_write_mix)
+        results = {}
+
+        print("Creating bucket {}".format(self.bucket))
+        status, received = self.clients[0].request('PUT', '/{}'.format(self.bucket))
+        if status is None or (status >= 300 and status != 409):
+            print("Unable to create bucket {}: status {}".format(self.bucket, status))
+            exit(-1)
+
+        if mix == 0:
+            print("Running write pass")
+            with trace.phase('write pass', measured=True):
+                results['write'] = self._timed_pass(0)['write']
+            cachestate.between_passes(self.spec)
+            print("Running read pass")
+            with trace.phase('read pass', measured=True):
+                results['read'] = self._timed_pass(100)['read']
+        else:
+            print("Writing {} objects".format(self.count))
+            with trace.phase('fill'):
+                self._fill()
+            print("Running mixed pass")
+            with trace.phase('mixed pass', measured=True):
+                results = self._timed_pass(min(mix, 100))
+
+        print("Deleting {} objects".format(self.written))
+        with trace.phase('delete objects'):
+            results['delete'] = self._delete()
+
+        for c in self.clients:
+            c.close()
+
+        return results
+
+
+
+def _direction_result(stats, runtime):
+    """ Merge the stats of all the workers for a direction into a DirectionResult. """
+
+    merged = Histogram()
+    service = Histogram()
+    for s in stats:
+        merged.merge(s.histogram)
+        service.merge(s.service)
+
+    return histogram.direction_result(merged, sum(s.bytes for s in stats), sum(s.failures for s in stats), runtime, service)
+
+
+
+def _rate(spec):
+    """ The rate (in ops/s) at which to offer operations, or 0 for a closed loop. """
+
+    try:
+        return units.to_ops_per_second(spec.backend.rate, sizes.parse(spec.object_size).mean_bytes())
+    except ValueError as e:
+        print("Bad rate for the built-in load generator: {}".format(e))
+        exit(-1)
+
+
+
+def run(spec):
+    return process(spec, execute(spec))
+
+
+
+def execute(spec):
+    """ Run the load, and return the raw stats from each worker. """
+
+    if spec.protocol.name() != 's3':
+        print('Bad storage type for the built-in load generator: {}'.format(spec.protocol.name()))
+        exit(-1)
+
+    if spec.runtype.name() != 'time':
+        print('Bad runtype for the built-in load generator: {}'.format(spec.runtype.name()))
+        exit(-1)
+
+    return Load(spec).run()
+
+
+
+def process(spec, stats):
+    """ Build a Result from the raw stats of a run. """
+
+    runtime = int(spec.runtype.runtime)
+
+    result = Result(spec)
+    result.id = '-'
+    result.read = _direction_result(stats['read'], runtime)
+    result.write = _direction_result(stats['write'], runtime)
+    result.delete = _direction_result(stats['delete'], None)
+
+    if _rate(spec):
+        result.offered_rate = _rate(spec)
+    return result
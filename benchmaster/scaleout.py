@@ -0,0 +1,174 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Scale-out sweeps over the number of targets.
+
+Result.targets records how many gateways (or monitors) a point used, but finding out how a
+cluster scales used to mean running the same sweep again and again with more targets listed
+each time.  With --scale-targets, every point of a sweep is run with 1, 2, 4 ... N of its
+targets ('pow2'), with every count from 1 to N ('all'), or with a list of counts.  With
+--scale-servers, the sibench (or fio) servers are cut down to the same count as the targets,
+or to as many as we have.
+
+A subset of n targets is always the first n in the order they were given, so that a sweep
+can be repeated exactly, and so that the order can be chosen (to spread the first few
+gateways across racks, say).
+
+At the end of the sweep we print a scaling table for each group of points that differ only
+in their number of targets.  For each count it has the bandwidth in each direction, the
+bandwidth per target, and the efficiency: how close the bandwidth comes to scaling linearly
+from the smallest count (normally a single target).  The marginal efficiency does the same
+for each step from the previous count, and the first step at which that falls below a
+quarter is where adding targets stops helping.
+"""
+
+import copy
+import threading
+
+
+# The marginal efficiency below which adding targets no longer helps.
+_helpful = 0.25
+
+
+def counts(steps, total):
+    """ The target counts to step through: 'pow2', 'all' or a comma-separated list of counts. """
+
+    if steps == 'pow2':
+        result = []
+        n = 1
+        while n < total:
+            result.append(n)
+            n *= 2
+        return result + [total]
+
+    if steps == 'all':
+        return list(range(1, total + 1))
+
+    try:
+        result = sorted(set(int(c) for c in steps.split(',')))
+    except ValueError:
+        print("Bad target counts: {}".format(steps))
+        exit(-1)
+
+    if result[0] < 1 or result[-1] > total:
+        print("Target counts must be between 1 and the number of targets ({}): {}".format(total, steps))
+        exit(-1)
+
+    return result
+
+
+
+def expand(specs, steps, servers=False):
+    """ Replace each of a list of flattened specs with a spec for each target count. """
+
+    results = []
+    for s in specs:
+        for n in counts(steps, len(s.protocol.targets())):
+            scaled = copy.copy(s)
+            scaled.protocol = s.protocol.with_targets(s.protocol.targets()[:n])
+
+            if servers:
+                if not hasattr(s.backend, 'servers'):
+                    print("The {} backend has no servers to scale".format(s.backend.name()))
+                    exit(-1)
+
+                scaled.backend = copy.copy(s.backend)
+                scaled.backend.servers = s.backend.servers[:n]
+
+            results.append(scaled)
+
+    return results
+
+
+
+def _group(spec):
+    """ What a point has in common with the points that differ from it only in their targets. """
+
+    backend = {k: v for k, v in vars(spec.backend).items() if k not in ['servers', 'hardware']}
+    return (spec.side, spec.protocol.name(), spec.protocol.container(), spec.backend.name(), str(sorted(backend.items())),
+            spec.runtype.schedule(), spec.object_size, spec.object_count, spec.read_write_mix)
+
+
+
+def _bandwidth(direction):
+    try:
+        return float(direction.bandwidth)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+
+class Scaling:
+    """ The results of a scale-out sweep, grouped by everything but their targets. """
+
+    def __init__(self):
+        self.groups = {}
+        self._lock = threading.Lock()
+
+
+    def __repr__(self): return str(vars(self))
+
+
+    def add(self, spec, result):
+        # Aborted points would only drag the efficiency down for reasons of their own.
+        if result.status != 'ok' and not result.status.startswith('cached'):
+            return
+
+        with self._lock:
+            self.groups.setdefault(_group(spec), {})[result.targets] = result
+
+
+    def recording(self, spec, post_process):
+        """ Wrap the post processing of a point so that it also adds the result to the table. """
+
+        def wrapped():
+            result = post_process()
+            self.add(spec, result)
+            return result
+
+        return wrapped
+
+
+    def report(self):
+        for (side, protocol, container, backend, _, schedule, size, count, mix), results in self.groups.items():
+            print("\nScaling of {}{} {}, size {}, count {}, mix {}, {}".format(
+                    '[{}] '.format(side) if side else '', protocol, backend, size, count, mix, schedule))
+            print("{:>8}  {:>11} {:>11} {:>10} {:>9}  {:>11} {:>11} {:>10} {:>9}".format(
+                    'Targets', 'Write MB/s', 'Per target', 'Efficiency', 'Marginal',
+                    'Read MB/s', 'Per target', 'Efficiency', 'Marginal'))
+
+            targets = sorted(results)
+            stops = {}
+            rows = {n: [] for n in targets}
+
+            for direction in ['write', 'read']:
+                bandwidths = [(n, _bandwidth(getattr(results[n], direction))) for n in targets]
+                bandwidths = [(n, b) for n, b in bandwidths if b]
+                base_n, base_b = bandwidths[0] if bandwidths else (None, None)
+                previous = None
+
+                for n in targets:
+                    b = dict(bandwidths).get(n)
+                    if b is None:
+                        rows[n].append("{:>11} {:>11} {:>10} {:>9}".format('-', '-', '-', '-'))
+                        continue
+
+                    efficiency = (b / n) / (base_b / base_n)
+                    marginal = '-'
+                    if previous is not None:
+                        prev_n, prev_b = previous
+                        gain = (b - prev_b) / ((n - prev_n) * base_b / base_n)
+                        marginal = '{:.0f}%'.format(100 * gain)
+                        if gain < _helpful and direction not in stops:
+                            stops[direction] = prev_n
+
+                    rows[n].append("{:>11.2f} {:>11.2f} {:>9.0f}% {:>9}".format(b, b / n, 100 * efficiency, marginal))
+                    previous = (n, b)
+
+            for n in targets:
+                print("{:>8}  {}".format(n, '  '.join(rows[n])))
+
+            for direction in ['write', 'read']:
+                if direction in stops:
+                    print("Adding targets stops helping {}s beyond {}".format(direction, stops[direction]))
@@ -0,0 +1,84 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Ordering of the points in a sweep.
+
+Spec.flatten() produces points in a fixed nested order, which frequently alternates the
+object size (and so the data set) between consecutive points.  Every change of data set
+means writing a whole new set of objects before we can measure anything.
+
+We order the points with a simple cost model: the cost of a point is the volume of data
+that must be written to prepare it, which is mean object size x object count if it runs a
+preparation, and zero if it doesn't (because the previous point left behind a compatible
+data set, or because the backend doesn't prepare it: separate write and read passes often
+write the objects in their measured write pass).  Grouping all the points that share a data
+set minimises that cost.  The first point of a group prepares the whole data set, whatever
+its mix, and the points after it reuse it: separate write/read passes come first, and then
+the mixes in order of increasing read percentage.
+"""
+
+import benchmaster.dataset as dataset
+import benchmaster.sizes as sizes
+import benchmaster.units as units
+
+
+def _preparation_bytes(spec):
+    """ How much data we need to write to prepare the data set for a spec. """
+    return int(sizes.parse(spec.object_size).mean_bytes() * int(spec.object_count))
+
+
+
+def _write_order(spec):
+    """ Sort key within a data set: separate write/read passes first, then in order of increasing read percentage. """
+    mix = int(spec.read_write_mix)
+    return -1 if mix == 0 else mix
+
+
+
+def preparation_volume(specs, reuse=True):
+    """ Returns a tuple of the number of preparations, and the number of bytes written by them,
+        needed to run the specs in the order given.  Only the points that will run a preparation
+        of their own are counted. """
+
+    count = 0
+    volume = 0
+    shared = dataset.sharing(specs) if reuse else [(False, False)] * len(specs)
+
+    for s, (reused, kept) in zip(specs, shared):
+        if s.backend.prepares(s, reused, kept):
+            count += 1
+            volume += _preparation_bytes(s)
+
+    return (count, volume)
+
+
+
+def plan(specs):
+    """ Reorder a list of flattened specs so that points sharing a data set are adjacent.
+        Groups are kept in the order in which they first appear, so the plan is deterministic. """
+
+    groups = {}
+    for s in specs:
+        groups.setdefault(dataset.from_spec(s), []).append(s)
+
+    results = []
+    for g in groups.values():
+        results += sorted(g, key=_write_order)
+
+    return results
+
+
+
+def report(naive, planned, reuse):
+    """ Print out a comparison of the preparation cost of two orderings of the same sweep. """
+
+    naive_count, naive_volume = preparation_volume(naive)
+    planned_count, planned_volume = preparation_volume(planned)
+
+    print("Sweep of {} points".format(len(planned)))
+    print("  Naive order:   {} preparations writing {}".format(naive_count, units.format_bytes(naive_volume)))
+    print("  Planned order: {} preparations writing {}".format(planned_count, units.format_bytes(planned_volume)))
+
+    if not reuse:
+        print("  (Points will only share data if --reuse-data is given)")
@@ -0,0 +1,252 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Benchmarks of benchmaster's own processing.
+
+Benchmaster's own work between points (parsing sibench output and cosbench CSVs, flattening
+sweeps, generating cosbench XML and building sheet rows) is never measured, so it can grow
+slow without anyone noticing until a sweep with thousands of points, or a multi-GB sibench
+file, takes an age.  So we benchmark each of those stages against synthetic data (see
+synthetic.py), entirely offline.
+
+Each stage is timed on its own several times, and we take the best of those times, since
+anything else running on the host can only slow a run down.  Then it is run again under
+tracemalloc to find its peak (python) memory, since tracing slows everything down.
+Throughput and peak memory go into a history file, one json object per run.  Parsing a
+sibench file is measured in files rather than MB, since what matters to a sweep is how long
+a point's file takes, and that needn't grow in step with the size of the file.  A stage regresses when its throughput falls, or its
+memory rises, by more than a threshold compared with the median of the last few runs on the
+same host with the same scale, and then we exit with an error.
+"""
+
+import benchmaster.cosbench as cosbench
+import benchmaster.sibench as sibench
+import benchmaster.spec as spec
+import benchmaster.synthetic as synthetic
+import benchmaster.units as units
+import contextlib
+import io
+import json
+import os
+import shutil
+import socket
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from benchmaster.result import Result
+
+# How many previous runs we compare against.
+_baseline_runs = 5
+
+
+class Stage:
+    """ A stage to benchmark.  Setup prepares its input (untimed), and work does the timed part and
+        returns the number of units it processed. """
+
+    def __init__(self, name, unit, setup, work):
+        self.name = name
+        self.unit = unit
+        self.setup = setup
+        self.work = work
+
+
+
+def _sweep_spec(points, backend='sibench', targets=4):
+    """ A spec for a sweep of about a given number of points, spread over as many dimensions as we can. """
+
+    dimensions = 6
+    per = max(1, int(round(points ** (1 / dimensions))))
+
+    def values(fn):
+        return ','.join(fn(i) for i in range(per))
+
+    sizes = values(lambda i: '{}K'.format(4 << i))
+    counts = values(lambda i: str(1000 * (i + 1)))
+    mixes = values(lambda i: str(i * 10))
+    runtimes = values(lambda i: str(30 * (i + 1)))
+    gateways = ['gateway{}'.format(i) for i in range(targets)]
+
+    if backend == 'cosbench':
+        b = spec.CosbenchSpec(values(lambda i: str(8 << i)), 'cosbench.xml', values(lambda i: str(i + 1)))
+    else:
+        b = spec.SibenchSpec('5150', ['server{}'.format(i) for i in range(targets)], values(lambda i: str(i * 100)),
+                             values(lambda i: str(0.5 * (i + 1))), False, 'prng', '/tmp/slices', '1000', '65536')
+
+    return spec.Spec(
+            spec.TimeSpec(runtimes, '10', '5'),
+            b,
+            spec.S3Spec('access', 'secret', '7480', 'benchmark', gateways),
+            sizes, counts, mixes, True, 'Synthetic sweep')
+
+
+
+def _stages(directory, scale, size):
+    """ The stages, with inputs scaled to our arguments. """
+
+    sibench_file = os.path.join(directory, 'sibench.json')
+    csv_file = os.path.join(directory, 'cosbench.csv')
+    xml_file = os.path.join(directory, 'cosbench.xml')
+    csv_rows = 100000 * scale
+    points = 10000 * scale
+    xml_specs = 1000 * scale
+    results = 10000 * scale
+
+    def sibench_setup():
+        synthetic.sibench_output(sibench_file, size)
+        return None
+
+    def sibench_work(state):
+        sibench._read_analyses(sibench_file)
+        return 1
+
+    def csv_setup():
+        synthetic.cosbench_csv(csv_file, csv_rows)
+        return None
+
+    def csv_work(state):
+        cosbench._process_results(csv_file)
+        return csv_rows
+
+    def flatten_setup():
+        return _sweep_spec(points)
+
+    def flatten_work(spec):
+        return len(spec.flatten())
+
+    def xml_setup():
+        specs = _sweep_spec(xml_specs, 'cosbench', targets=16).flatten()[:xml_specs]
+        for s in specs:
+            s.backend.xml_file = xml_file
+        return specs
+
+    def xml_work(specs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            for s in specs:
+                cosbench._generate_xml(cosbench.CosbenchValues(s))
+        return len(specs)
+
+    def rows_setup():
+        analyses = synthetic.sibench_output(sibench_file, 0)
+        result = Result(_sweep_spec(1))
+        result.id = '-'
+        result.read = sibench._direction_result(analyses[0])
+        result.write = sibench._direction_result(analyses[1])
+        return [result] * results
+
+    def rows_work(results):
+        for r in results:
+            r.values()
+            r.to_json()
+        return len(results)
+
+    return [
+        Stage('sibench-parse', 'files', sibench_setup, sibench_work),
+        Stage('cosbench-csv', 'rows', csv_setup, csv_work),
+        Stage('spec-flatten', 'points', flatten_setup, flatten_work),
+        Stage('cosbench-xml', 'specs', xml_setup, xml_work),
+        Stage('sheet-rows', 'rows', rows_setup, rows_work)
+    ]
+
+
+
+def _measure(stage, repeats):
+    """ Run a stage a number of times, and return its best throughput and its peak memory. """
+
+    state = stage.setup()
+    times = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        count = stage.work(state)
+        times.append(time.perf_counter() - start)
+    elapsed = min(times)
+
+    tracemalloc.start()
+    stage.work(state)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'seconds': elapsed, 'median_seconds': statistics.median(times), 'count': count, 'unit': stage.unit,
+            'throughput': count / elapsed, 'peak_bytes': peak}
+
+
+
+def _load_history(filename):
+    if not os.path.exists(filename):
+        return []
+
+    with open(filename) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+
+def _baseline(history, run):
+    """ The median throughput and peak memory of each stage over the last few comparable runs. """
+
+    comparable = [h for h in history if h['host'] == run['host'] and h['scale'] == run['scale'] and h['size'] == run['size']
+                  and h.get('repeats', 1) == run['repeats']]
+    comparable = comparable[-_baseline_runs:]
+
+    baseline = {}
+    for name in run['stages']:
+        previous = [h['stages'][name] for h in comparable if name in h['stages']]
+        if previous:
+            baseline[name] = {
+                'throughput': statistics.median(p['throughput'] for p in previous),
+                'peak_bytes': statistics.median(p['peak_bytes'] for p in previous)
+            }
+    return baseline
+
+
+
+def run(scale, size, history_file, threshold, directory, repeats):
+    """ Run all the stages, report them, record them in the history, and exit if any regressed. """
+
+    scale = int(scale)
+    size = units.to_bytes(size)
+    threshold = float(threshold)
+    repeats = max(1, int(repeats))
+
+    work_dir = tempfile.mkdtemp(prefix='selfbench-', dir=directory)
+    try:
+        stages = {}
+        for stage in _stages(work_dir, scale, size):
+            print("Benchmarking {}".format(stage.name))
+            stages[stage.name] = _measure(stage, repeats)
+    finally:
+        shutil.rmtree(work_dir)
+
+    current = {'time': time.time(), 'host': socket.gethostname(), 'scale': scale, 'size': size, 'repeats': repeats,
+               'stages': stages}
+    baseline = _baseline(_load_history(history_file), current)
+
+    print("{:<16} {:>12} {:>21} {:>12} {:>10}  {}".format('Stage', 'Time', 'Throughput', 'Peak Memory', 'Change', 'Verdict'))
+
+    regressions = 0
+    for name, s in stages.items():
+        change = '-'
+        verdict = 'no baseline'
+
+        if name in baseline:
+            b = baseline[name]
+            slower = 100 * (1 - s['throughput'] / b['throughput'])
+            bigger = 100 * (s['peak_bytes'] / b['peak_bytes'] - 1) if b['peak_bytes'] else 0
+            change = '{:+.1f}%'.format(-slower)
+
+            if slower > threshold or bigger > threshold:
+                verdict = 'REGRESSED' + (' (memory {:+.1f}%)'.format(bigger) if bigger > threshold else '')
+                regressions += 1
+            else:
+                verdict = 'ok'
+
+        print("{:<16} {:>11.3f}s {:>11.1f} {:<9} {:>12} {:>10}  {}".format(
+                name, s['seconds'], s['throughput'], s['unit'] + '/s', units.format_bytes(s['peak_bytes']), change, verdict))
+
+    with open(history_file, 'a') as f:
+        f.write(json.dumps(current) + '\n')
+
+    if regressions:
+        print("{} stage(s) regressed by more than {:g}%".format(regressions, threshold))
+        exit(-1)
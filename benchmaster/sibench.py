@@ -1,20 +1,78 @@
 # SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
 # SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
 
+import benchmaster.abort as abort
 import json
+import benchmaster.progress as progress
+import benchmaster.sizes as sizes
 import benchmaster.spec as spec
+import benchmaster.trace as trace
+import benchmaster.units as units
+import os
+import re
+import signal
 import subprocess
+import threading
+import time
 
+from datetime import datetime
 from benchmaster.result import Result, DirectionResult
 
 
-sibench_binary = 'sibench'
+# The sibench to run, which may be replaced (with the fake sibench, say) through the environment.
+sibench_binary = os.environ.get('BENCHMASTER_SIBENCH', 'sibench')
+
+# Rates that sibench reports as it runs, such as '1234.5 MB/s' or '567 ops/s'.
+_bandwidth_pattern = re.compile(r'([\d.]+)\s*([KMG]B)/s')
+_ops_pattern = re.compile(r'([\d.]+)\s*ops?/s')
+_failures_pattern = re.compile(r'(\d+)\s*failures?', re.IGNORECASE)
+_bandwidth_scale = {'KB': 1 / 1024, 'MB': 1, 'GB': 1024}
+
+# How far into an output file we look for its arguments.
+_max_header = 1024 * 1024
+
+
+def bandwidth_for_rate(rates, bandwidth):
+    """ Sibench has no open loop mode, so the nearest we can get to offering a fixed rate is to cap its
+        bandwidth.  Return the sibench bandwidth (in bits/s) for a (sweepable) rate in bytes/s, or the
+        bandwidth we were given if there is no rate. """
+
+    if rates == '0':
+        return bandwidth
+
+    if bandwidth != '0':
+        print("Give either a rate or a sibench bandwidth, not both")
+        exit(-1)
+
+    results = []
+    for r in rates.split(','):
+        if not units.is_byte_rate(r) and r != '0':
+            print("Sibench can only cap its bandwidth, so its rate must be in bytes/s (such as 100MB), not {}".format(r))
+            exit(-1)
+        try:
+            results.append(str(int(units.to_ops_per_second(r, 1) * 8)))
+        except ValueError as e:
+            print("Bad rate for sibench: {}".format(e))
+            exit(-1)
+
+    print("Sibench has no open loop mode, so the rate caps its bandwidth: its latencies are still those of a closed loop")
+    return ','.join(results)
+
+
 
 def run(spec):
     """ Run the test described by the spec using sibench as the backend.
         We block until we're done.
         This doesn't return all the details that sibench reports, but picks out the 
         data that it has in common with cosbench. """
+
+    return process(spec, execute(spec))
+
+
+
+def execute(spec):
+    """ Run sibench, and return a list of (size class, output file) tuples: one for each class in
+        the object size distribution, since sibench can only run a single size at a time. """
    
     # Check that this is something we support, and convert cosbench storage type ids into sibench ones. 
 
@@ -28,11 +86,124 @@ def run(spec):
         print('Bad runtype for sibench: {}'.format(spec.runtype.name()))
         exit(-1) 
 
-    # From here on we should be good, so let's build our command line to invoke sibench
-    cmd = '{} {} run -s{} -c{} -x{} -r{} -u{} -d{} -w{} -b{} -osibench.json --servers {} -p {}'.format(
+    try:
+        distribution = sizes.parse(spec.object_size)
+    except (ValueError, OSError) as e:
+        print('Bad object size for sibench: {}.  {}'.format(spec.object_size, e))
+        exit(-1)
+
+    output_dir = spec.backend.output_dir or '.'
+    os.makedirs(output_dir, exist_ok=True)
+
+    classes = distribution.fixed_classes()
+    if len(classes) > 1:
+        print("Running {} as {} sibench runs of a fixed size each, so this point takes {} times the run time".format(
+                distribution, len(classes), len(classes)))
+
+    outputs = []
+    try:
+        for c in classes:
+            # Each run gets an output file of its own, so that they can be processed after we've moved on.
+            output = os.path.join(output_dir, 'sibench-{}.json'.format(datetime.now().strftime('%Y%m%d-%H%M%S-%f')))
+            outputs.append((c, output))
+
+            cmd = _command(spec, protocol, units.to_size(c.mean()), output)
+            print("Running command: {}".format(cmd))
+
+            # And now run it.
+            with trace.phase('run sibench', measured=True):
+                _run_command(spec, cmd)
+    except BaseException:
+        # Nothing will process the files of a run that failed or was aborted.
+        _discard(spec, outputs)
+        raise
+
+    return outputs
+
+
+
+def _discard(spec, outputs):
+    """ Delete output files once we're done with them, unless we were asked to keep them. """
+
+    if spec.backend.output_dir is not None:
+        return
+
+    for c, output in outputs:
+        if os.path.exists(output):
+            os.remove(output)
+
+
+
+def _parse_line(line):
+    """ Pick any rates out of a line of sibench's output, and report them. """
+
+    bandwidth = None
+    ops = None
+    failures = None
+
+    match = _bandwidth_pattern.search(line)
+    if match:
+        bandwidth = float(match.group(1)) * _bandwidth_scale[match.group(2)]
+
+    match = _ops_pattern.search(line)
+    if match:
+        ops = float(match.group(1))
+
+    # Sibench prints its stats once a second, so a count of failures is also a rate.
+    match = _failures_pattern.search(line)
+    if match:
+        failures = float(match.group(1))
+
+    if bandwidth is not None or ops is not None or failures is not None:
+        progress.report(bandwidth=bandwidth, ops=ops, failures=failures)
+
+
+
+def _run_command(spec, cmd):
+    """ Run sibench, passing its output through as it comes, and reporting our progress as we go.
+        Sibench's phases follow a fixed schedule, so we work out which one we're in from the time.
+        If our abort policy cancels the run, we raise abort.Aborted. """
+
+    # Sibench gets a process group of its own, so that we can stop it and not just its shell.
+    proc = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            universal_newlines=True, bufsize=1, start_new_session=True)
+
+    def reader():
+        for line in proc.stdout:
+            print(line, end='')
+            _parse_line(line)
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+
+    progress.on_abort(lambda: os.killpg(proc.pid, signal.SIGTERM))
+
+    start = time.time()
+    while proc.poll() is None:
+        progress.report(phase=progress.timed_phase(spec, time.time() - start))
+        try:
+            proc.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            pass
+
+    progress.on_abort(None)
+    thread.join()
+
+    if progress.aborted() is not None:
+        raise abort.Aborted(progress.aborted())
+
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+
+
+def _command(spec, protocol, size, output):
+    """ Build the command line to run sibench for a single object size. """
+
+    cmd = '{} {} run -s{} -c{} -x{} -r{} -u{} -d{} -w{} -b{} -o{} --servers {} -p {}'.format(
             sibench_binary,
             protocol,
-            spec.object_size,
+            size,
             spec.object_count,
             spec.read_write_mix,
             spec.runtype.runtime,
@@ -40,10 +211,13 @@ def run(spec):
             spec.runtype.ramp_down,
             spec.backend.worker_factor,
             spec.backend.bandwidth,
+            output,
             ','.join(spec.backend.servers),
             spec.backend.port)
 
-    if spec.clean_up:
+    # If the next run is going to use our objects, then leave them for it to clean up.
+    # When pipelining, clean up happens in the background once we're done.
+    if spec.clean_up and not spec.keep_data and not spec.pipelined:
         cmd += ' --clean-up'
 
     if protocol == 's3':
@@ -90,30 +264,86 @@ def run(spec):
 
     cmd += ' --use-bytes'
 
-    print("Running command: {}".format(cmd))
+    return cmd
+
+
 
-    # And now run it.
-    subprocess.check_call(cmd, shell=True)
+def process(spec, outputs):
+    """ Build a Result from the output files of a sibench run.  If there were multiple size classes
+        then we combine their results, and also record the results for each class. """
 
     result = Result(spec)
     result.id = '-'
 
-    # We asked it to put the results in sibench.json, but that file may be HUGE as it records all the individual stats.
+    try:
+        with trace.phase('parse sibench output'):
+            analyses = [(c, _read_analyses(output)) for c, output in outputs]
+    finally:
+        # The output files may be HUGE, so we don't leave them lying around.
+        _discard(spec, outputs)
+
+    if len(analyses) == 1:
+        result.read = analyses[0][1].get('read')
+        result.write = analyses[0][1].get('write')
+        return result
+
+    result.size_classes = [dict(size=str(c), weight=c.weight, **a) for c, a in analyses]
+    result.read = _combine([(c, a['read']) for c, a in analyses if 'read' in a])
+    result.write = _combine([(c, a['write']) for c, a in analyses if 'write' in a])
+    return result
+
+
+
+def _read_analyses(output):
+    """ Read the analyses from a sibench output file, and return a map from direction to DirectionResult. """
+
+    # The output file may be HUGE as it records all the individual stats.
     # We know that the Analyses section - the only bit we need - comes at the end, so we'll use grep to discard everything
     # before that.
 
-    out = subprocess.check_output("grep Analyses -A 100000 sibench.json", shell=True).decode('utf-8')
+    out = subprocess.check_output("grep Analyses -A 100000 {}".format(output), shell=True).decode('utf-8')
 
     # Add back in the leading brace that our grep has removed.
     jout = "{\n" + out
 
     # And we're good to load it as json
     data = json.loads(jout)
+    results = {}
     for a in data['Analyses']:
-        if a['Name'] == 'Total Read':   result.read = _direction_result(a)
-        if a['Name'] == 'Total Write':  result.write = _direction_result(a)
+        if a['Name'] == 'Total Read':   results['read'] = _direction_result(a)
+        if a['Name'] == 'Total Write':  results['write'] = _direction_result(a)
+
+    return results
+
 
-    return result
+
+def _combine(parts):
+    """ Combine the results of runs with different object sizes into those we would expect from a mixed
+        workload, in which the fraction of operations of each size is given by the weight of its class. 
+        Response time percentiles can't be combined exactly, so the 95th percentile is a weighted mean. """
+
+    if not parts:
+        return None
+
+    total = sum(c.weight for c, d in parts)
+    mb = 1024 * 1024
+
+    # The time per operation in the mixed workload is the weighted mean of the time per operation of each class.
+    rates = [d.bandwidth * mb / c.mean() for c, d in parts]
+    if min(rates) <= 0:
+        bandwidth = 0
+    else:
+        time_per_op = sum(c.weight / total / r for (c, d), r in zip(parts, rates))
+        bandwidth = sum(c.weight / total * c.mean() for c, d in parts) / time_per_op / mb
+
+    return DirectionResult(
+            bandwidth,
+            min(d.res_min for c, d in parts),
+            max(d.res_max for c, d in parts),
+            sum(c.weight / total * d.res_95 for c, d in parts),
+            sum(c.weight / total * d.res_avg for c, d in parts),
+            sum(d.successes for c, d in parts),
+            sum(d.failures for c, d in parts))
 
 
 
@@ -134,3 +364,70 @@ def _direction_result(analysis):
 
     return DirectionResult(bandwidth, res_min, res_max, res_95, res_avg, successes, failures)
 
+
+
+def _read_arguments(output):
+    """ Read whatever sibench recorded of its arguments at the start of an output file (before the
+        stats, which may be huge), or an empty map if it didn't. """
+
+    head = ''
+    with open(output) as f:
+        while '"Stats"' not in head and len(head) < _max_header:
+            chunk = f.read(65536)
+            if not chunk:
+                break
+            head += chunk
+
+    start = head.find('"Arguments"')
+    if start < 0:
+        return {}
+
+    try:
+        arguments, end = json.JSONDecoder().raw_decode(head, head.index('{', start))
+        return arguments
+    except ValueError:
+        return {}
+
+
+
+def archived_result(output):
+    """ Rebuild a Result from a saved sibench output file. """
+
+    analyses = _read_analyses(output)
+    arguments = _read_arguments(output)
+
+    def argument(*names):
+        for n in names:
+            if n in arguments:
+                return arguments[n]
+        return '-'
+
+    size = argument('ObjectSize', 'Size')
+    mix = argument('ReadWriteMix', 'Mix')
+    targets = argument('Targets')
+
+    # Our own output files are named for the time at which the run started.
+    try:
+        start_time = str(datetime.strptime(os.path.basename(output), 'sibench-%Y%m%d-%H%M%S-%f.json'))
+    except ValueError:
+        start_time = '-'
+
+    result = Result.from_dict({
+        'id': os.path.basename(output),
+        'protocol': argument('Protocol', 'Command'),
+        'backend': 'sibench',
+        'object_size': units.to_size(size) if isinstance(size, int) else str(size),
+        'object_count': str(argument('ObjectCount', 'Count')),
+        'workers': argument('WorkerFactor', 'Workers'),
+        'schedule': spec.TimeSpec(argument('RunTime'), argument('RampUp'), argument('RampDown')).schedule(),
+        'targets': len(targets) if isinstance(targets, list) else '-',
+        'read_write_mix': "Separate passes" if mix in [0, '0', '-'] else "{}:{}".format(mix, 100 - int(mix)),
+        'description': 'Ingested from {}'.format(output),
+        'start_time': start_time,
+        'end_time': str(datetime.fromtimestamp(os.path.getmtime(output)))
+    })
+
+    missing = DirectionResult('-', '-', '-', '-', '-', '-', '-')
+    result.read = analyses.get('read', missing)
+    result.write = analyses.get('write', missing)
+    return result
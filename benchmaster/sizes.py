@@ -0,0 +1,240 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Object size distributions.
+
+An object size on the command line may be any of:
+
+    4M                  A single, fixed size.
+    4K-64M              Sizes distributed uniformly between two bounds.
+    4K:50/64K:30/4M:20  A weighted histogram.  Each class may be a fixed size or a range,
+                        as in 4K-64K:50/64K-4M:30/4M-64M:20.
+    @FILE               A histogram read from a file, one class per line, in the form
+                        '<size> <weight>' or '<min>-<max> <weight>'.  Blank lines and
+                        anything after a '#' are ignored.  This lets us feed in object
+                        size histograms taken from production clusters.
+
+None of these use commas, so distributions can still be swept over: -s 1M,4K-64M.
+
+Cosbench supports distributions natively, so they compile to its c(), u() and h() size
+expressions.  Sibench only supports fixed sizes, so a distribution is run as a set of
+sub-runs, one per size, whose results are combined according to their weights.  Fixed
+classes are run as they are, but a range is split into several sizes, log-spaced so that
+its small sizes (where the cost per operation dominates) are covered as well as its big
+ones.  Each sub-run lasts the full run time, so a distribution that comes to N sizes takes
+N times as long to run.
+"""
+
+import benchmaster.units as units
+import math
+import re
+
+# When splitting a range into fixed sizes, each piece spans at most this ratio of sizes
+# (unless that would take more than the maximum number of pieces).  Pieces with less than
+# the minimum share of the range are folded into the next, rather than each costing a run.
+_piece_ratio = 4
+_max_pieces = 8
+_min_piece_share = 0.02
+
+
+class SizeClass:
+    """ A range of sizes (in bytes, inclusive), with a weight. """
+    def __init__(self, low, high, weight):
+        self.low = low
+        self.high = high
+        self.weight = weight
+
+    def __repr__(self): return str(vars(self))
+
+    def mean(self): return (self.low + self.high) / 2
+
+    def __str__(self):
+        if self.low == self.high:
+            return units.to_size(self.low)
+        return '{}-{}'.format(units.to_size(self.low), units.to_size(self.high))
+
+
+
+class SizeDistribution:
+    """ A weighted set of size classes. """
+    def __init__(self, classes):
+        self.classes = classes
+
+    def __repr__(self): return str(vars(self))
+
+    def __str__(self):
+        if len(self.classes) == 1:
+            return str(self.classes[0])
+        return '/'.join('{}:{:g}'.format(c, c.weight) for c in self.classes)
+
+
+    def is_fixed(self):
+        """ True if there is only a single size. """
+        return len(self.classes) == 1 and self.classes[0].low == self.classes[0].high
+
+
+    def mean_bytes(self):
+        """ The mean size of an object. """
+        total = sum(c.weight for c in self.classes)
+        return sum(c.mean() * c.weight for c in self.classes) / total
+
+
+    def percentages(self):
+        """ The weights of the classes as whole percentages that add up to 100. """
+
+        total = sum(c.weight for c in self.classes)
+        exact = [100 * c.weight / total for c in self.classes]
+        result = [int(e) for e in exact]
+
+        # Hand out what's left over to the classes that lost the most by rounding down.
+        by_remainder = sorted(range(len(exact)), key=lambda i: result[i] - exact[i])
+        for i in by_remainder[:100 - sum(result)]:
+            result[i] += 1
+
+        return result
+
+
+    def fixed_classes(self):
+        """ The classes of the distribution as fixed sizes.  Each range is split into log-spaced
+            pieces, each represented by its mean and weighted by the share of the range it covers,
+            so the mean size is (but for rounding) unchanged.  Since the sizes in a range are
+            uniformly distributed, its small pieces may have very little of it, and those are
+            folded into the pieces after them. """
+
+        sizes = {}
+        for c in self.classes:
+            if c.low == c.high:
+                sizes[c.low] = sizes.get(c.low, 0) + c.weight
+                continue
+
+            pieces = min(_max_pieces, max(2, math.ceil(math.log(c.high / c.low, _piece_ratio))))
+            bounds = [c.low * (c.high / c.low) ** (i / pieces) for i in range(pieces + 1)]
+
+            # The share of the range, and the total of share x size, of the pieces so far.
+            share = 0
+            total = 0
+            for i, (low, high) in enumerate(zip(bounds, bounds[1:])):
+                piece = (high - low) / (c.high - c.low)
+                share += piece
+                total += piece * (low + high) / 2
+                if share >= _min_piece_share or i == pieces - 1:
+                    size = _round(total / share)
+                    sizes[size] = sizes.get(size, 0) + c.weight * share
+                    share = 0
+                    total = 0
+
+        return [SizeClass(s, s, w) for s, w in sorted(sizes.items())]
+
+
+    def sample(self, rng):
+        """ Pick a random size from the distribution, using the given random.Random. """
+        c = rng.choices(self.classes, weights=[c.weight for c in self.classes])[0]
+        return rng.randint(c.low, c.high)
+
+
+    def cosbench_expr(self):
+        """ Build a cosbench size expression, such as c(4)MB, u(4,64)KB or h(4|64|50,64|4096|50)KB. """
+
+        # Cosbench wants a single unit for all the values, so pick the biggest that divides them all.
+        bounds = [b for c in self.classes for b in [c.low, c.high]]
+        for unit, scale in [('GB', 1024 ** 3), ('MB', 1024 ** 2), ('KB', 1024), ('B', 1)]:
+            if all(b % scale == 0 for b in bounds):
+                break
+
+        if self.is_fixed():
+            return 'c({}){}'.format(self.classes[0].low // scale, unit)
+
+        if len(self.classes) == 1:
+            return 'u({},{}){}'.format(self.classes[0].low // scale, self.classes[0].high // scale, unit)
+
+        entries = ['{}|{}|{}'.format(c.low // scale, c.high // scale, p) for c, p in zip(self.classes, self.percentages())]
+        return 'h({}){}'.format(','.join(entries), unit)
+
+
+
+def _round(size):
+    """ Round a size to a whole number of K (if it's that big), so that it's easy to read. """
+
+    if size < 1024:
+        return max(1, int(round(size)))
+    return int(round(size / 1024)) * 1024
+
+
+
+def _parse_class(text, weight):
+    bounds = text.split('-')
+    if len(bounds) > 2:
+        raise ValueError("Invalid size range: {}".format(text))
+
+    low = units.to_bytes(bounds[0])
+    high = units.to_bytes(bounds[-1])
+    if high < low or low == 0:
+        raise ValueError("Invalid size range: {}".format(text))
+
+    return SizeClass(low, high, weight)
+
+
+
+def _parse_file(filename):
+    classes = []
+    with open(filename) as f:
+        for line in f:
+            fields = line.split('#')[0].split()
+            if not fields:
+                continue
+
+            if len(fields) == 3:
+                fields = ['{}-{}'.format(fields[0], fields[1]), fields[2]]
+
+            if len(fields) != 2:
+                raise ValueError("Invalid line in size histogram {}: {}".format(filename, line.strip()))
+
+            classes.append(_parse_class(fields[0], float(fields[1])))
+
+    return classes
+
+
+
+def parse(text):
+    """ Parse a size distribution from its command line form. """
+
+    if text.startswith('@'):
+        classes = _parse_file(text[1:])
+    elif ':' in text:
+        classes = []
+        for entry in text.split('/'):
+            size, weight = entry.split(':')
+            classes.append(_parse_class(size, float(weight)))
+    else:
+        classes = [_parse_class(text, 1)]
+
+    if not classes or sum(c.weight for c in classes) <= 0:
+        raise ValueError("Invalid size distribution: {}".format(text))
+
+    return SizeDistribution(classes)
+
+
+
+def from_cosbench_expr(expr):
+    """ Parse a cosbench size expression (as built by cosbench_expr) back into a distribution. """
+
+    m = re.fullmatch(r'\s*([cuh])\((.*)\)\s*([KMG]?B)\s*', expr)
+    if not m:
+        raise ValueError("Unsupported cosbench size expression: {}".format(expr))
+
+    kind, body, unit = m.groups()
+    scale = units.to_bytes('1' + unit)
+
+    if kind == 'c':
+        return SizeDistribution([SizeClass(int(body) * scale, int(body) * scale, 1)])
+
+    if kind == 'u':
+        low, high = body.split(',')
+        return SizeDistribution([SizeClass(int(low) * scale, int(high) * scale, 1)])
+
+    classes = []
+    for entry in body.split(','):
+        low, high, weight = entry.split('|')
+        classes.append(SizeClass(int(low) * scale, int(high) * scale, float(weight)))
+    return SizeDistribution(classes)
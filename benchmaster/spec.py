@@ -6,7 +6,7 @@ The Spec class contains all the parameters we need to run a benchmark.
  
 In particular, it contains three sub-specs:
   1. Runtype: whether we are using Time or Ops to determine how long we run
-  2. Backend: whether we are using Cosbench or Sibench
+  2. Backend: whether we are using Cosbench, Sibench, Fio or one of our own built-in engines
   3. Protocol: whether we are using S3 or Rados (and soon, File etc..)
 
 A Spec can define a sweep of benchmarks (for instance, it might have a range of 
@@ -16,12 +16,19 @@ comma-separated values on the command line.  For instance: -s 1M,4M,8M.
 A Spec that contains such ranges can be flattened, which produces an array
 of specs, each of which has only single values for all of its fields. 
 
+Each protocol can also produce a copy of itself with different targets, for sweeping
+the number of targets (see scaleout.py) and for A/B comparisons (see ab.py).
+
 The Protocol specs also abstract out some of the fields so that cosbench
 can treat everything as if it was S3.  (Cosbench is very heavily skewed
 towards S3, and all other protocols must map to its abstractions).
 """
 
 import benchmaster.cosbench as cosbench
+import benchmaster.fio as fio
+import benchmaster.hardware as hardware
+import benchmaster.native as native
+import benchmaster.s3load as s3load
 import benchmaster.sibench as sibench
 
 
@@ -37,9 +44,27 @@ class Spec:
         self.clean_up = clean_up
         self.description = description
 
+        # Set when planning a sweep: whether this point can use the data left behind by the previous
+        # point (and so skip preparation), and whether it should leave its data for the next point.
+        self.reuse_data = False
+        self.keep_data = False
+
+        # Set when pipelining a sweep: each point then writes objects with a prefix of its own,
+        # and its data is cleaned up in the background while the next point runs.
+        self.pipelined = False
+        self.point_prefix = ''
+
+        # Set when interleaving an A/B comparison: the side ('A' or 'B') that the point runs on.
+        self.side = None
+
     def __repr__(self): return str(vars(self))
+    def prepare(self):  return self.backend.prepare(self)
     def run(self):      return self.backend.run(self)
 
+    # Running split into two halves: executing the benchmark, and turning its output into a Result.
+    def execute(self):          return self.backend.execute(self)
+    def process(self, output):  return self.backend.process(self, output)
+
     def flatten(self):
         results = []
         for r in self.runtype.flatten():
@@ -103,6 +128,8 @@ class S3Spec:
 
     # Methods that abstract information across protocols.
     def targets(self):       return self.gateways
+    def container(self):     return self.bucket
+    def with_targets(self, targets): return S3Spec(self.access_key, self.secret_key, self.port, self.bucket, targets)
 
 
     
@@ -120,6 +147,8 @@ class RadosSpec:
 
     # Methods that abstract information across protocols.
     def targets(self):       return self.monitors
+    def container(self):     return self.pool
+    def with_targets(self, targets): return RadosSpec(self.user, self.key, self.pool, targets)
         
 
 
@@ -138,6 +167,8 @@ class RbdSpec:
 
     # Methods that abstract information across protocols.
     def targets(self):       return self.monitors
+    def container(self):     return '{}/{}'.format(self.pool, self.datapool)
+    def with_targets(self, targets): return RbdSpec(self.user, self.key, self.pool, self.datapool, targets)
 
 
 
@@ -155,6 +186,8 @@ class CephFSSpec:
 
     # Methods that abstract information across protocols.
     def targets(self):       return self.monitors
+    def container(self):     return self.subdir
+    def with_targets(self, targets): return CephFSSpec(self.user, self.key, self.subdir, targets)
 
 
 
@@ -169,6 +202,8 @@ class BlockSpec:
 
     # Methods that abstract information across protocols.
     def targets(self):       return [self.device]
+    def container(self):     return self.device
+    def with_targets(self, targets): return BlockSpec(targets[0])
 
 
 
@@ -183,11 +218,20 @@ class FileSpec:
 
     # Methods that abstract information across protocols.
     def targets(self):       return [self.directory]
+    def container(self):     return self.directory
+    def with_targets(self, targets): return FileSpec(targets[0])
 
 
 
 class SibenchSpec:
     """ Backend spec implementation for Sibench """
+
+    # A map from server to its Hardware, if we have probed them.
+    hardware = None
+
+    # The directory in which to keep sibench's output files, or None to delete them once they're read.
+    output_dir = None
+
     def __init__(self, port, servers, bandwidth, worker_factor, skip_read_verification, generator, slice_dir, slice_count, slice_size):
         self.port = port
         self.servers = servers
@@ -205,21 +249,34 @@ class SibenchSpec:
         results = []
         for b in self.bandwidth.split(','):
             for w in self.worker_factor.split(','):
-                results.append(SibenchSpec(self.port, 
-                                           self.servers, 
-                                           b, 
-                                           w, 
-                                           self.skip_read_verification, 
-                                           self.generator, 
-                                           self.slice_dir, 
-                                           self.slice_count, 
-                                           self.slice_size))
+                flat = SibenchSpec(self.port, 
+                                   self.servers, 
+                                   b, 
+                                   w, 
+                                   self.skip_read_verification, 
+                                   self.generator, 
+                                   self.slice_dir, 
+                                   self.slice_count, 
+                                   self.slice_size)
+                flat.hardware = self.hardware
+                flat.output_dir = self.output_dir
+                results.append(flat)
         return results
 
 
     # Methods that abstract information across backends.
-    def workers(self):      return len(self.servers)
+    def workers(self):
+        # Without the core count of every server, the best we can do is to count the servers.
+        if self.hardware is None or any(s not in self.hardware for s in self.servers):
+            return len(self.servers)
+        return sum(hardware.sibench_workers(self.hardware[s], self.worker_factor) for s in self.servers)
+
+    def object_prefix(self): return ''
+    def prepare(self, spec): return None
+    def prepares(self, spec, reused, kept): return int(spec.read_write_mix) > 0
     def run(self, spec):    return sibench.run(spec)
+    def execute(self, spec): return sibench.execute(spec)
+    def process(self, spec, output): return sibench.process(spec, output)
 
 
 
@@ -228,14 +285,109 @@ class CosbenchSpec:
     worker_threads = None
     xmlfile = None
 
-    def __init__(self, workers, xml_file):
+    def __init__(self, workers, xml_file, containers):
         self.worker_threads = workers
         self.xml_file = xml_file
+        self.containers = containers
 
     def __repr__(self):     return str(vars(self))
     def name(self):         return "cosbench"
-    def flatten(self):      return [CosbenchSpec(w, self.xml_file) for w in self.worker_threads.split(',')]
+    def flatten(self):
+        results = []
+        for w in self.worker_threads.split(','):
+            for c in self.containers.split(','):
+                results.append(CosbenchSpec(w, self.xml_file, c))
+        return results
 
     # Methods that abstract information across backends.
     def workers(self):      return self.worker_threads
+    def object_prefix(self): return cosbench.object_prefix
+    def prepare(self, spec): return cosbench.prepare(spec)
+    def prepares(self, spec, reused, kept): return cosbench.prepares(spec, reused, kept)
     def run(self, spec):    return cosbench.run(spec)
+    def execute(self, spec): return cosbench.execute(spec)
+    def process(self, spec, output): return cosbench.process(spec, output)
+
+
+
+class FioSpec:
+    """ Backend spec implementation for Fio """
+
+    # Whether to keep fio's job and output files, rather than deleting them once they're read.
+    keep_files = False
+
+    def __init__(self, iodepth, numjobs, ioengine, buffered, pattern, servers, jobfile_prefix):
+        self.iodepth = iodepth
+        self.numjobs = numjobs
+        self.ioengine = ioengine
+        self.buffered = buffered
+        self.pattern = pattern
+        self.servers = servers
+        self.jobfile_prefix = jobfile_prefix
+
+    def __repr__(self):     return str(vars(self))
+    def name(self):         return "fio"
+    def flatten(self):
+        results = []
+        for d in self.iodepth.split(','):
+            for j in self.numjobs.split(','):
+                flat = FioSpec(d, j, self.ioengine, self.buffered, self.pattern, self.servers, self.jobfile_prefix)
+                flat.keep_files = self.keep_files
+                results.append(flat)
+        return results
+
+    def is_local(self):     return self.servers == ['localhost']
+
+    # Methods that abstract information across backends.
+    def workers(self):      return int(self.numjobs) * len(self.servers)
+    def object_prefix(self): return ''
+    def prepare(self, spec): return None
+    def prepares(self, spec, reused, kept): return int(spec.read_write_mix) > 0
+    def run(self, spec):    return fio.run(spec)
+    def execute(self, spec): return fio.execute(spec)
+    def process(self, spec, output): return fio.process(spec, output)
+
+
+
+class S3LoadSpec:
+    """ Backend spec implementation for our own built-in S3 load generator """
+    def __init__(self, worker_count, rate='0'):
+        self.worker_count = worker_count
+        self.rate = rate
+
+    def __repr__(self):     return str(vars(self))
+    def name(self):         return "s3load"
+    def flatten(self):      return [S3LoadSpec(w, r) for w in self.worker_count.split(',') for r in self.rate.split(',')]
+
+    # Methods that abstract information across backends.
+    def workers(self):      return int(self.worker_count)
+    def object_prefix(self): return ''
+    def prepare(self, spec): return None
+    def prepares(self, spec, reused, kept): return int(spec.read_write_mix) > 0
+    def run(self, spec):    return s3load.run(spec)
+    def execute(self, spec): return s3load.execute(spec)
+    def process(self, spec, output): return s3load.process(spec, output)
+
+
+
+class NativeSpec:
+    """ Backend spec implementation for our own built-in block and file IO engine """
+    def __init__(self, threads, pattern, direct, rate='0'):
+        self.threads = threads
+        self.pattern = pattern
+        self.direct = direct
+        self.rate = rate
+
+    def __repr__(self):     return str(vars(self))
+    def name(self):         return "native"
+    def flatten(self):
+        return [NativeSpec(t, self.pattern, self.direct, r) for t in self.threads.split(',') for r in self.rate.split(',')]
+
+    # Methods that abstract information across backends.
+    def workers(self):      return int(self.threads)
+    def object_prefix(self): return ''
+    def prepare(self, spec): return native.prepare(spec)
+    def prepares(self, spec, reused, kept): return not reused
+    def run(self, spec):    return native.run(spec)
+    def execute(self, spec): return native.execute(spec)
+    def process(self, spec, output): return native.process(spec, output)
@@ -1,6 +1,7 @@
 # SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
 # SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
 
+import benchmaster.trace as trace
 import gspread
 import re
 
@@ -10,6 +11,18 @@ from benchmaster.result import Result
 
 
 
+def _column_letter(index):
+    """ The letters of a column from its index: A to Z, then AA, AB and so on. """
+
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+
 def connect(credentials_file):
     """ Connect to the google API using the credentials in the file specified.
         We return a connection on which operations can be performed. """
@@ -45,7 +58,7 @@ def set_format(sheet):
 
 def set_headers(sheet):
     columns = Result.columns()
-    last_col = chr(ord('A') + len(columns) - 1)
+    last_col = _column_letter(len(columns) - 1)
     ws = sheet.get_worksheet(0)
     ws.update('A1', [columns], value_input_option="RAW")
     header_range = 'A1:{}1'.format(last_col)
@@ -79,7 +92,7 @@ def set_columns_format(sheet):
 
     # Set up formatting for the data
     for i, (cell_colour, cell_format) in enumerate(zip(Result.backgrounds(), Result.formats())):
-        column = chr(i + ord('A'))
+        column = _column_letter(i)
         column_range = "{}2:{}999".format(column, column)
         if cell_format:
             ws.format(column_range,{"numberFormat":{"type":"NUMBER","pattern":cell_format}})
@@ -105,5 +118,7 @@ def append_result(sheet, result):
     # The 'USER_ENTERED' flag means that things like dates and times will be picked up as such by the spreadsheet.
     # If we used the default value (or 'RAW') it would treat dates as strings.
 
-    ws.append_row(result.values(), value_input_option='USER_ENTERED')   
-    set_columns_size(sheet)
+    with trace.phase('append sheet row'):
+        ws.append_row(result.values(), value_input_option='USER_ENTERED')
+    with trace.phase('resize sheet columns'):
+        set_columns_size(sheet)
@@ -0,0 +1,27 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+""" A local store of results: a file with one json encoded Result per line. """
+
+import json
+import os
+
+from benchmaster.result import Result
+
+
+def append(filename, result):
+    """ Add a result to the end of the store. """
+
+    with open(filename, 'a') as f:
+        f.write(result.to_json() + '\n')
+
+
+
+def load(filename):
+    """ Read all the results in the store. """
+
+    if not os.path.exists(filename):
+        return []
+
+    with open(filename) as f:
+        return [Result.from_dict(json.loads(line)) for line in f if line.strip()]
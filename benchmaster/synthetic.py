@@ -0,0 +1,133 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Generators of synthetic benchmark output, for exercising benchmaster without a cluster.
+
+  - sibench output files of any size: the arguments, a stats section with a record for each
+    operation (whose latencies follow a log-normal distribution), and the analyses of those
+    stats, as sibench writes them.  The stats are written as a block of records repeated
+    over and over, so that even multi-GB files take seconds rather than minutes.
+  - cosbench result CSVs, with as many stage rows as we like.
+
+These are used by the self-benchmark, and by the fake sibench and cosbench, so they don't
+depend on anything that needs a cluster (or its client libraries).
+"""
+
+import benchmaster.units as units
+import json
+import math
+import random
+
+from benchmaster.histogram import Histogram
+
+# The number of operations in each repeated block of sibench stats.
+_block_ops = 4096
+
+
+def _latencies(rng, count, median_us, sigma):
+    return [max(1, int(rng.lognormvariate(math.log(median_us), sigma))) for i in range(count)]
+
+
+
+def _analysis(name, histogram, transferred, failures, runtime):
+    return {
+        'Name': name,
+        'BandwidthBytes': transferred / int(runtime) if int(runtime) else 0,
+        'ResTimeMin': histogram.min or 0,
+        'ResTimeMax': histogram.max,
+        'ResTime95': histogram.percentile(95),
+        'ResTimeAvg': histogram.total / histogram.count if histogram.count else 0,
+        'Successes': histogram.count,
+        'Failures': failures
+    }
+
+
+
+def sibench_output(filename, target_size, object_size='1M', object_count=1000, read_write_mix='0', runtime=60, ramp_up=0,
+                   ramp_down=0, worker_factor=1.0, median_us=5000, sigma=0.5, failure_percent=0, targets=None,
+                   servers=None, seed=0, ops=None):
+    """ Write a sibench output file of about target_size bytes, and return the analyses it contains.
+        The analyses are for the operations in the file, or if ops is given, for that many
+        operations with the same distribution. """
+
+    rng = random.Random(seed)
+    size = units.to_bytes(object_size)
+    mix = int(read_write_mix)
+    record = '{{"Op":"{}","Start":{},"Duration":{},"Error":{}}},\n'
+
+    # Build one block of records, and the stats for it.
+    histograms = {'Read': Histogram(), 'Write': Histogram()}
+    failures = {'Read': 0, 'Write': 0}
+    lines = []
+
+    for i, us in enumerate(_latencies(rng, _block_ops, median_us, sigma)):
+        op = 'Read' if (mix == 0 and i % 2) or (mix > 0 and (i * 37) % 100 < mix) else 'Write'
+        failed = rng.random() * 100 < failure_percent
+        lines.append(record.format(op, i, us, 'true' if failed else 'false'))
+        if failed:
+            failures[op] += 1
+        else:
+            histograms[op].add(us)
+
+    block = ''.join(lines)
+
+    arguments = {
+        'ObjectSize': size,
+        'ObjectCount': int(object_count),
+        'RunTime': int(runtime),
+        'RampUp': int(ramp_up),
+        'RampDown': int(ramp_down),
+        'ReadWriteMix': mix,
+        'WorkerFactor': float(worker_factor),
+        'Targets': targets or ['localhost'],
+        'Servers': servers or ['localhost']
+    }
+
+    with open(filename, 'w') as f:
+        f.write('{\n"Arguments": ' + json.dumps(arguments) + ',\n"Stats": [\n')
+        written = 0
+        blocks = 0
+        while written < target_size or blocks == 0:
+            f.write(block)
+            written += len(block)
+            blocks += 1
+
+        # The last record must not have a trailing comma.
+        f.write('{"Op":"None","Start":0,"Duration":0,"Error":false}\n],\n')
+
+        # Scale the block's stats up to the number of operations.
+        factor = ops / _block_ops if ops is not None else blocks
+        analyses = []
+        for op in ['Read', 'Write']:
+            h = histograms[op]
+            scaled = Histogram()
+            scaled.buckets = [int(n * factor) for n in h.buckets]
+            scaled.count = int(h.count * factor)
+            scaled.total = int(h.total * factor)
+            scaled.min = h.min
+            scaled.max = h.max
+            analyses.append(_analysis('Total ' + op, scaled, scaled.count * size, int(failures[op] * factor), runtime))
+
+        f.write('"Analyses": ' + json.dumps(analyses, indent=2) + '\n}\n')
+
+    return analyses
+
+
+
+def cosbench_csv(filename, rows, read_write_mix='0', seed=0):
+    """ Write a cosbench result CSV with a given number of stage rows, half of them reads and half writes. """
+
+    rng = random.Random(seed)
+    mix = int(read_write_mix)
+
+    with open(filename, 'w') as f:
+        f.write('Stage,Op-Name,Op-Type,Op-Count,Byte-Count,Avg-ResTime,Avg-ProcTime,Throughput,Bandwidth,Succ-Ratio,95%-ResTime,100%-ResTime\n')
+        for i in range(rows):
+            op = 'read' if i % 2 else 'write'
+            stage = 'w{}-read/write'.format(i // 2) if mix else 'w{}-{}'.format(i, op)
+            count = rng.randint(1000, 100000)
+            avg = rng.uniform(1, 50)
+            f.write('{},{},{},{},{},{:.2f},{:.2f},{:.2f},{:.2f},{:.2f}%,{:.0f},{:.0f}\n'.format(
+                    stage, op, op, count, count * 1048576, avg, avg * 0.9, count / 60, count * 1048576 / 60,
+                    100 - rng.random(), avg * 2, avg * 10))
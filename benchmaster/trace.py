@@ -0,0 +1,184 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+"""
+Timing of the phases of a sweep.
+
+A sweep's wall time goes on far more than the benchmarks themselves: fetching keys over SSH,
+generating and submitting cosbench jobs, waiting for them, preparing data, parsing output,
+pretty printing results and uploading them to a sheet.  To see where it goes, each of those
+phases is wrapped in
+
+    with trace.phase('name'):
+
+which records how long it took, and which point of the sweep it belonged to.  The point is
+held in a context variable (set by trace.point()) rather than passed around, so the phases
+deep inside the backends don't need to know about it, and the pipeline carries it over to
+the threads that post-process a point.  Phases outside any point belong to the sweep as a
+whole.  Phases marked as measured are those in which the benchmark itself runs.
+
+With --trace, every phase is written to a file in the Chrome trace format (a JSON array of
+complete events, one per line) as it finishes, so the file can be loaded into
+chrome://tracing or Perfetto, or read line by line, even if the sweep never finishes.
+
+At the end of a sweep we print the time of each phase, and for each point its measured time
+and the harness overhead: the rest of the point's wall time in the main thread, whether or
+not it is in a phase we trace (this is what delays the next point), and the time spent
+post-processing it in the background.  Without a sweep in progress, phases cost no more
+than a check of a global.
+"""
+
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+
+# The point of the sweep that the current code is working on.
+_point = contextvars.ContextVar('point', default=None)
+
+_tracer = None
+
+
+class Tracer:
+    """ Collects the phases of a sweep, and writes them to a trace file if we have one. """
+
+    def __init__(self, filename=None):
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.points = {}
+        self._lock = threading.Lock()
+        self._file = None
+
+        if filename is not None:
+            self._file = open(filename, 'w')
+            self._file.write('[\n')
+
+
+    def __repr__(self): return str(vars(self))
+
+
+    def _totals(self, point):
+        return self.points.setdefault(point, {'wall': 0.0, 'measured': 0.0, 'background': 0.0})
+
+
+    def _write(self, name, category, start, seconds, point):
+        if self._file is not None:
+            event = {
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': round((start - self.start) * 1e6),
+                'dur': round(seconds * 1e6),
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'args': {'point': point}
+            }
+            self._file.write(json.dumps(event) + ',\n')
+            self._file.flush()
+
+
+    def record(self, name, start, end, measured):
+        """ Record a phase of the current point (or of the sweep). """
+
+        point = _point.get()
+        seconds = end - start
+
+        with self._lock:
+            totals = self.phases.setdefault(name, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+
+            if point is not None:
+                if measured:
+                    self._totals(point)['measured'] += seconds
+                elif threading.current_thread() is not threading.main_thread():
+                    self._totals(point)['background'] += seconds
+
+            self._write(name, 'measured' if measured else 'harness', start, seconds, point)
+
+
+    def record_point(self, point, start, end):
+        """ Record the wall time of a point in the main thread. """
+
+        with self._lock:
+            self._totals(point)['wall'] += end - start
+            self._write('point {}'.format(point), 'point', start, end - start, point)
+
+
+    def summary(self):
+        total = time.perf_counter() - self.start
+
+        print("{:<32} {:>8} {:>12} {:>8}".format('Phase', 'Count', 'Time', 'Sweep'))
+        for name, (count, seconds) in sorted(self.phases.items(), key=lambda p: -p[1][1]):
+            print("{:<32} {:>8} {:>11.3f}s {:>7.1f}%".format(name, count, seconds, 100 * seconds / total))
+
+        if not self.points:
+            return
+
+        print("\n{:>6} {:>12} {:>12} {:>12} {:>9} {:>12}".format('Point', 'Wall', 'Measured', 'Overhead', 'Overhead', 'Background'))
+        for point, p in sorted(self.points.items()):
+            overhead = max(0, p['wall'] - p['measured'])
+            print("{:>6} {:>11.3f}s {:>11.3f}s {:>11.3f}s {:>8.1f}% {:>11.3f}s".format(
+                    point, p['wall'], p['measured'], overhead, 100 * overhead / p['wall'] if p['wall'] else 0, p['background']))
+
+
+    def close(self):
+        self.summary()
+
+        if self._file is not None:
+            # A last event without a trailing comma, so that the array is complete.
+            self._file.write(json.dumps({'name': 'sweep', 'ph': 'M', 'pid': os.getpid(), 'args': {}}) + '\n]\n')
+            self._file.close()
+            self._file = None
+
+
+
+def start(filename=None):
+    """ Start tracing a sweep. """
+
+    global _tracer
+    _tracer = Tracer(filename)
+    return _tracer
+
+
+
+def close():
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+        _tracer = None
+
+
+
+@contextlib.contextmanager
+def point(index):
+    """ Attribute the phases in the block to a point of the sweep. """
+
+    tracer = _tracer
+    token = _point.set(index)
+    begin = time.perf_counter()
+    try:
+        yield
+    finally:
+        _point.reset(token)
+        if tracer is not None:
+            tracer.record_point(index, begin, time.perf_counter())
+
+
+
+@contextlib.contextmanager
+def phase(name, measured=False):
+    """ Time the block as a phase of the sweep. """
+
+    tracer = _tracer
+    if tracer is None:
+        yield
+        return
+
+    begin = time.perf_counter()
+    try:
+        yield
+    finally:
+        tracer.record(name, begin, time.perf_counter(), measured)
@@ -0,0 +1,59 @@
+# SPDX-FileCopyrightText: 2022 SoftIron Limited <info@softiron.com>
+# SPDX-License-Identifier: GNU General Public License v2.0 only WITH Classpath exception 2.0
+
+""" Helpers for converting between sizes as we take them on the command line, and numbers of bytes. """
+
+import re
+
+_multipliers = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def to_bytes(size):
+    """ Convert a size such as '4M' or '512' into a number of bytes.  Units are powers of 1024. """
+
+    m = re.fullmatch(r"\s*(\d+)\s*([KMGT]?)B?\s*", str(size), re.IGNORECASE)
+    if not m:
+        raise ValueError("Invalid size: {}".format(size))
+
+    return int(m.group(1)) * _multipliers[m.group(2).upper()]
+
+
+
+def to_ops_per_second(rate, op_bytes):
+    """ Convert a rate such as '500' or '2K' operations per second, or '100MB' (bytes per second)
+        into operations per second, given the mean size of an operation. """
+
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(B?)\s*", str(rate), re.IGNORECASE)
+    if not m:
+        raise ValueError("Invalid rate: {}".format(rate))
+
+    value = float(m.group(1)) * _multipliers[m.group(2).upper()]
+    return value / op_bytes if m.group(3) else value
+
+
+
+def is_byte_rate(rate):
+    """ Whether a rate is in bytes per second, rather than operations. """
+    return str(rate).strip().upper().endswith('B')
+
+
+
+def format_bytes(num, suffix='B'):
+    """ Turn a number of bytes into something human readable. """
+
+    for unit in ['', 'K', 'M', 'G', 'T']:
+        if abs(num) < 1024.0:
+            return "%3.2f %s%s" % (num, unit, suffix)
+        num /= 1024.0
+    return "%.2f %s%s" % (num, 'P', suffix)
+
+
+
+def to_size(num):
+    """ Convert a number of bytes into the shortest exact size string, such as '4K', or '1536'. """
+
+    num = int(num)
+    for unit in ['T', 'G', 'M', 'K']:
+        if num != 0 and num % _multipliers[unit] == 0:
+            return '{}{}'.format(num // _multipliers[unit], unit)
+    return str(num)